@@ -0,0 +1,164 @@
+"""Structured JSON access logging with request IDs.
+
+AccessLogMiddleware assigns every HTTP request an ID (honouring an incoming
+X-Request-ID), echoes it back in the response and emits one JSON line per
+request: route, status, latency, bytes in/out, user id and time spent in
+Mongo. Records go through a QueueHandler so the formatting and the write
+happen on a listener thread, never on the event loop.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from pymongo import monitoring
+
+ACCESS_LOG_ENABLED = os.environ.get('ACCESS_LOG_ENABLED', 'true').lower() == 'true'
+
+# Mutable per-request state; handlers and the Mongo listener update it in place
+request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar('request_context', default=None)
+
+access_logger = logging.getLogger("access")
+access_logger.propagate = False
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = getattr(record, "access", None) or {"message": record.getMessage()}
+        return json.dumps(payload, default=str, separators=(",", ":"))
+
+
+def start_access_logging(stream=None):
+    """Attach the queue handler and start the background writer thread"""
+    global _queue_listener
+    if _queue_listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    _queue_listener = logging.handlers.QueueListener(log_queue, writer)
+    _queue_listener.start()
+    access_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    access_logger.setLevel(logging.INFO)
+
+
+def stop_access_logging():
+    """Flush queued records and stop the writer thread"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def current_request_id() -> Optional[str]:
+    ctx = request_context.get()
+    return ctx["request_id"] if ctx else None
+
+
+def set_request_user(user_id: Optional[str]):
+    """Record the authenticated user on the current request's log line"""
+    ctx = request_context.get()
+    if ctx is not None:
+        ctx["user_id"] = user_id
+
+
+class MongoTimingListener(monitoring.CommandListener):
+    """Adds each Mongo command's duration to the request that issued it.
+
+    Motor copies the caller's context into its executor threads, so the
+    request_context dict seen here is the one created by the middleware.
+    """
+
+    def started(self, event):
+        pass
+
+    def _add(self, event):
+        ctx = request_context.get()
+        if ctx is not None:
+            ctx["mongo_ms"] += event.duration_micros / 1000.0
+            ctx["mongo_ops"] += 1
+
+    def succeeded(self, event):
+        self._add(event)
+
+    def failed(self, event):
+        self._add(event)
+
+
+mongo_timing_listener = MongoTimingListener()
+
+
+class AccessLogMiddleware:
+    """Pure ASGI middleware so the response body is streamed, not buffered"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        ctx = {
+            "request_id": request_id or uuid.uuid4().hex,
+            "user_id": None,
+            "mongo_ms": 0.0,
+            "mongo_ops": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "status": None,
+        }
+        token = request_context.set(ctx)
+        start = time.perf_counter()
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                ctx["bytes_in"] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                ctx["status"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", ctx["request_id"].encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                ctx["bytes_out"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except Exception:
+            ctx["status"] = 500
+            raise
+        finally:
+            request_context.reset(token)
+            route = scope.get("route")
+            access_logger.info("access", extra={"access": {
+                "ts": time.time(),
+                "request_id": ctx["request_id"],
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "route": getattr(route, "path", None) or scope.get("path"),
+                "status": ctx["status"],
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+                "bytes_in": ctx["bytes_in"],
+                "bytes_out": ctx["bytes_out"],
+                "user_id": ctx["user_id"],
+                "mongo_ms": round(ctx["mongo_ms"], 2),
+                "mongo_ops": ctx["mongo_ops"],
+                "client": (scope.get("client") or [None])[0],
+            }})
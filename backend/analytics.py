@@ -0,0 +1,275 @@
+"""In-memory analytics over completed reports.
+
+Each worker keeps a pandas DataFrame of completed reports (hot and archived)
+with just the analysis columns, and answers /api/analytics/query with
+vectorized filters and group-bys on it, so dashboard queries never touch
+Mongo. The table starts from the Parquet snapshot when there is one (or a
+full Mongo read otherwise) and is then refreshed incrementally: reports with
+`updated_at` past the last watermark replace their rows, and reports that
+are no longer completed drop out. Watermarks are the time a scan started,
+so writes made while it ran are read again by the next refresh. Client
+renames rewrite reports with a new `updated_at` (see denormalization.py),
+hot and archived, so both collections are refreshed. A periodic full reload
+from Mongo, never from the possibly day-old snapshot, repairs any drift.
+
+pandas is imported lazily so it stays off the server startup path.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from archive import ARCHIVE
+from snapshots import SNAPSHOT_DIR, read_manifest
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_REFRESH_SECONDS = int(os.environ.get('ANALYTICS_REFRESH_SECONDS', '60'))
+ANALYTICS_FULL_RELOAD_SECONDS = int(os.environ.get('ANALYTICS_FULL_RELOAD_SECONDS', '3600'))
+# Re-read a little before the watermark so writes that committed late are not missed
+WATERMARK_OVERLAP = timedelta(seconds=60)
+LOAD_BATCH_SIZE = 5000
+LOCAL_TZ = 'America/Los_Angeles'
+
+COLUMNS = [
+    "id", "client_id", "client_name", "employee_id", "employee_name", "priority",
+    "request_date", "completion_date", "total_cost", "parts_cost",
+]
+PROJECTION = {"_id": 0, "status": 1, "updated_at": 1, **{column: 1 for column in COLUMNS}}
+
+# Metrics that are per-group sums of a column (averages divide by the count)
+SUMMED = {
+    "revenue": "total_cost",
+    "parts_cost": "parts_cost",
+    "profit": "profit",
+    "avg_completion_hours": "completion_hours",
+}
+METRICS = ("count", "revenue", "parts_cost", "profit", "avg_completion_hours", "parts_ratio")
+GROUPS = {
+    "client": ("client_id", "client_name"),
+    "employee": ("employee_id", "employee_name"),
+    "priority": ("priority", None),
+    "month": ("completed_month", None),
+    "day": ("completed_day", None),
+}
+
+
+async def ensure_analytics_indexes(db):
+    await db.service_reports.create_index([("updated_at", 1)])
+    await db[ARCHIVE].create_index([("updated_at", 1)])
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _prepare(frame):
+    """Derived columns computed once per load instead of per query"""
+    import pandas as pd
+    frame = frame.reindex(columns=COLUMNS)
+    for column in ("request_date", "completion_date"):
+        frame[column] = pd.to_datetime(frame[column])
+    for column in ("total_cost", "parts_cost"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").fillna(0.0)
+    frame["employee_id"] = frame["employee_id"].fillna("")
+    frame["employee_name"] = frame["employee_name"].fillna("Unassigned")
+    frame["profit"] = frame["total_cost"] - frame["parts_cost"]
+    frame["completion_hours"] = (frame["completion_date"] - frame["request_date"]).dt.total_seconds() / 3600
+    # Stored datetimes are UTC; calendar buckets follow the business's local day
+    local = frame["completion_date"].dt.tz_localize("UTC").dt.tz_convert(LOCAL_TZ)
+    frame["completed_day"] = local.dt.strftime("%Y-%m-%d")
+    frame["completed_month"] = local.dt.strftime("%Y-%m")
+    return _categorize(frame.set_index("id", drop=False))
+
+
+def _categorize(frame):
+    """Group keys as categoricals: group-bys and filters then work on integer codes"""
+    for key, _ in GROUPS.values():
+        if frame[key].dtype != "category":
+            frame[key] = frame[key].astype("category")
+    return frame
+
+
+def _labels(frame) -> Dict[str, Dict[str, str]]:
+    return {
+        group: dict(zip(frame[key].astype(str), frame[label]))
+        for group, (key, label) in GROUPS.items() if label
+    }
+
+
+class AnalyticsTable:
+    def __init__(self):
+        self.frame = None
+        self.labels: Dict[str, Dict[str, str]] = {}
+        self.watermark: Optional[datetime] = None
+        self.loaded_at: Optional[float] = None
+        self.refreshed_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.frame is not None
+
+    async def _read_mongo(self, collection, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        docs = []
+        cursor = collection.find(query, PROJECTION).batch_size(LOAD_BATCH_SIZE)
+        async for doc in cursor:
+            docs.append(doc)
+        return docs
+
+    async def load(self, db, from_snapshot: bool = True):
+        """Full load: Parquet snapshot plus later changes if allowed and available, else Mongo"""
+        import pandas as pd
+        started = datetime.now()
+        manifest = read_manifest() if from_snapshot else None
+        if manifest:
+            frame = await asyncio.to_thread(pd.read_parquet, SNAPSHOT_DIR, columns=COLUMNS)
+            self.frame = await asyncio.to_thread(_prepare, frame)
+            self.labels = _labels(self.frame)
+            # The snapshot holds everything written before its scan started
+            self.watermark = datetime.fromisoformat(manifest.get("scan_started_at") or manifest["generated_at"])
+            await self.refresh(db)
+        else:
+            docs = []
+            for collection in (db.service_reports, db[ARCHIVE]):
+                docs += await self._read_mongo(collection, {"status": "completed"})
+            self.watermark = started
+            frame = pd.DataFrame([doc for doc in docs if doc.get("completion_date")], columns=COLUMNS)
+            self.frame = await asyncio.to_thread(_prepare, frame)
+            self.labels = _labels(self.frame)
+        self.loaded_at = self.refreshed_at = time.monotonic()
+        logger.info(f"✅ Analytics table loaded: {len(self.frame)} completed reports"
+                    f"{' from snapshot' if manifest else ''}")
+
+    async def refresh(self, db) -> int:
+        """Apply reports changed since the watermark; returns how many changed"""
+        import pandas as pd
+        if self.frame is None:
+            await self.load(db)
+            return len(self.frame)
+        started = datetime.now()
+        since = {"updated_at": {"$gte": self.watermark - WATERMARK_OVERLAP}}
+        # Archived reports change only when a client rename is propagated
+        docs = await self._read_mongo(db.service_reports, since) + await self._read_mongo(db[ARCHIVE], since)
+        self.refreshed_at = time.monotonic()
+        self.watermark = started
+        if not docs:
+            return 0
+        # A report mid-archive can be read from both collections; keep one row
+        completed = list({
+            doc["id"]: doc for doc in docs if doc.get("status") == "completed" and doc.get("completion_date")
+        }.values())
+        changed_ids = [doc["id"] for doc in docs]
+
+        def merge():
+            kept = self.frame[~self.frame.index.isin(changed_ids)]
+            if not completed:
+                return kept, {}
+            added = _prepare(pd.DataFrame(completed, columns=COLUMNS))
+            return _categorize(pd.concat([kept, added])), _labels(added)
+
+        # Build the new frame aside and swap it in; queries keep using the old one until then
+        self.frame, labels = await asyncio.to_thread(merge)
+        for group, names in labels.items():
+            self.labels[group] = {**self.labels.get(group, {}), **names}
+        return len(docs)
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "ready": self.ready,
+            "rows": 0 if self.frame is None else len(self.frame),
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "refreshed_seconds_ago": None if self.refreshed_at is None else round(now - self.refreshed_at, 1),
+        }
+
+    def query(self, metrics: List[str], group_by: Optional[str] = None,
+              date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+              employee_id: Optional[str] = None, client_id: Optional[str] = None,
+              priority: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Aggregate metrics over completed reports, optionally grouped.
+
+        Group-bys are np.bincount over the categorical codes of the group key,
+        one pass per metric, which keeps them in the low milliseconds.
+        """
+        import numpy as np
+        frame = self.frame
+        mask = np.ones(len(frame), dtype=bool)
+        for column, value in (("employee_id", employee_id), ("client_id", client_id), ("priority", priority)):
+            if value is not None:
+                mask &= (frame[column] == value).to_numpy()
+        completed = frame["completion_date"].to_numpy()
+        if date_from is not None:
+            mask &= completed >= np.datetime64(_naive_utc(date_from))
+        if date_to is not None:
+            mask &= completed <= np.datetime64(_naive_utc(date_to))
+
+        if group_by is None:
+            keys, codes = [None], np.zeros(int(mask.sum()), dtype=np.intp)
+        else:
+            key, label = GROUPS[group_by]
+            keys = frame[key].cat.categories
+            all_codes = frame[key].cat.codes.to_numpy()
+            mask &= all_codes >= 0
+            codes = all_codes[mask]
+        size = len(keys)
+
+        counts = np.bincount(codes, minlength=size)
+        needed = set(metrics) | ({"revenue", "parts_cost"} if "parts_ratio" in metrics else set())
+        values = {
+            name: np.bincount(codes, weights=frame[column].to_numpy()[mask], minlength=size)
+            for name, column in SUMMED.items() if name in needed
+        }
+        values["count"] = counts
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if "avg_completion_hours" in values:
+                values["avg_completion_hours"] = values["avg_completion_hours"] / counts
+            if "parts_ratio" in needed:
+                values["parts_ratio"] = np.where(values["revenue"] > 0, values["parts_cost"] / values["revenue"], np.nan)
+
+        if group_by is None:
+            order = np.arange(1)
+        else:
+            order = np.flatnonzero(counts)
+            sort_metric = next((name for name in metrics if name in values), "count")
+            # Calendar buckets read in time order; everything else biggest first
+            if group_by not in ("month", "day"):
+                order = order[np.argsort(-np.nan_to_num(values[sort_metric][order]), kind="stable")]
+            order = order[:limit]
+
+        rows = []
+        for index in order:
+            row = {} if group_by is None else {"key": keys[index]}
+            if group_by is not None and label:
+                row["label"] = self.labels.get(group_by, {}).get(str(keys[index]))
+            for name in metrics:
+                value = values[name][index].item()
+                if isinstance(value, float):
+                    value = None if value != value else round(value, 2)
+                row[name] = value
+            rows.append(row)
+        return rows
+
+
+async def refresh_loop(get_db, table: AnalyticsTable,
+                       interval: int = ANALYTICS_REFRESH_SECONDS,
+                       full_reload: int = ANALYTICS_FULL_RELOAD_SECONDS):
+    """Background task: keep this worker's table current while the DB is reachable"""
+    while True:
+        db = get_db()
+        if db is not None:
+            try:
+                if table.loaded_at is None or time.monotonic() - table.loaded_at > full_reload:
+                    # Only the first load may start from the snapshot; reloads read Mongo
+                    await table.load(db, from_snapshot=table.loaded_at is None)
+                else:
+                    await table.refresh(db)
+            except Exception as e:
+                logger.error(f"Error refreshing analytics table: {e}")
+        await asyncio.sleep(interval)
+
+
+analytics_table = AnalyticsTable()
@@ -0,0 +1,79 @@
+"""Archive tier for old completed reports.
+
+Completed reports older than ARCHIVE_AFTER_MONTHS move from service_reports
+to service_reports_archive, media included (photos and videos are stored
+inline in the report). The hot collection that the board scans stays small;
+history and analytics read through both collections with $unionWith.
+
+Each batch is copied with upserts keyed by report id and only then deleted
+from the hot collection, so an interrupted run simply repeats the copy.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReplaceOne, UpdateOne
+
+from report_counters import COUNTERS, counter_key
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE = "service_reports_archive"
+ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', '12'))
+BATCH_SIZE = 200
+
+
+async def ensure_archive_indexes(db):
+    await db[ARCHIVE].create_index("id", unique=True)
+    await db[ARCHIVE].create_index([("client_id", 1), ("request_date", -1)])
+    await db[ARCHIVE].create_index([("completion_date", 1)])
+    await db.service_reports.create_index([("status", 1), ("completion_date", 1)])
+
+
+async def archive_completed_reports(db, months: int = ARCHIVE_AFTER_MONTHS,
+                                    now: Optional[datetime] = None) -> int:
+    """Move completed reports finished more than `months` ago; returns how many moved"""
+    cutoff = (now or datetime.now()) - timedelta(days=30 * months)
+    query = {"status": "completed", "completion_date": {"$lt": cutoff}}
+    moved = 0
+    while True:
+        docs = await db.service_reports.find(query).limit(BATCH_SIZE).to_list(BATCH_SIZE)
+        if not docs:
+            break
+        archived_at = datetime.now()
+        await db[ARCHIVE].bulk_write([
+            ReplaceOne({"id": doc["id"]}, {**doc, "archived_at": archived_at}, upsert=True)
+            for doc in docs
+        ], ordered=False)
+        await db.service_reports.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+
+        # Keep the dashboard counters in step with the hot collection
+        decrements: Dict[str, int] = {}
+        for doc in docs:
+            key = counter_key(doc.get("status"), doc.get("employee_id"), doc.get("priority"))
+            decrements[key] = decrements.get(key, 0) + 1
+        await db[COUNTERS].bulk_write([
+            UpdateOne({"_id": key}, {"$inc": {"count": -count}}) for key, count in decrements.items()
+        ], ordered=False)
+        moved += len(docs)
+
+    if moved:
+        logger.info(f"✅ Archived {moved} completed reports older than {months} months")
+    return moved
+
+
+async def find_reports_with_archive(db, query: Dict[str, Any], sort: List, limit: int,
+                                    projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Reports from the hot and archive collections as one sorted result"""
+    pipeline: List[Dict[str, Any]] = [{"$match": query}]
+    archive_pipeline: List[Dict[str, Any]] = [{"$match": query}]
+    if projection:
+        pipeline.append({"$project": projection})
+        archive_pipeline.append({"$project": projection})
+    pipeline += [
+        {"$unionWith": {"coll": ARCHIVE, "pipeline": archive_pipeline}},
+        {"$sort": dict(sort)},
+        {"$limit": limit},
+    ]
+    return await db.service_reports.aggregate(pipeline, allowDiskUse=True).to_list(limit)
@@ -0,0 +1,219 @@
+"""Workload balancing and auto-assignment of reports to employees.
+
+Every employee gets a score for a report; the lowest wins:
+
+    LOAD_WEIGHT     * open reports weighted by priority (URGENT 3, SAME WEEK 2, NEXT WEEK 1)
+  + URGENT_WEIGHT   * open URGENT reports, only when the report is URGENT
+  + DISTANCE_WEIGHT * km from the report's client to the centre of the employee's clients
+
+Open loads come from the report_counters combinations and client centres
+from the geocoded client locations. Both are held in memory by
+`workload_tracker`, reloaded when older than TRACKER_MAX_AGE_SECONDS and
+bumped by this worker's own assignments, so scoring a candidate is O(1).
+Proposals are greedy in priority and due order, and each proposal adds to
+the chosen employee's load, so a batch spreads instead of piling on whoever
+was least busy at the start. Applying a batch is one bulk_write; a report
+that someone assigned meanwhile is left alone.
+"""
+import copy
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from geocoding import Coordinates, client_locations
+from report_counters import COUNTERS, reconcile_counters, record_reports_changed
+from sla import OPEN_STATUSES
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_WEIGHTS = {"URGENT": 3.0, "SAME WEEK": 2.0, "NEXT WEEK": 1.0}
+PRIORITY_ORDER = {"URGENT": 0, "SAME WEEK": 1, "NEXT WEEK": 2}
+LOAD_WEIGHT = 1.0
+URGENT_WEIGHT = 2.0
+DISTANCE_WEIGHT = 0.2
+# Distance assumed when the report or the employee has no coordinates
+UNKNOWN_DISTANCE_KM = 25.0
+MAX_BATCH = 2000
+# Loads also change through ordinary report edits; reload them this often
+TRACKER_MAX_AGE_SECONDS = 30
+
+
+def haversine_km(a: Coordinates, b: Coordinates) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(min(1.0, h)))
+
+
+class EmployeeLoad:
+    __slots__ = ("employee_id", "name", "open", "urgent", "weighted", "home")
+
+    def __init__(self, employee_id: str, name: str):
+        self.employee_id = employee_id
+        self.name = name
+        self.open = 0
+        self.urgent = 0
+        self.weighted = 0.0
+        self.home: Optional[Coordinates] = None
+
+    def add(self, priority: Optional[str], count: int = 1):
+        self.open += count
+        self.weighted += PRIORITY_WEIGHTS.get(priority, 1.0) * count
+        if priority == "URGENT":
+            self.urgent += count
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "employee_id": self.employee_id,
+            "employee_name": self.name,
+            "open": self.open,
+            "urgent": self.urgent,
+            "weighted_load": self.weighted,
+            "home": {"lat": self.home[0], "lng": self.home[1]} if self.home else None,
+        }
+
+
+class WorkloadTracker:
+    def __init__(self):
+        self.employees: Dict[str, EmployeeLoad] = {}
+        self.refreshed_at: Optional[float] = None
+
+    async def ensure_fresh(self, db, max_age: float = TRACKER_MAX_AGE_SECONDS):
+        if self.refreshed_at is None or time.monotonic() - self.refreshed_at > max_age:
+            await self.refresh(db)
+
+    def copy(self) -> "WorkloadTracker":
+        """Scratch copy for proposals, whose tentative loads must not stick"""
+        clone = WorkloadTracker()
+        clone.employees = {k: copy.copy(v) for k, v in self.employees.items()}
+        clone.refreshed_at = self.refreshed_at
+        return clone
+
+    async def refresh(self, db):
+        """Reload employees, their open load and their client centres"""
+        employees = {
+            user["id"]: EmployeeLoad(user["id"], user["username"])
+            async for user in db.users.find({"role": "employee"}, {"_id": 0, "id": 1, "username": 1})
+        }
+        async for counter in db[COUNTERS].find(
+            {"kind": "combo", "status": {"$in": OPEN_STATUSES}, "employee_id": {"$in": list(employees)}}
+        ):
+            employees[counter["employee_id"]].add(counter.get("priority"), max(0, counter.get("count", 0)))
+        async for centre in db.clients.aggregate([
+            {"$match": {"employee_id": {"$in": list(employees)}, "location": {"$ne": None}}},
+            {"$group": {"_id": "$employee_id", "lat": {"$avg": "$location.lat"}, "lng": {"$avg": "$location.lng"}}},
+        ]):
+            employees[centre["_id"]].home = (centre["lat"], centre["lng"])
+        self.employees = employees
+        self.refreshed_at = time.monotonic()
+
+    def score(self, load: EmployeeLoad, priority: Optional[str],
+              location: Optional[Coordinates]) -> Tuple[float, Optional[float]]:
+        distance = haversine_km(location, load.home) if location and load.home else None
+        score = LOAD_WEIGHT * load.weighted + DISTANCE_WEIGHT * (
+            UNKNOWN_DISTANCE_KM if distance is None else distance
+        )
+        if priority == "URGENT":
+            score += URGENT_WEIGHT * load.urgent
+        return score, distance
+
+    def best(self, priority: Optional[str], location: Optional[Coordinates]):
+        """Lowest-scoring employee as (load, score, distance_km), or None"""
+        best = None
+        for load in self.employees.values():
+            score, distance = self.score(load, priority, location)
+            if best is None or score < best[1]:
+                best = (load, score, distance)
+        return best
+
+
+async def propose_assignments(db, report_ids: Optional[List[str]] = None,
+                              limit: int = MAX_BATCH) -> List[Dict[str, Any]]:
+    """Pick an employee for each unassigned open report, without writing anything"""
+    await workload_tracker.ensure_fresh(db)
+    tracker = workload_tracker.copy()
+    if not tracker.employees:
+        return []
+
+    query: Dict[str, Any] = {"status": {"$in": OPEN_STATUSES}, "employee_id": None}
+    if report_ids:
+        query["id"] = {"$in": report_ids}
+    reports = await db.service_reports.find(
+        query, {"_id": 0, "id": 1, "client_id": 1, "client_name": 1, "priority": 1, "status": 1, "due_at": 1,
+                "overdue": 1}
+    ).limit(limit).to_list(limit)
+    reports.sort(key=lambda r: (PRIORITY_ORDER.get(r.get("priority"), 3), r.get("due_at") or datetime.max))
+    locations = await client_locations(db, list({r["client_id"] for r in reports if r.get("client_id")}))
+
+    proposals = []
+    for report in reports:
+        load, score, distance = tracker.best(report.get("priority"), locations.get(report.get("client_id")))
+        load.add(report.get("priority"))
+        proposals.append({
+            "report_id": report["id"],
+            "client_name": report.get("client_name"),
+            "priority": report.get("priority"),
+            "status": report.get("status"),
+            "overdue": bool(report.get("overdue")),
+            "employee_id": load.employee_id,
+            "employee_name": load.name,
+            "score": round(score, 2),
+            "distance_km": None if distance is None else round(distance, 1),
+        })
+    return proposals
+
+
+async def apply_assignments(db, proposals: List[Dict[str, Any]], assigned_by: str, role: str) -> int:
+    """Write proposals in one bulk_write; returns how many reports were assigned"""
+    if not proposals:
+        return 0
+    now = datetime.now()
+    ops = [
+        UpdateOne(
+            # Only still-unassigned reports, so a concurrent manual assignment wins
+            {"id": p["report_id"], "employee_id": None},
+            {
+                "$set": {"employee_id": p["employee_id"], "employee_name": p["employee_name"],
+                         "updated_at": now, "last_modified": now},
+                "$push": {"modification_history": {
+                    "modified_at": now,
+                    "modified_by": assigned_by,
+                    "modified_by_role": role,
+                    "changes": [f"Employee: unassigned → {p['employee_name']} (auto-assigned)"],
+                }},
+            },
+        )
+        for p in proposals
+    ]
+    result = await db.service_reports.bulk_write(ops, ordered=False)
+    try:
+        if result.modified_count == len(proposals):
+            await record_reports_changed(db, [
+                ({"status": p["status"], "employee_id": None, "priority": p["priority"], "overdue": p.get("overdue")},
+                 {"status": p["status"], "employee_id": p["employee_id"], "priority": p["priority"],
+                  "overdue": p.get("overdue")})
+                for p in proposals
+            ])
+            for p in proposals:
+                if p["employee_id"] in workload_tracker.employees:
+                    workload_tracker.employees[p["employee_id"]].add(p["priority"])
+        else:
+            # Some reports were assigned by hand meanwhile; which ones is unknown, so recount
+            await reconcile_counters(db)
+            workload_tracker.refreshed_at = None
+    except Exception as e:
+        logger.warning(f"Error updating report counters: {e}")
+    logger.info(f"✅ Auto-assigned {result.modified_count}/{len(proposals)} reports")
+    return result.modified_count
+
+
+async def workload(db) -> List[Dict[str, Any]]:
+    await workload_tracker.ensure_fresh(db)
+    loads = (load.as_dict() for load in workload_tracker.employees.values())
+    return sorted(loads, key=lambda e: -e["weighted_load"])
+
+
+workload_tracker = WorkloadTracker()
@@ -0,0 +1,111 @@
+"""Process-local or shared key/value cache.
+
+Short-lived state that must agree across uvicorn/gunicorn workers goes
+through `cache` instead of a module-level dict; today that is the API rate
+limiter (rate_limit.py). Durable shared state such as report counters lives
+in MongoDB. With CACHE_URL unset it is an in-memory store, which is correct
+for a single worker; with CACHE_URL=redis://... every worker shares one
+local Redis-compatible server (Redis, Valkey, KeyDB, Dragonfly).
+"""
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_URL = os.environ.get('CACHE_URL')
+CACHE_PREFIX = os.environ.get('CACHE_PREFIX', 'rog:')
+
+
+class MemoryCache:
+    """Per-process cache with TTLs; values are stored as-is"""
+
+    shared = False
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+
+    def _alive(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return None
+        return item
+
+    async def get(self, key: str) -> Any:
+        item = self._alive(key)
+        return item[0] if item else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        item = self._alive(key)
+        if item is None:
+            value, expires = 0, time.monotonic() + ttl if ttl else None
+        else:
+            value, expires = item
+        value += amount
+        self._data[key] = (value, expires)
+        return value
+
+    async def close(self):
+        self._data.clear()
+
+
+class RedisCache:
+    """Shared cache on a Redis-compatible server; values are JSON encoded"""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = CACHE_PREFIX):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Any:
+        raw = await self._redis.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        await self._redis.set(self._prefix + key, json.dumps(value, default=str),
+                              px=int(ttl * 1000) if ttl else None)
+
+    async def delete(self, key: str):
+        await self._redis.delete(self._prefix + key)
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        full_key = self._prefix + key
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incrby(full_key, amount)
+            if ttl:
+                # NX keeps the window anchored at the first increment
+                pipe.pexpire(full_key, int(ttl * 1000), nx=True)
+            value, *_ = await pipe.execute()
+        return int(value)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def create_cache():
+    if CACHE_URL:
+        try:
+            backend = RedisCache(CACHE_URL)
+            logger.info("✅ Using shared Redis cache")
+            return backend
+        except ImportError:
+            logger.error("❌ CACHE_URL is set but the redis package is not installed; using in-memory cache")
+    return MemoryCache()
+
+
+cache = create_cache()
@@ -0,0 +1,79 @@
+"""Client import from Excel, run as a background job.
+
+The spreadsheet is parsed in the job process pool (pandas and openpyxl are
+CPU-bound and would otherwise stall the event loop) into plain dicts. The
+rows are then inserted in batches: one query per batch finds the clients
+that already exist by name and address, and the rest go in with one
+insert_many. Duplicate rows within the file are imported once.
+"""
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from jobs import PermanentJobError, job_queue
+from search import client_tokens, name_key
+
+REQUIRED_COLUMNS = ("Name", "Address")
+IMPORT_BATCH = 500
+
+
+def parse_client_rows(contents: bytes) -> List[Dict[str, Optional[str]]]:
+    """Name/Address/Phone/Email of every usable row; runs in a worker process"""
+    from io import BytesIO
+
+    import pandas as pd
+
+    df = pd.read_excel(BytesIO(contents))
+    if not all(col in df.columns for col in REQUIRED_COLUMNS):
+        raise ValueError("Excel file must have 'Name' and 'Address' columns")
+
+    def cell(row, column: str) -> Optional[str]:
+        value = row.get(column)
+        return str(value).strip() if pd.notna(value) else None
+
+    return [
+        {"name": cell(row, "Name"), "address": cell(row, "Address"),
+         "phone": cell(row, "Phone"), "email": cell(row, "Email")}
+        for _, row in df.iterrows()
+        if pd.notna(row["Name"]) and pd.notna(row["Address"])
+    ]
+
+
+async def import_client_rows(db, rows: List[Dict[str, Optional[str]]], employee_id: Optional[str],
+                             job: Optional[Dict[str, Any]] = None) -> int:
+    """Insert the rows that are not existing clients; returns how many were imported"""
+    imported = 0
+    seen = set()
+    for start in range(0, len(rows), IMPORT_BATCH):
+        batch = rows[start:start + IMPORT_BATCH]
+        async for client in db.clients.find(
+            {"name": {"$in": list({row["name"] for row in batch})}}, {"_id": 0, "name": 1, "address": 1}
+        ):
+            seen.add((client["name"], client["address"]))
+
+        now = datetime.now()
+        new_clients = []
+        for row in batch:
+            if (row["name"], row["address"]) in seen:
+                continue
+            seen.add((row["name"], row["address"]))
+            client_data = {"id": str(uuid.uuid4()), **row, "employee_id": employee_id, "created_at": now}
+            client_data["search_tokens"] = client_tokens(client_data)
+            client_data["name_key"] = name_key(client_data["name"])
+            new_clients.append(client_data)
+        if new_clients:
+            await db.clients.insert_many(new_clients)
+            imported += len(new_clients)
+        if job is not None:
+            await job_queue.report_progress(db, job, start + len(batch), len(rows))
+    return imported
+
+
+async def import_clients_job(db, job: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        rows = await job_queue.run_cpu(parse_client_rows, job["blob"])
+    except Exception as e:
+        # Parsing the same bytes again gives the same result, so never retry
+        raise PermanentJobError(f"Error reading Excel file: {e}")
+    imported = await import_client_rows(db, rows, job["payload"].get("employee_id"), job)
+    return {"message": f"Successfully imported {imported} clients", "imported": imported}
@@ -0,0 +1,156 @@
+"""MongoDB connection supervisor with exponential backoff and a circuit breaker.
+
+The supervisor owns the "is Mongo usable" decision. A background task pings
+the server: while healthy it checks every MONGO_HEALTH_INTERVAL seconds,
+and after a failure it retries with exponential backoff (capped at
+MONGO_BACKOFF_MAX). Request handlers report connection errors through
+record_failure(), which opens the breaker immediately so the following
+requests get a fast 503 instead of each waiting out server selection.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from pymongo.errors import AutoReconnect, ConnectionFailure, NetworkTimeout, ServerSelectionTimeoutError
+
+logger = logging.getLogger(__name__)
+
+MONGO_HEALTH_INTERVAL = float(os.environ.get('MONGO_HEALTH_INTERVAL', '10'))
+MONGO_BACKOFF_BASE = float(os.environ.get('MONGO_BACKOFF_BASE', '0.5'))
+MONGO_BACKOFF_MAX = float(os.environ.get('MONGO_BACKOFF_MAX', '30'))
+
+CONNECTION_ERRORS = (ConnectionFailure, ServerSelectionTimeoutError, AutoReconnect, NetworkTimeout)
+
+CLOSED = "closed"        # healthy, requests flow
+OPEN = "open"            # failing, requests get 503 until the next probe succeeds
+HALF_OPEN = "half_open"  # probe in flight
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    return isinstance(exc, CONNECTION_ERRORS)
+
+
+class MongoSupervisor:
+    def __init__(self):
+        self.state = OPEN
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_change: Optional[datetime] = None
+        self.next_probe_at = 0.0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._ping: Optional[Callable[[], Awaitable]] = None
+        self._on_change: Optional[Callable[[bool], Awaitable]] = None
+
+    @property
+    def available(self) -> bool:
+        return self.state == CLOSED
+
+    def _transition(self, state: str) -> bool:
+        """Switch state; returns True when availability flipped"""
+        if state == self.state:
+            return False
+        was_available = self.available
+        self.state = state
+        self.last_change = datetime.now()
+        return self.available != was_available
+
+    async def _notify(self):
+        if self._on_change is None:
+            return
+        try:
+            await self._on_change(self.available)
+        except Exception as e:
+            logger.error(f"Error in Mongo state change handler: {e}")
+
+    async def _set_state(self, state: str):
+        if self._transition(state):
+            await self._notify()
+
+    def backoff(self) -> float:
+        delay = min(MONGO_BACKOFF_MAX, MONGO_BACKOFF_BASE * (2 ** max(0, self.failures - 1)))
+        # Jitter so several workers do not probe in lockstep
+        return delay * random.uniform(0.8, 1.2)
+
+    async def probe(self) -> bool:
+        """Ping once and update the breaker; returns True when healthy"""
+        if self.state == OPEN:
+            await self._set_state(HALF_OPEN)
+        try:
+            await self._ping()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            self.next_probe_at = time.monotonic() + self.backoff()
+            if self.state != OPEN:
+                logger.error(f"❌ MongoDB unavailable ({self.failures} consecutive failures): {e}")
+            await self._set_state(OPEN)
+            return False
+        if self.state != CLOSED:
+            logger.info(f"✅ MongoDB connection healthy after {self.failures} failed probes")
+        self.failures = 0
+        self.last_error = None
+        await self._set_state(CLOSED)
+        return True
+
+    def record_failure(self, exc: BaseException):
+        """Called from request handlers; trips the breaker on connection errors"""
+        if not is_connection_error(exc) or self.state == OPEN:
+            return
+        self.failures += 1
+        self.last_error = str(exc)
+        self.next_probe_at = time.monotonic() + self.backoff()
+        logger.error(f"❌ MongoDB connection error, opening circuit: {exc}")
+        if self._transition(OPEN):
+            # The state handler is async; run it without blocking the request
+            asyncio.get_running_loop().create_task(self._notify())
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            if self.state == CLOSED:
+                delay = MONGO_HEALTH_INTERVAL
+            else:
+                delay = max(0.0, self.next_probe_at - time.monotonic())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                # Woken by record_failure: honour the backoff before probing
+                continue
+            except asyncio.TimeoutError:
+                pass
+            await self.probe()
+
+    async def start(self, ping: Callable[[], Awaitable], on_change: Optional[Callable[[bool], Awaitable]] = None):
+        """Start supervising in the background; the first probe runs immediately.
+        
+        Startup does not wait for it, so an unreachable cluster never delays
+        the server from accepting connections.
+        """
+        self._ping = ping
+        self._on_change = on_change
+        self.next_probe_at = 0.0
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self):
+        retry_in = max(0.0, self.next_probe_at - time.monotonic()) if self.state != CLOSED else None
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "last_error": self.last_error,
+            "last_change": self.last_change,
+            "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None,
+        }
+
+
+mongo_supervisor = MongoSupervisor()
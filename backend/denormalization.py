@@ -0,0 +1,95 @@
+"""Propagation of client name/address changes to their reports.
+
+Reports keep a copy of `client_name` and `client_address` so lists and
+filters never join. When a client changes, a task keyed by client_id is
+upserted into `client_propagation` with an incremented version; the worker
+rewrites the client's stale reports in batches and then checkpoints the
+version it applied. Reprocessing is harmless: only reports whose copy still
+differs are touched, so a crash mid-batch just resumes, and an edit made
+while a task runs bumps the version and schedules another pass. Rewritten
+reports get a new `updated_at` so incremental readers (analytics) see them.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict
+
+from pymongo import ReturnDocument, UpdateOne
+
+from archive import ARCHIVE
+from search import report_tokens
+
+logger = logging.getLogger(__name__)
+
+TASKS = "client_propagation"
+BATCH_SIZE = 500
+
+
+async def ensure_propagation_indexes(db):
+    await db.service_reports.create_index([("client_id", 1)])
+    # The archive already has a (client_id, request_date) index
+    await db[TASKS].create_index([("pending", 1), ("requested_at", 1)])
+
+
+async def enqueue_client_change(db, client: Dict[str, Any]):
+    """Record that reports of this client must carry its new name/address"""
+    await db[TASKS].update_one(
+        {"_id": client["id"]},
+        {
+            "$set": {
+                "name": client["name"],
+                "address": client["address"],
+                "pending": True,
+                "requested_at": datetime.now(),
+            },
+            "$inc": {"version": 1},
+        },
+        upsert=True,
+    )
+
+
+async def _propagate(db, task: Dict[str, Any]) -> int:
+    stale = {
+        "client_id": task["_id"],
+        "$or": [{"client_name": {"$ne": task["name"]}}, {"client_address": {"$ne": task["address"]}}],
+    }
+    # Fields the search tokens are built from, besides the two being replaced
+    projection = {"_id": 1, "description": 1, "employee_notes": 1, "admin_notes": 1}
+    updated = 0
+    # Archived reports are rewritten too so history filters by name stay correct
+    for collection in (db.service_reports, db[ARCHIVE]):
+        while True:
+            docs = await collection.find(stale, projection).limit(BATCH_SIZE).to_list(BATCH_SIZE)
+            if not docs:
+                break
+            ops = []
+            now = datetime.now()
+            for doc in docs:
+                doc.update(client_name=task["name"], client_address=task["address"])
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+                    "client_name": task["name"],
+                    "client_address": task["address"],
+                    "search_tokens": report_tokens(doc),
+                    "updated_at": now,
+                }}))
+            await collection.bulk_write(ops, ordered=False)
+            updated += len(ops)
+    return updated
+
+
+async def process_propagation_tasks(db, limit: int = 100) -> int:
+    """Apply pending client changes; returns the number of reports rewritten"""
+    total = 0
+    tasks = await db[TASKS].find({"pending": True}).sort("requested_at", 1).limit(limit).to_list(limit)
+    for task in tasks:
+        updated = await _propagate(db, task)
+        total += updated
+        # Checkpoint only the version we applied; a newer edit keeps the task pending
+        done = await db[TASKS].find_one_and_update(
+            {"_id": task["_id"], "version": task["version"]},
+            {"$set": {"pending": False, "applied_version": task["version"], "applied_at": datetime.now()}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated:
+            logger.info(f"✅ Propagated client {task['_id']} to {updated} reports"
+                        f"{'' if done else ' (newer change queued)'}")
+    return total
@@ -0,0 +1,184 @@
+"""Opt-in runtime diagnostics: event-loop blocking detector and route profiler.
+
+Enable with DIAGNOSTICS_ENABLED=true. The loop monitor logs the event-loop
+thread's stack whenever a single callback keeps the loop busy for longer than
+LOOP_BLOCK_THRESHOLD_MS. The route profiler runs cProfile around the next
+requests whose path starts with an armed prefix and keeps a pstats summary.
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DIAGNOSTICS_ENABLED = os.environ.get('DIAGNOSTICS_ENABLED', 'false').lower() == 'true'
+LOOP_BLOCK_THRESHOLD_MS = float(os.environ.get('LOOP_BLOCK_THRESHOLD_MS', '100'))
+LOOP_SAMPLE_INTERVAL_MS = float(os.environ.get('LOOP_SAMPLE_INTERVAL_MS', '20'))
+MAX_BLOCK_EVENTS = 100
+
+
+class LoopMonitor:
+    """Detects callbacks that block the asyncio event loop.
+
+    A coroutine on the loop refreshes a heartbeat every sample interval; a
+    watchdog thread compares the heartbeat against the wall clock and, once it
+    is stale by more than the threshold, captures the loop thread's stack.
+    Only one stack is captured per blocking episode.
+    """
+
+    def __init__(self, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS,
+                 interval_ms: float = LOOP_SAMPLE_INTERVAL_MS):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.events: deque = deque(maxlen=MAX_BLOCK_EVENTS)
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def _beat(self):
+        while True:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        reported_for = None
+        while not self._stop.wait(self.interval):
+            beat = self._heartbeat
+            lag = time.monotonic() - beat
+            if lag < self.threshold + self.interval or reported_for == beat:
+                continue
+            reported_for = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame else ''
+            event = {
+                "detected_at": datetime.now().isoformat(),
+                "blocked_ms": round(lag * 1000, 1),
+                "stack": stack,
+            }
+            self.events.append(event)
+            logger.warning(f"⚠️ Event loop blocked for {event['blocked_ms']} ms:\n{stack}")
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"✅ Event loop monitor started (threshold {self.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def recent_events(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return list(self.events)[-limit:][::-1]
+
+
+class ProfileRun:
+    """One arming of the route profiler: its prefix, budget and profile"""
+
+    def __init__(self, prefix: str, requests: int, sort_by: str):
+        self.prefix = prefix
+        self.remaining = max(1, requests)
+        self.sort_by = sort_by
+        self.profile = cProfile.Profile()
+
+
+class RouteProfiler:
+    """Profiles the next N requests whose path starts with an armed prefix.
+
+    cProfile hooks the whole thread, not a coroutine: while a profiled
+    request is suspended on an await, whatever else the event loop runs
+    (other requests, background tasks) is recorded too and attributed to the
+    armed route. Profile under light load, or read the stats with that in
+    mind. Re-arming while a request is being profiled starts a new run; the
+    old request finishes against its own, superseded run, which is discarded.
+    """
+
+    def __init__(self):
+        self._run: Optional[ProfileRun] = None
+        self._running = False
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    @property
+    def armed_prefix(self) -> Optional[str]:
+        return self._run.prefix if self._run else None
+
+    @property
+    def remaining(self) -> int:
+        return self._run.remaining if self._run else 0
+
+    def arm(self, prefix: str, requests: int = 1, sort_by: str = "cumulative"):
+        self._run = ProfileRun(prefix, requests, sort_by)
+        self.last_result = None
+
+    def matches(self, path: str) -> bool:
+        return self._run is not None and self._run.remaining > 0 and path.startswith(self._run.prefix)
+
+    def _finish(self, run: ProfileRun):
+        if self._run is not run:
+            # Re-armed meanwhile; a superseded run's stats are discarded
+            return
+        stream = io.StringIO()
+        stats = pstats.Stats(run.profile, stream=stream)
+        stats.sort_stats(run.sort_by).print_stats(40)
+        self.last_result = {
+            "route": run.prefix,
+            "captured_at": datetime.now().isoformat(),
+            "sort_by": run.sort_by,
+            "stats": stream.getvalue(),
+        }
+        self._run = None
+
+    async def profile(self, call):
+        """Run the awaitable factory ``call`` under the armed profiler."""
+        run = self._run
+        if run is None:
+            return await call()
+        # cProfile cannot nest; concurrent matching requests run unprofiled
+        if self._running:
+            return await call()
+        self._running = True
+        run.profile.enable()
+        try:
+            return await call()
+        finally:
+            run.profile.disable()
+            self._running = False
+            run.remaining -= 1
+            if run.remaining == 0:
+                self._finish(run)
+
+
+loop_monitor = LoopMonitor()
+route_profiler = RouteProfiler()
+
+
+class ProfilerMiddleware:
+    """ASGI middleware that hands matching requests to the route profiler."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not route_profiler.matches(scope.get("path", "")):
+            await self.app(scope, receive, send)
+            return
+        await route_profiler.profile(lambda: self.app(scope, receive, send))
@@ -0,0 +1,259 @@
+"""Client coordinates, resolved once per unique address.
+
+Addresses are free text, so each one is reduced to a normalized key (case,
+accents, punctuation and spacing ignored). `geocode_cache` holds one
+document per key with the coordinates, or a not-found marker that is
+retried after NOT_FOUND_RETRY_DAYS or as soon as GEOCODE_CSV changes. A
+background job picks up clients without a `geo_key` (new, imported, or
+whose address changed), resolves the keys missing from the cache in one
+batch, and writes `location` and `geo_key` back onto the clients, so
+nothing geocodes per request. A client that could not be located gets no
+`geo_key`; it is picked up again once its `geo_retry_at` passes or the
+table changes.
+
+Resolvers are pluggable, like the cache backends:
+
+- TableResolver (default): the offline GEOCODE_CSV table, `address,lat,lng`
+  columns. It is also the local stand-in for development and tests.
+- NominatimResolver: any Nominatim-compatible service at GEOCODER_URL,
+  paced to one request per GEOCODER_MIN_INTERVAL seconds.
+
+Rows of GEOCODE_CSV with a `client_id` pin that client's coordinates
+whatever the resolver says, for addresses geocoders get wrong.
+"""
+import asyncio
+import csv
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from search import tokenize
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_CSV = Path(os.environ.get('GEOCODE_CSV', Path(__file__).parent / 'geocodes.csv'))
+GEOCODER_URL = os.environ.get('GEOCODER_URL')
+GEOCODER_MIN_INTERVAL = float(os.environ.get('GEOCODER_MIN_INTERVAL', '1.0'))
+GEOCODE_CACHE = "geocode_cache"
+GEOCODE_BATCH = 500
+NOT_FOUND_RETRY_DAYS = 30
+
+Coordinates = Tuple[float, float]
+
+
+def address_key(address: Optional[str]) -> str:
+    """Case-, accent- and punctuation-insensitive key for an address"""
+    return " ".join(tokenize(address))
+
+
+class GeocodeTable:
+    def __init__(self, path: Path):
+        self.path = path
+        self.by_client: Dict[str, Coordinates] = {}
+        self.by_address: Dict[str, Coordinates] = {}
+        self._mtime: Optional[float] = None
+
+    def _reload_if_changed(self):
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            self.by_client, self.by_address, self._mtime = {}, {}, None
+            return
+        if mtime == self._mtime:
+            return
+        by_client: Dict[str, Coordinates] = {}
+        by_address: Dict[str, Coordinates] = {}
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                try:
+                    coordinates = (float(row["lat"]), float(row["lng"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if row.get("client_id"):
+                    by_client[row["client_id"]] = coordinates
+                key = address_key(row.get("address"))
+                if key:
+                    by_address[key] = coordinates
+        self.by_client, self.by_address, self._mtime = by_client, by_address, mtime
+        logger.info(f"✅ Loaded {len(by_address)} geocoded addresses from {self.path}")
+
+    def version(self) -> Optional[float]:
+        """Modification time of the loaded table; misses are only trusted while it holds"""
+        self._reload_if_changed()
+        return self._mtime
+
+    def lookup_client(self, client_id: Optional[str]) -> Optional[Coordinates]:
+        self._reload_if_changed()
+        return self.by_client.get(client_id) if client_id else None
+
+    def lookup_address(self, key: str) -> Optional[Coordinates]:
+        self._reload_if_changed()
+        return self.by_address.get(key)
+
+
+class TableResolver:
+    """Resolves addresses from the offline geocode table"""
+
+    name = "table"
+
+    def __init__(self, table: GeocodeTable):
+        self.table = table
+
+    async def resolve(self, addresses: Dict[str, str]) -> Dict[str, Optional[Coordinates]]:
+        return {key: self.table.lookup_address(key) for key in addresses}
+
+
+class NominatimResolver:
+    """Resolves addresses one by one against a Nominatim-compatible search API"""
+
+    name = "nominatim"
+
+    def __init__(self, url: str, min_interval: float = GEOCODER_MIN_INTERVAL):
+        import requests
+        self.url = url.rstrip("/")
+        self.min_interval = min_interval
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "rog-pool-service"
+        self._last_request = 0.0
+
+    def _search(self, address: str) -> Optional[Coordinates]:
+        response = self.session.get(f"{self.url}/search", params={"q": address, "format": "json", "limit": 1},
+                                    timeout=10)
+        response.raise_for_status()
+        results = response.json()
+        if not results:
+            return None
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+    async def resolve(self, addresses: Dict[str, str]) -> Dict[str, Optional[Coordinates]]:
+        resolved = {}
+        for key, address in addresses.items():
+            wait = self._last_request + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_request = time.monotonic()
+            resolved[key] = await asyncio.to_thread(self._search, address)
+        return resolved
+
+
+def create_resolver():
+    if GEOCODER_URL:
+        try:
+            resolver = NominatimResolver(GEOCODER_URL)
+            logger.info(f"✅ Geocoding addresses through {GEOCODER_URL}")
+            return resolver
+        except ImportError:
+            logger.error("❌ GEOCODER_URL is set but the requests package is not installed; using geocode table")
+    return TableResolver(geocode_table)
+
+
+async def ensure_geocode_indexes(db):
+    await db.clients.create_index("geo_key")
+
+
+async def cached_coordinates(db, resolver, addresses: Dict[str, str],
+                             now: Optional[datetime] = None) -> Dict[str, Optional[Coordinates]]:
+    """Coordinates for address keys, resolving only keys the cache lacks"""
+    now = now or datetime.now()
+    retry_before = now - timedelta(days=NOT_FOUND_RETRY_DAYS)
+    table_version = geocode_table.version()
+    known: Dict[str, Optional[Coordinates]] = {}
+    async for entry in db[GEOCODE_CACHE].find({"_id": {"$in": list(addresses)}}):
+        if entry.get("lat") is not None:
+            known[entry["_id"]] = (entry["lat"], entry["lng"])
+        elif entry.get("resolved_at") and entry["resolved_at"] > retry_before \
+                and entry.get("table_version") == table_version:
+            known[entry["_id"]] = None
+
+    missing = {key: address for key, address in addresses.items() if key not in known}
+    if missing:
+        resolved = await resolver.resolve(missing)
+        await db[GEOCODE_CACHE].bulk_write([
+            UpdateOne({"_id": key}, {"$set": {
+                "address": missing[key],
+                "lat": coordinates[0] if coordinates else None,
+                "lng": coordinates[1] if coordinates else None,
+                "resolver": resolver.name,
+                "resolved_at": now,
+                "table_version": table_version,
+            }}, upsert=True)
+            for key, coordinates in resolved.items()
+        ], ordered=False)
+        known.update(resolved)
+    return known
+
+
+async def geocode_pending_clients(db, resolver=None, limit: int = GEOCODE_BATCH,
+                                  now: Optional[datetime] = None) -> int:
+    """Give clients without a geo_key their coordinates; returns how many were tried"""
+    resolver = resolver or default_resolver
+    now = now or datetime.now()
+    table_version = geocode_table.version()
+    clients = await db.clients.find(
+        {"geo_key": {"$exists": False}, "$or": [
+            {"geo_retry_at": {"$exists": False}},
+            {"geo_retry_at": {"$lte": now}},
+            {"geo_table_version": {"$ne": table_version}},
+        ]},
+        {"_id": 0, "id": 1, "address": 1}
+    ).limit(limit).to_list(limit)
+    if not clients:
+        return 0
+
+    pinned = {c["id"]: geocode_table.lookup_client(c["id"]) for c in clients}
+    addresses = {address_key(c.get("address")): c.get("address") for c in clients if not pinned[c["id"]]}
+    addresses.pop("", None)
+    coordinates = await cached_coordinates(db, resolver, addresses, now) if addresses else {}
+
+    ops = []
+    located = 0
+    for client in clients:
+        key = address_key(client.get("address"))
+        point = pinned[client["id"]] or coordinates.get(key)
+        if point:
+            located += 1
+            update = {"$set": {"geo_key": key, "location": {"lat": point[0], "lng": point[1]}},
+                      "$unset": {"geo_retry_at": "", "geo_table_version": ""}}
+        else:
+            # No geo_key, so it is tried again when the not-found entry expires or the table changes
+            update = {"$set": {
+                "location": None,
+                "geo_retry_at": now + timedelta(days=NOT_FOUND_RETRY_DAYS),
+                "geo_table_version": table_version,
+            }}
+        # An address edited while this batch resolved is left for the next run
+        ops.append(UpdateOne({"id": client["id"], "address": client.get("address")}, update))
+    await db.clients.bulk_write(ops, ordered=False)
+    logger.info(f"✅ Geocoded {located}/{len(clients)} clients "
+                f"({len(addresses)} unique addresses)")
+    return len(clients)
+
+
+async def geocode_all_pending(db, resolver=None) -> int:
+    """Drain the backlog of clients awaiting coordinates, batch by batch"""
+    total = 0
+    while True:
+        updated = await geocode_pending_clients(db, resolver)
+        total += updated
+        if updated < GEOCODE_BATCH:
+            return total
+
+
+async def client_locations(db, client_ids: List[str]) -> Dict[str, Coordinates]:
+    """Known coordinates of the given clients, from their stored location"""
+    locations: Dict[str, Coordinates] = {}
+    async for client in db.clients.find(
+        {"id": {"$in": client_ids}, "location": {"$ne": None}}, {"_id": 0, "id": 1, "location": 1}
+    ):
+        location: Dict[str, Any] = client["location"]
+        locations[client["id"]] = (location["lat"], location["lng"])
+    return locations
+
+
+geocode_table = GeocodeTable(GEOCODE_CSV)
+default_resolver = create_resolver()
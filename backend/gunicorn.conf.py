@@ -0,0 +1,23 @@
+# Gunicorn config for multi-worker deployments
+#
+#   cd backend && gunicorn server:app -c gunicorn.conf.py
+#
+# Each worker is a uvicorn event loop with its own Mongo client (created
+# lazily in startup, after the fork). Set CACHE_URL=redis://localhost:6379/0
+# so counters and rate limits are shared between workers.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8001')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Import the app once in the master; safe because nothing opens sockets or
+# Mongo connections at import time
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers periodically to bound memory growth from large uploads
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = None
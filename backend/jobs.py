@@ -0,0 +1,357 @@
+"""Background job queue for work that must not run inside request handlers.
+
+Jobs are documents in the `jobs` collection. Every worker process runs a
+JobQueue loop that claims queued jobs with find_one_and_update, highest
+priority first and then oldest, so each job runs on exactly one worker.
+A running job holds a lease that its worker renews every heartbeat; if the
+worker dies the lease lapses and the job is queued again. A handler that
+raises is retried with exponential backoff until max_attempts, unless it
+raises PermanentJobError (bad input), which fails the job at once.
+
+Handlers are coroutines `handler(db, job) -> result dict`, registered per
+job type together with how many jobs of that type one worker process may
+run at a time. CPU-bound steps go through `job_queue.run_cpu`, a process
+pool started with forkserver (forking a process that already runs Motor
+and logging threads can deadlock the child), so parsing a spreadsheet or
+planning a route never stalls the event loop. Uploaded input
+travels in the job's `blob` field, which is dropped once the job finishes.
+
+Finished jobs are deleted JOB_RETENTION_DAYS after they end (TTL index),
+along with any files they produced in JOB_FILES_DIR.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+JOBS = "jobs"
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+JOB_PROCESSES = int(os.environ.get('JOB_PROCESSES', '2'))
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', '2'))
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', '7'))
+JOB_FILES_DIR = Path(os.environ.get('JOB_FILES_DIR', Path(__file__).parent / 'job_files'))
+JOB_LEASE_SECONDS = 60
+RETRY_BASE_SECONDS = 10
+# Mongo documents are capped at 16 MB; leave room for the rest of the job
+MAX_BLOB_BYTES = 12 * 1024 * 1024
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+Handler = Callable[[Any, Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class PermanentJobError(Exception):
+    """The job cannot succeed however often it is retried"""
+
+
+class JobType:
+    __slots__ = ("name", "handler", "concurrency", "max_attempts", "timeout")
+
+    def __init__(self, name: str, handler: Handler, concurrency: int, max_attempts: int, timeout: float):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """A job as returned by the API, without its blob"""
+    return {k: v for k, v in job.items() if k not in ("_id", "blob")}
+
+
+class JobQueue:
+    def __init__(self):
+        self.types: Dict[str, JobType] = {}
+        self.running: Dict[str, int] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+        self._last_sweep = 0.0
+        # Set in run(), after any fork: preloaded gunicorn workers share the master's pid until then
+        self.worker_id: Optional[str] = None
+
+    def register(self, name: str, handler: Handler, concurrency: int = 1,
+                 max_attempts: int = 3, timeout: float = 3600):
+        self.types[name] = JobType(name, handler, concurrency, max_attempts, timeout)
+        self.running.setdefault(name, 0)
+        self.stats.setdefault(name, {"succeeded": 0, "failed": 0, "retried": 0, "seconds": 0.0})
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def run_cpu(self, fn, *args):
+        """Run a picklable function in the job process pool"""
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ProcessPoolExecutor(
+                max_workers=JOB_PROCESSES, mp_context=multiprocessing.get_context("forkserver")
+            )
+            self._pool_pid = os.getpid()
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    async def submit(self, db, job_type: str, payload: Optional[Dict[str, Any]] = None, priority: int = 0,
+                     submitted_by: Optional[str] = None, blob: Optional[bytes] = None) -> Dict[str, Any]:
+        """Queue a job; higher priorities are claimed first"""
+        if job_type not in self.types:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if blob is not None and len(blob) > MAX_BLOB_BYTES:
+            raise PermanentJobError(f"Job input is larger than {MAX_BLOB_BYTES // (1024 * 1024)} MB")
+        now = datetime.now()
+        job_id = str(uuid.uuid4())
+        job = {
+            "_id": job_id,
+            "id": job_id,
+            "type": job_type,
+            "status": "queued",
+            "priority": priority,
+            "payload": payload or {},
+            "attempts": 0,
+            "max_attempts": self.types[job_type].max_attempts,
+            "submitted_by": submitted_by,
+            "created_at": now,
+            "run_after": now,
+            "started_at": None,
+            "finished_at": None,
+            "progress": None,
+            "result": None,
+            "error": None,
+        }
+        await db[JOBS].insert_one({**job, "blob": blob} if blob is not None else job)
+        self.wake()
+        return public_job(job)
+
+    async def cancel(self, db, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job, or ask the worker running it to stop"""
+        job = await db[JOBS].find_one_and_update(
+            {"_id": job_id, "status": "queued"},
+            {"$set": {"status": "cancelled", "finished_at": datetime.now()}, "$unset": {"blob": ""}},
+            projection={"blob": 0}, return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            job = await db[JOBS].find_one_and_update(
+                {"_id": job_id, "status": "running"}, {"$set": {"cancel_requested": True}},
+                projection={"blob": 0}, return_document=ReturnDocument.AFTER
+            )
+            if job is not None and job_id in self.tasks:
+                self.tasks[job_id].cancel()
+        return job or await db[JOBS].find_one({"_id": job_id}, {"blob": 0})
+
+    async def wait(self, db, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The job once finished, or None if it is still going after timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await db[JOBS].find_one({"_id": job_id}, {"blob": 0})
+            if job is None or job["status"] in FINISHED:
+                return job
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(0.25)
+
+    async def report_progress(self, db, job: Dict[str, Any], done: int, total: Optional[int] = None):
+        await db[JOBS].update_one({"_id": job["_id"]}, {"$set": {"progress": {"done": done, "total": total}}})
+
+    async def _sweep(self, db):
+        """Requeue jobs whose worker stopped renewing the lease; drop expired files"""
+        now = datetime.now()
+        async for job in db[JOBS].find(
+            {"status": "running", "lease_expires_at": {"$lt": now}},
+            {"_id": 1, "attempts": 1, "max_attempts": 1, "cancel_requested": 1}
+        ):
+            if job.get("cancel_requested") or job["attempts"] >= job["max_attempts"]:
+                update = {"$set": {
+                    "status": "cancelled" if job.get("cancel_requested") else "failed",
+                    "error": "Worker stopped while running the job",
+                    "finished_at": now,
+                }, "$unset": {"blob": ""}}
+            else:
+                update = {"$set": {"status": "queued", "run_after": now}}
+            await db[JOBS].update_one({"_id": job["_id"], "status": "running",
+                                       "lease_expires_at": {"$lt": now}}, update)
+        await asyncio.to_thread(purge_job_files)
+
+    async def _claim(self, db, worker_id: str) -> Optional[Dict[str, Any]]:
+        free = [name for name, job_type in self.types.items() if self.running[name] < job_type.concurrency]
+        if not free:
+            return None
+        now = datetime.now()
+        return await db[JOBS].find_one_and_update(
+            {"status": "queued", "type": {"$in": free}, "run_after": {"$lte": now}},
+            {"$set": {"status": "running", "started_at": now, "worker": worker_id,
+                      "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS)},
+             "$inc": {"attempts": 1}},
+            sort=[("priority", -1), ("run_after", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _heartbeat(self, db, owned: Dict[str, Any], task: asyncio.Task):
+        job_id = owned["_id"]
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                job = await db[JOBS].find_one_and_update(
+                    owned,
+                    {"$set": {"lease_expires_at": datetime.now() + timedelta(seconds=JOB_LEASE_SECONDS)}},
+                    projection={"cancel_requested": 1}
+                )
+            except Exception as e:
+                logger.warning(f"Error renewing job lease {job_id}: {e}")
+                continue
+            if job is None or job.get("cancel_requested"):
+                # Cancelled, or the lease lapsed and another worker owns the job now
+                task.cancel()
+                return
+
+    async def _execute(self, db, job: Dict[str, Any], worker_id: str):
+        job_type = self.types[job["type"]]
+        job_id = job["_id"]
+        started = time.monotonic()
+        # Writes only land while this claim still holds the job; a reclaim bumps attempts
+        owned = {"_id": job_id, "status": "running", "worker": worker_id, "attempts": job["attempts"]}
+        heartbeat = asyncio.create_task(self._heartbeat(db, owned, asyncio.current_task()))
+        stats = self.stats[job_type.name]
+        try:
+            result = await asyncio.wait_for(job_type.handler(db, job), job_type.timeout)
+            await db[JOBS].update_one(owned, {
+                "$set": {"status": "succeeded", "result": result, "finished_at": datetime.now(), "error": None},
+                "$unset": {"blob": ""},
+            })
+            stats["succeeded"] += 1
+            logger.info(f"✅ Job {job_type.name} {job_id} finished in {time.monotonic() - started:.1f}s")
+        except asyncio.CancelledError:
+            current = await db[JOBS].find_one({"_id": job_id}, {"cancel_requested": 1, "status": 1})
+            if current and current.get("cancel_requested"):
+                await db[JOBS].update_one(owned, {
+                    "$set": {"status": "cancelled", "finished_at": datetime.now()}, "$unset": {"blob": ""}
+                })
+                logger.info(f"Job {job_type.name} {job_id} cancelled")
+            else:
+                # Shutting down or lease lost: the sweep requeues it
+                raise
+        except Exception as e:
+            error = "Timed out" if isinstance(e, asyncio.TimeoutError) else str(e) or type(e).__name__
+            if isinstance(e, PermanentJobError) or job["attempts"] >= job["max_attempts"]:
+                await db[JOBS].update_one(owned, {
+                    "$set": {"status": "failed", "error": error, "finished_at": datetime.now()},
+                    "$unset": {"blob": ""},
+                })
+                stats["failed"] += 1
+                logger.error(f"❌ Job {job_type.name} {job_id} failed: {error}")
+            else:
+                delay = RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+                await db[JOBS].update_one(owned, {"$set": {
+                    "status": "queued", "error": error, "run_after": datetime.now() + timedelta(seconds=delay),
+                }})
+                stats["retried"] += 1
+                logger.warning(f"Job {job_type.name} {job_id} failed (attempt {job['attempts']}), "
+                               f"retrying in {delay}s: {error}")
+        finally:
+            heartbeat.cancel()
+            stats["seconds"] += time.monotonic() - started
+            self.running[job_type.name] -= 1
+            self.tasks.pop(job_id, None)
+            self.wake()
+
+    async def run(self, get_db):
+        """Claim and run jobs in this worker process; get_db returns None while Mongo is down"""
+        self._wake = asyncio.Event()
+        self.worker_id = worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        while True:
+            self._wake.clear()
+            db = get_db()
+            if db is not None:
+                try:
+                    if time.monotonic() - self._last_sweep > JOB_LEASE_SECONDS:
+                        self._last_sweep = time.monotonic()
+                        await self._sweep(db)
+                    while len(self.tasks) < JOB_WORKERS:
+                        job = await self._claim(db, worker_id)
+                        if job is None:
+                            break
+                        self.running[job["type"]] += 1
+                        self.tasks[job["_id"]] = asyncio.create_task(self._execute(db, job, worker_id))
+                except Exception as e:
+                    logger.warning(f"Error polling job queue: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def shutdown(self):
+        for task in self.tasks.values():
+            task.cancel()
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def local_status(self) -> Dict[str, Any]:
+        return {
+            "worker": self.worker_id,
+            "running": dict(self.running),
+            "capacity": JOB_WORKERS,
+            "stats": {name: {**s, "seconds": round(s["seconds"], 1)} for name, s in self.stats.items()},
+        }
+
+
+async def ensure_job_indexes(db):
+    await db[JOBS].create_index([("status", 1), ("priority", -1), ("run_after", 1)])
+    await db[JOBS].create_index([("status", 1), ("lease_expires_at", 1)])
+    await db[JOBS].create_index([("submitted_by", 1), ("created_at", -1)])
+    await db[JOBS].create_index("finished_at", expireAfterSeconds=JOB_RETENTION_DAYS * 86400)
+
+
+def job_file(name: str) -> Path:
+    JOB_FILES_DIR.mkdir(parents=True, exist_ok=True)
+    return JOB_FILES_DIR / name
+
+
+def purge_job_files():
+    if not JOB_FILES_DIR.is_dir():
+        return
+    cutoff = time.time() - JOB_RETENTION_DAYS * 86400
+    for path in JOB_FILES_DIR.iterdir():
+        if path.is_file() and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+
+
+async def job_metrics(db) -> Dict[str, Any]:
+    """Jobs per type and status, queue age, and run times over the last day"""
+    now = datetime.now()
+    by_type: Dict[str, Dict[str, Any]] = {}
+    async for row in db[JOBS].aggregate([{"$group": {"_id": {"type": "$type", "status": "$status"}, "count": {"$sum": 1}}}]):
+        by_type.setdefault(row["_id"]["type"], {})[row["_id"]["status"]] = row["count"]
+    async for row in db[JOBS].aggregate([
+        {"$match": {"status": "queued", "run_after": {"$lte": now}}},
+        {"$group": {"_id": "$type", "oldest": {"$min": "$run_after"}}},
+    ]):
+        by_type.setdefault(row["_id"], {})["oldest_queued_seconds"] = round((now - row["oldest"]).total_seconds(), 1)
+    async for row in db[JOBS].aggregate([
+        {"$match": {"status": "succeeded", "finished_at": {"$gte": now - timedelta(days=1)}}},
+        {"$project": {"type": 1, "ms": {"$subtract": ["$finished_at", "$started_at"]}}},
+        {"$group": {"_id": "$type", "avg_ms": {"$avg": "$ms"}, "max_ms": {"$max": "$ms"}}},
+    ]):
+        by_type.setdefault(row["_id"], {}).update(
+            avg_seconds_24h=round(row["avg_ms"] / 1000, 2), max_seconds_24h=round(row["max_ms"] / 1000, 2)
+        )
+    return {"types": by_type, "worker": job_queue.local_status()}
+
+
+async def list_jobs(db, query: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+    jobs = await db[JOBS].find(query, {"blob": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+    return [public_job(job) for job in jobs]
+
+
+job_queue = JobQueue()
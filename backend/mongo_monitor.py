@@ -0,0 +1,197 @@
+"""Mongo command monitoring: slow-query log and explain-plan capture.
+
+A pymongo CommandListener records every find/aggregate/count/update/delete
+slower than SLOW_QUERY_THRESHOLD_MS, grouped by query shape (the filter with
+its values replaced by placeholders). A background task periodically runs
+explain() for the worst shapes so collection scans show up as COLLSCAN.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '100'))
+EXPLAIN_INTERVAL_SECONDS = int(os.environ.get('EXPLAIN_INTERVAL_SECONDS', '300'))
+EXPLAIN_TOP_N = 5
+MAX_SHAPES = 500
+
+# Commands whose first argument is the collection name
+MONITORED_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+
+def query_shape(value: Any) -> Any:
+    """Replace literal values with a type placeholder, keeping operators and field names"""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        # $in/$or arrays collapse to the shape of their first element
+        return [query_shape(value[0])] if value else []
+    return type(value).__name__
+
+
+def _command_filter(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the filter and sort a command would use, for shape and explain"""
+    if command_name == "find":
+        return {"filter": command.get("filter", {}), "sort": command.get("sort")}
+    if command_name in ("count", "distinct"):
+        return {"filter": command.get("query", {}), "sort": None}
+    if command_name == "findAndModify":
+        return {"filter": command.get("query", {}), "sort": command.get("sort")}
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline", [])
+        match = pipeline[0].get("$match", {}) if pipeline and "$match" in pipeline[0] else {}
+        return {"filter": match, "sort": None, "pipeline": [query_shape(stage) for stage in pipeline]}
+    if command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or [{}]
+        return {"filter": statements[0].get("q", {}), "sort": None}
+    return {"filter": {}, "sort": None}
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Collects per-shape latency stats for commands above the threshold.
+
+    Motor runs pymongo calls on executor threads, so every callback here may
+    race with the others and with readers on the event loop.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS):
+        self.threshold_ms = threshold_ms
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self.shapes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name not in MONITORED_COMMANDS:
+            return
+        with self._lock:
+            self._pending[event.request_id] = {
+                "command": event.command_name,
+                "collection": event.command.get(event.command_name),
+                **_command_filter(event.command_name, event.command),
+            }
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop(event.request_id, None)
+        if pending is None:
+            return
+        duration_ms = event.duration_micros / 1000.0
+        if duration_ms < self.threshold_ms:
+            return
+
+        shape = query_shape(pending["filter"])
+        key = f"{pending['collection']}.{pending['command']} {shape} sort={pending['sort']}"
+        with self._lock:
+            entry = self.shapes.get(key)
+            if entry is None:
+                if len(self.shapes) >= MAX_SHAPES:
+                    return
+                entry = self.shapes[key] = {
+                    "collection": pending["collection"],
+                    "command": pending["command"],
+                    "shape": shape,
+                    "sort": pending["sort"],
+                    "pipeline": pending.get("pipeline"),
+                    "count": 0,
+                    "failures": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "last_seen": None,
+                    "plan": None,
+                    # Concrete filter kept only to run explain(); never exposed
+                    "_example": pending["filter"],
+                }
+            entry["count"] += 1
+            entry["failures"] += int(failed)
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_seen"] = time.time()
+        logger.warning(f"🐢 Slow Mongo {pending['command']} on {pending['collection']}: {duration_ms:.1f} ms {shape}")
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def top(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = sorted(self.shapes.values(), key=lambda e: e["total_ms"], reverse=True)[:limit]
+            return [
+                {
+                    **{k: v for k, v in e.items() if not k.startswith("_")},
+                    "avg_ms": round(e["total_ms"] / e["count"], 2),
+                    "total_ms": round(e["total_ms"], 2),
+                    "max_ms": round(e["max_ms"], 2),
+                }
+                for e in entries
+            ]
+
+    def reset(self):
+        with self._lock:
+            self.shapes.clear()
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = []
+    while plan:
+        stages.append(plan.get("stage"))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+
+def _summarize_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    planner = explain.get("queryPlanner") or explain.get("stages", [{}])[0].get("$cursor", {}).get("queryPlanner", {})
+    winning = planner.get("winningPlan", {})
+    # Newer servers nest the classic plan under queryPlan
+    winning = winning.get("queryPlan", winning)
+    stages = [s for s in _plan_stages(winning) if s]
+    index_names = []
+    node = winning
+    while node:
+        if node.get("indexName"):
+            index_names.append(node["indexName"])
+        node = node.get("inputStage")
+    return {
+        "stages": stages,
+        "collection_scan": "COLLSCAN" in stages,
+        "indexes": index_names,
+        "explained_at": time.time(),
+    }
+
+
+async def explain_top_offenders(db, listener: SlowQueryListener, limit: int = EXPLAIN_TOP_N):
+    """Run explain(queryPlanner) for the slowest query shapes and store the plan summary"""
+    with listener._lock:
+        entries = sorted(listener.shapes.values(), key=lambda e: e["total_ms"], reverse=True)[:limit]
+    for entry in entries:
+        if entry["command"] not in ("find", "count", "update", "delete", "findAndModify"):
+            continue
+        find = {"find": entry["collection"], "filter": entry["_example"]}
+        if entry["sort"]:
+            find["sort"] = entry["sort"]
+        try:
+            explain = await db.command({"explain": find, "verbosity": "queryPlanner"})
+            entry["plan"] = _summarize_plan(explain)
+            if entry["plan"]["collection_scan"]:
+                logger.warning(f"⚠️ COLLSCAN on {entry['collection']} for shape {entry['shape']}")
+        except Exception as e:
+            logger.error(f"Error explaining slow query on {entry['collection']}: {e}")
+
+
+async def explain_loop(get_db, listener: SlowQueryListener, interval: int = EXPLAIN_INTERVAL_SECONDS):
+    """Background task: periodically explain the top offenders while the DB is reachable"""
+    while True:
+        await asyncio.sleep(interval)
+        db = get_db()
+        if db is not None and listener.shapes:
+            await explain_top_offenders(db, listener)
+
+
+slow_query_listener = SlowQueryListener()
@@ -0,0 +1,211 @@
+"""Per-client rate limits and concurrency caps for the API.
+
+Every /api request falls into a route class with its own token bucket per
+client: `login` (keyed by IP, so password guessing is slow), `heavy`
+(imports, exports and job downloads), `write` and `read`. Clients are the
+user named in the bearer token, or the IP address for anonymous requests.
+An exhausted bucket answers 429 with Retry-After. Heavy requests are also
+capped at HEAVY_CONCURRENCY in flight per client, for the whole response,
+so a streaming export counts until its last byte.
+
+Buckets are in-process by default. With a shared cache (CACHE_URL) limits
+hold across workers; `incr` with a TTL is the only atomic operation every
+backend offers, so there a bucket becomes a window of `capacity` requests
+per capacity/rate seconds. If the shared cache fails, requests are let
+through rather than refused.
+
+Limits are "capacity,rate" (burst size, tokens per second) and can be set
+with RATE_LIMIT_LOGIN, RATE_LIMIT_HEAVY, RATE_LIMIT_WRITE, RATE_LIMIT_READ.
+"""
+import json
+import logging
+import math
+import os
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from cache import cache
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# Proxies in front of the app (Render, Railway: one); the client IP is the
+# X-Forwarded-For entry that many places from the right
+RATE_LIMIT_PROXY_HOPS = int(os.environ.get('RATE_LIMIT_PROXY_HOPS', '1'))
+HEAVY_CONCURRENCY = int(os.environ.get('HEAVY_CONCURRENCY', '2'))
+# A crashed worker's concurrency slots are forgotten after this long
+CONCURRENCY_TTL_SECONDS = 900
+PRUNE_EVERY = 1000
+
+UNLIMITED_PATHS = {"/api/", "/api/health"}
+HEAVY_PREFIXES = ("/api/exports/",)
+HEAVY_PATHS = {"/api/clients/import-excel"}
+
+
+def _limit(name: str, default: str) -> Tuple[float, float]:
+    capacity, rate = os.environ.get(f'RATE_LIMIT_{name.upper()}', default).split(",")
+    return float(capacity), float(rate)
+
+
+LIMITS: Dict[str, Tuple[float, float]] = {
+    "login": _limit("login", "5,0.1"),
+    "heavy": _limit("heavy", "10,0.2"),
+    "write": _limit("write", "60,5"),
+    "read": _limit("read", "120,20"),
+}
+# Longest time any bucket takes to refill from empty
+MAX_REFILL_SECONDS = max(capacity / rate for capacity, rate in LIMITS.values())
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if not path.startswith("/api/") or path in UNLIMITED_PATHS or method == "OPTIONS":
+        return None
+    if path == "/api/auth/login":
+        return "login"
+    if path in HEAVY_PATHS or path.startswith(HEAVY_PREFIXES) or (
+            path.startswith("/api/jobs/") and path.endswith("/download")):
+        return "heavy"
+    return "read" if method in ("GET", "HEAD") else "write"
+
+
+class TokenBuckets:
+    """In-process token buckets: key -> (tokens, last refill)"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._calls = 0
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take a token; returns 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        self._calls += 1
+        if self._calls % PRUNE_EVERY == 0:
+            self._prune(now)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / rate
+
+    def _prune(self, now: float):
+        """Drop buckets that have refilled completely; they equal a fresh one"""
+        self._buckets = {
+            key: (tokens, updated) for key, (tokens, updated) in self._buckets.items()
+            if now - updated < MAX_REFILL_SECONDS
+        }
+
+
+class RateLimiter:
+    def __init__(self, backend=cache):
+        self.backend = backend
+        self.buckets = TokenBuckets()
+        self.in_flight: Dict[str, int] = {}
+
+    async def take(self, route: str, client: str) -> float:
+        capacity, rate = LIMITS[route]
+        if not self.backend.shared:
+            return self.buckets.take(f"{route}:{client}", capacity, rate)
+        window = capacity / rate
+        count = await self.backend.incr(f"ratelimit:{route}:{client}", 1, ttl=window)
+        return 0.0 if count <= capacity else window
+
+    async def acquire(self, client: str) -> bool:
+        """Claim one of the client's heavy-request slots"""
+        if not self.backend.shared:
+            if self.in_flight.get(client, 0) >= HEAVY_CONCURRENCY:
+                return False
+            self.in_flight[client] = self.in_flight.get(client, 0) + 1
+            return True
+        key = f"inflight:{client}"
+        if await self.backend.incr(key, 1, ttl=CONCURRENCY_TTL_SECONDS) > HEAVY_CONCURRENCY:
+            await self.backend.incr(key, -1)
+            return False
+        return True
+
+    async def release(self, client: str):
+        if not self.backend.shared:
+            remaining = self.in_flight.get(client, 1) - 1
+            if remaining > 0:
+                self.in_flight[client] = remaining
+            else:
+                self.in_flight.pop(client, None)
+            return
+        await self.backend.incr(f"inflight:{client}", -1)
+
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_PROXY_HOPS > 0:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                hops = [ip.strip() for ip in value.decode("latin-1").split(",") if ip.strip()]
+                if hops:
+                    # Entries further left were supplied by the client and can be forged
+                    return hops[-min(RATE_LIMIT_PROXY_HOPS, len(hops))]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def bearer_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" and token else None
+    return None
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware; `identify` maps a bearer token to a user name or None"""
+
+    def __init__(self, app, identify: Callable[[str], Optional[str]], limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.identify = identify
+        self.limiter = limiter or RateLimiter()
+
+    async def _reject(self, send, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        route = route_class(scope.get("method", ""), scope.get("path", "")) \
+            if scope["type"] == "http" and RATE_LIMIT_ENABLED else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = bearer_token(scope) if route != "login" else None
+        user = self.identify(token) if token else None
+        client = f"user:{user}" if user else f"ip:{client_ip(scope)}"
+        try:
+            wait = await self.limiter.take(route, client)
+            if wait:
+                await self._reject(send, "Too many requests", wait)
+                return
+            if route == "heavy" and not await self.limiter.acquire(client):
+                await self._reject(send, "Too many concurrent imports or exports", 5)
+                return
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+            await self.app(scope, receive, send)
+            return
+
+        if route != "heavy":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            try:
+                await self.limiter.release(client)
+            except Exception as e:
+                logger.warning(f"Error releasing concurrency slot: {e}")
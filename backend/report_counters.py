@@ -0,0 +1,243 @@
+"""Materialized report counters for the dashboard headers.
+
+One small document per (status, employee_id, priority) combination lives in
+`report_counters`; create/update paths adjust them with $inc in a single
+bulk_write, so the totals in /api/reports/stats never scan service_reports.
+Ages depend on the clock rather than on writes, so the age buckets of open
+reports are recomputed by the periodic reconciliation, which also rebuilds
+the combination counters from scratch to repair any drift.
+
+"late" counts open reports past their due_at, the SLA overdue condition of
+/api/reports?overdue=true, per employee in `late|<employee>` documents.
+Reports only become late with the clock, so those are recounted by the
+overdue sweep and by reconciliation; in between, writes that close,
+reassign or flag a report (its `overdue` field) adjust them with $inc.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from sla import OPEN_STATUSES, overdue_query
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = "report_counters"
+
+# Age buckets for open reports, by request date
+AGE_BUCKETS = [("0-1d", 0), ("1-3d", 1), ("3-7d", 3), ("7d+", 7)]
+
+
+def counter_key(status: str, employee_id: Optional[str], priority: str) -> str:
+    return f"combo|{status}|{employee_id or ''}|{priority}"
+
+
+def late_key(employee_id: Optional[str]) -> str:
+    return f"late|{employee_id or ''}"
+
+
+def _is_late(report: Dict[str, Any]) -> bool:
+    return bool(report.get("overdue")) and report.get("status") in OPEN_STATUSES
+
+
+def _late_update(report: Dict[str, Any], amount: int) -> UpdateOne:
+    return UpdateOne(
+        {"_id": late_key(report.get("employee_id"))},
+        {"$inc": {"count": amount}, "$setOnInsert": {"kind": "late", "employee_id": report.get("employee_id")}},
+        upsert=True,
+    )
+
+
+def _counter_update(report: Dict[str, Any], amount: int) -> UpdateOne:
+    return UpdateOne(
+        {"_id": counter_key(report.get("status"), report.get("employee_id"), report.get("priority"))},
+        {
+            "$inc": {"count": amount},
+            "$setOnInsert": {
+                "kind": "combo",
+                "status": report.get("status"),
+                "employee_id": report.get("employee_id"),
+                "priority": report.get("priority"),
+            },
+        },
+        upsert=True,
+    )
+
+
+async def record_report_created(db, report: Dict[str, Any]):
+    ops = [_counter_update(report, 1)] + ([_late_update(report, 1)] if _is_late(report) else [])
+    await db[COUNTERS].bulk_write(ops, ordered=False)
+
+
+async def record_reports_created(db, reports: List[Dict[str, Any]], amount: int = 1):
+    """Batch form of record_report_created: one $inc per combination"""
+    totals: Dict[str, Tuple[Dict[str, Any], int]] = {}
+    late: Dict[str, Tuple[Dict[str, Any], int]] = {}
+    for report in reports:
+        key = counter_key(report.get("status"), report.get("employee_id"), report.get("priority"))
+        totals[key] = (report, totals.get(key, (report, 0))[1] + amount)
+        if _is_late(report):
+            key = late_key(report.get("employee_id"))
+            late[key] = (report, late.get(key, (report, 0))[1] + amount)
+    ops = [_counter_update(r, n) for r, n in totals.values()] + [_late_update(r, n) for r, n in late.values()]
+    if ops:
+        await db[COUNTERS].bulk_write(ops, ordered=False)
+
+
+async def record_reports_deleted(db, reports: List[Dict[str, Any]]):
+    await record_reports_created(db, reports, amount=-1)
+
+
+async def record_report_changed(db, before: Dict[str, Any], after: Dict[str, Any]):
+    """Move one count between combinations when status/employee/priority changed"""
+    await record_reports_changed(db, [(before, after)])
+
+
+async def record_reports_changed(db, changes: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+    """Batch form of record_report_changed: net deltas in one bulk_write"""
+    fields = ("status", "employee_id", "priority")
+    deltas: Dict[str, Tuple[Dict[str, Any], int]] = {}
+    late: Dict[str, Tuple[Dict[str, Any], int]] = {}
+    for before, after in changes:
+        if not all(before.get(f) == after.get(f) for f in fields):
+            for report, amount in ((before, -1), (after, 1)):
+                key = counter_key(report.get("status"), report.get("employee_id"), report.get("priority"))
+                deltas[key] = (report, deltas.get(key, (report, 0))[1] + amount)
+        for report, amount in ((before, -1), (after, 1)):
+            if _is_late(report):
+                key = late_key(report.get("employee_id"))
+                late[key] = (report, late.get(key, (report, 0))[1] + amount)
+    ops = [_counter_update(report, amount) for report, amount in deltas.values() if amount] \
+        + [_late_update(report, amount) for report, amount in late.values() if amount]
+    if ops:
+        await db[COUNTERS].bulk_write(ops, ordered=False)
+
+
+async def recount_late(db, now: Optional[datetime] = None):
+    """Replace the late counters with a grouped count of overdue reports"""
+    rows = await db.service_reports.aggregate([
+        {"$match": overdue_query(now)},
+        {"$group": {"_id": "$employee_id", "count": {"$sum": 1}}},
+    ]).to_list(None)
+    keys = [late_key(row["_id"]) for row in rows]
+    if rows:
+        await db[COUNTERS].bulk_write([
+            UpdateOne({"_id": late_key(row["_id"])},
+                      {"$set": {"kind": "late", "employee_id": row["_id"], "count": row["count"]}}, upsert=True)
+            for row in rows
+        ], ordered=False)
+    await db[COUNTERS].delete_many({"kind": "late", "_id": {"$nin": keys}})
+
+
+async def reconcile_counters(db, now: Optional[datetime] = None):
+    """Rebuild every counter from service_reports.
+
+    Two grouped aggregations replace the combination counters and the
+    per-employee age buckets of open reports; counters for combinations
+    that no longer exist are removed. The late counters are recounted too.
+    """
+    await recount_late(db, now)
+    now = now or datetime.now()
+    combos = await db.service_reports.aggregate([
+        {"$group": {
+            "_id": {"status": "$status", "employee_id": "$employee_id", "priority": "$priority"},
+            "count": {"$sum": 1},
+        }},
+    ]).to_list(None)
+
+    # A report belongs to the first bucket whose upper age limit it is within
+    branches = [
+        {"case": {"$gte": ["$request_date", now - timedelta(days=upper_days)]}, "then": label}
+        for (label, _), (_, upper_days) in zip(AGE_BUCKETS, AGE_BUCKETS[1:])
+    ]
+    ages = await db.service_reports.aggregate([
+        {"$match": {"status": {"$in": OPEN_STATUSES}}},
+        {"$group": {
+            "_id": {
+                "employee_id": "$employee_id",
+                "bucket": {"$switch": {"branches": branches, "default": AGE_BUCKETS[-1][0]}},
+            },
+            "count": {"$sum": 1},
+        }},
+    ]).to_list(None)
+
+    age_counts: Dict[str, Dict[str, int]] = {}
+    for row in ages:
+        employee = row["_id"].get("employee_id") or ""
+        buckets = age_counts.setdefault(employee, {label: 0 for label, _ in AGE_BUCKETS})
+        buckets[row["_id"]["bucket"]] += row["count"]
+
+    keys = []
+    ops: List[UpdateOne] = []
+    for combo in combos:
+        group = combo["_id"]
+        key = counter_key(group.get("status"), group.get("employee_id"), group.get("priority"))
+        keys.append(key)
+        ops.append(UpdateOne(
+            {"_id": key},
+            {"$set": {"kind": "combo", "count": combo["count"], **group}},
+            upsert=True,
+        ))
+    for employee, buckets in age_counts.items():
+        key = f"ages|{employee}"
+        keys.append(key)
+        ops.append(UpdateOne(
+            {"_id": key},
+            {"$set": {"kind": "ages", "employee_id": employee or None, "buckets": buckets, "computed_at": now}},
+            upsert=True,
+        ))
+    if ops:
+        await db[COUNTERS].bulk_write(ops, ordered=False)
+    await db[COUNTERS].delete_many({"kind": {"$in": ["combo", "ages"]}, "_id": {"$nin": keys}})
+    logger.info(f"✅ Reconciled {len(keys)} report counters")
+
+
+async def ensure_counter_indexes(db):
+    await db.service_reports.create_index([("status", 1), ("employee_id", 1), ("priority", 1)])
+    await db.service_reports.create_index([("status", 1), ("request_date", 1)])
+
+
+async def get_stats(db, employee_id: Optional[str] = None) -> Dict[str, Any]:
+    """Assemble dashboard totals from the counters"""
+    query = {"kind": "combo"}
+    if employee_id:
+        query["employee_id"] = employee_id
+    counters = await db[COUNTERS].find(query).to_list(None)
+
+    by_status: Dict[str, int] = {}
+    by_priority: Dict[str, int] = {}
+    by_employee: Dict[str, Dict[str, int]] = {}
+    for c in counters:
+        count = c.get("count", 0)
+        if count <= 0:
+            continue
+        by_status[c["status"]] = by_status.get(c["status"], 0) + count
+        if c["status"] in OPEN_STATUSES:
+            by_priority[c["priority"]] = by_priority.get(c["priority"], 0) + count
+        employee = by_employee.setdefault(c.get("employee_id") or "unassigned", {})
+        employee[c["status"]] = employee.get(c["status"], 0) + count
+
+    age_query = {"kind": "ages"}
+    if employee_id:
+        age_query["employee_id"] = employee_id
+    buckets = {label: 0 for label, _ in AGE_BUCKETS}
+    computed_at = None
+    async for doc in db[COUNTERS].find(age_query):
+        for label, count in doc.get("buckets", {}).items():
+            buckets[label] = buckets.get(label, 0) + count
+        computed_at = doc.get("computed_at")
+    late_query = {"kind": "late"}
+    if employee_id:
+        late_query["employee_id"] = employee_id
+    late = sum([max(0, doc.get("count", 0)) async for doc in db[COUNTERS].find(late_query)])
+    return {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "open_by_priority": by_priority,
+        "by_employee": by_employee,
+        # Ages move with the clock, so they are only as fresh as the last reconciliation
+        "open_age_buckets": buckets,
+        "late": late,
+        "ages_computed_at": computed_at,
+    }
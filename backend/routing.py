@@ -0,0 +1,230 @@
+"""Daily route planning for technicians.
+
+For each technician, the open reports assigned to them that belong to the
+day become stops at their clients' coordinates and are ordered by a nearest-neighbour tour improved
+with 2-opt over a NumPy great-circle distance matrix. URGENT stops are
+routed first and the rest continue from the last urgent stop. Routes are
+open paths: they start at the depot (DEPOT_LAT/DEPOT_LNG) when one is set,
+otherwise at the most overdue urgent stop, and end at the last visit.
+
+A report belongs to a day (on the Los Angeles calendar) when it was
+requested or falls due that day; overdue reports and URGENT reports
+requested earlier carry over into every day until they are closed.
+
+Planning is CPU work, so plan_route runs in the job process pool
+(jobs.job_queue.run_cpu) and never on the event loop. Results are stored per technician and day in `schedules`.
+Coordinates are the clients' geocoded `location` (see geocoding.py); stops
+whose client has none yet are listed as unrouted.
+"""
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pytz
+from pymongo import ReplaceOne
+
+from geocoding import Coordinates, client_locations
+from jobs import job_queue
+from sla import LA_TZ, OPEN_STATUSES
+
+logger = logging.getLogger(__name__)
+
+SCHEDULES = "schedules"
+EARTH_RADIUS_KM = 6371.0
+MAX_2OPT_PASSES = 50
+
+
+def _depot() -> Optional[Coordinates]:
+    lat, lng = os.environ.get('DEPOT_LAT'), os.environ.get('DEPOT_LNG')
+    return (float(lat), float(lng)) if lat and lng else None
+
+
+def distance_matrix(points: Sequence[Coordinates]):
+    """Great-circle distances in km between every pair of (lat, lng) points"""
+    import numpy as np
+    radians = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    lat, lng = radians[:, 0:1], radians[:, 1:2]
+    a = np.sin((lat - lat.T) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lng - lng.T) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbour(dist, start: int, nodes: Sequence[int]) -> List[int]:
+    """Greedy path from start through nodes (start itself not included)"""
+    import numpy as np
+    remaining = np.array(nodes, dtype=np.intp)
+    path = []
+    current = start
+    while remaining.size:
+        k = int(np.argmin(dist[current, remaining]))
+        current = int(remaining[k])
+        path.append(current)
+        remaining = np.delete(remaining, k)
+    return path
+
+
+def two_opt(dist, path: Sequence[int], max_passes: int = MAX_2OPT_PASSES) -> List[int]:
+    """Improve an open path whose first node is fixed by reversing segments.
+
+    For each i, every candidate j is evaluated at once with array arithmetic
+    and the best improving reversal of path[i..j] is applied.
+    """
+    import numpy as np
+    route = np.array(path, dtype=np.intp)
+    n = len(route)
+    if n < 3:
+        return route.tolist()
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            a, b = route[i - 1], route[i]
+            js = np.arange(i + 1, n)
+            c = route[js]
+            # The path is open, so reversing up to the last node has no outgoing edge
+            has_next = js + 1 < n
+            d = route[np.minimum(js + 1, n - 1)]
+            delta = (dist[a, c] + np.where(has_next, dist[b, d], 0.0)) \
+                - (dist[a, b] + np.where(has_next, dist[c, d], 0.0))
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-9:
+                j = int(js[k])
+                route[i:j + 1] = route[i:j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return route.tolist()
+
+
+def plan_route(points: Sequence[Coordinates], urgent: Sequence[bool],
+               start: Optional[Coordinates] = None) -> Tuple[List[int], List[float]]:
+    """Visit order (indices into points) and the km of each leg.
+
+    Urgent stops come first; each tier is a nearest-neighbour path polished
+    with 2-opt. Runs in a worker process, so it takes and returns plain lists.
+    """
+    if not points:
+        return [], []
+    nodes = list(points) + ([start] if start else [])
+    dist = distance_matrix(nodes)
+    urgent_nodes = [i for i, flag in enumerate(urgent) if flag]
+    other_nodes = [i for i, flag in enumerate(urgent) if not flag]
+
+    if start:
+        origin = len(points)
+    else:
+        # No depot: begin at the first urgent stop (callers pass them most overdue first)
+        origin = (urgent_nodes or other_nodes)[0]
+        if urgent_nodes:
+            urgent_nodes = urgent_nodes[1:]
+        else:
+            other_nodes = other_nodes[1:]
+
+    order = [] if start else [origin]
+    current = origin
+    for tier in (urgent_nodes, other_nodes):
+        if not tier:
+            continue
+        path = two_opt(dist, [current] + nearest_neighbour(dist, current, tier))
+        order += path[1:]
+        current = path[-1]
+
+    previous = origin if start else None
+    legs = []
+    for node in order:
+        legs.append(0.0 if previous is None else round(float(dist[previous, node]), 3))
+        previous = node
+    return order, legs
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Start and end of a Los Angeles calendar day as naive UTC datetimes"""
+    start, end = (LA_TZ.localize(datetime.combine(d, time())) for d in (day, day + timedelta(days=1)))
+    return start.astimezone(pytz.utc).replace(tzinfo=None), end.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def stops_query(day: date, employee_id: Optional[str] = None) -> Dict[str, Any]:
+    """Open assigned reports requested or due on `day`, plus overdue and URGENT carry-over"""
+    start, end = day_bounds(day)
+    return {
+        "status": {"$in": OPEN_STATUSES},
+        "employee_id": employee_id or {"$ne": None},
+        "$or": [
+            {"request_date": {"$gte": start, "$lt": end}},
+            # Due that day or already overdue
+            {"due_at": {"$lt": end}},
+            {"priority": "URGENT", "request_date": {"$lt": end}},
+        ],
+    }
+
+
+async def ensure_schedule_indexes(db):
+    await db[SCHEDULES].create_index([("date", 1), ("employee_id", 1)])
+
+
+async def generate_schedules(db, day: date, employee_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Plan and store the routes of every technician with stops on `day`"""
+    query = stops_query(day, employee_id)
+    projection = {
+        "_id": 0, "id": 1, "client_id": 1, "client_name": 1, "client_address": 1,
+        "employee_id": 1, "employee_name": 1, "priority": 1, "due_at": 1,
+    }
+    reports = await db.service_reports.find(query, projection).sort("due_at", 1).to_list(None)
+    locations = await client_locations(db, list({r["client_id"] for r in reports if r.get("client_id")}))
+
+    by_employee: Dict[str, List[Dict[str, Any]]] = {}
+    for report in reports:
+        by_employee.setdefault(report["employee_id"], []).append(report)
+
+    start = _depot()
+    now = datetime.now()
+    schedules = []
+    for employee, stops in by_employee.items():
+        located, unrouted = [], []
+        for stop in stops:
+            coordinates = locations.get(stop.get("client_id"))
+            (located if coordinates else unrouted).append((stop, coordinates))
+        # Urgent stops keep their due_at order, so the most overdue one leads when there is no depot
+        located.sort(key=lambda item: item[0].get("priority") != "URGENT")
+
+        order, legs = await job_queue.run_cpu(
+            plan_route,
+            [coordinates for _, coordinates in located],
+            [stop.get("priority") == "URGENT" for stop, _ in located],
+            start,
+        )
+        route = []
+        for position, (index, leg_km) in enumerate(zip(order, legs), start=1):
+            stop, (lat, lng) = located[index]
+            route.append({
+                "order": position,
+                "report_id": stop["id"],
+                "client_id": stop.get("client_id"),
+                "client_name": stop.get("client_name"),
+                "client_address": stop.get("client_address"),
+                "priority": stop.get("priority"),
+                "lat": lat,
+                "lng": lng,
+                "leg_km": leg_km,
+            })
+        schedules.append({
+            "_id": f"{day.isoformat()}|{employee}",
+            "date": day.isoformat(),
+            "employee_id": employee,
+            "employee_name": stops[0].get("employee_name"),
+            "stops": route,
+            "total_km": round(sum(legs), 3),
+            "unrouted": [
+                {"report_id": stop["id"], "client_name": stop.get("client_name"),
+                 "client_address": stop.get("client_address"), "priority": stop.get("priority")}
+                for stop, _ in unrouted
+            ],
+            "generated_at": now,
+        })
+
+    if schedules:
+        await db[SCHEDULES].bulk_write(
+            [ReplaceOne({"_id": s["_id"]}, s, upsert=True) for s in schedules], ordered=False
+        )
+    logger.info(f"✅ Planned {len(schedules)} routes for {day.isoformat()} "
+                f"({sum(len(s['stops']) for s in schedules)} stops)")
+    return schedules
@@ -0,0 +1,160 @@
+"""Search over clients and reports.
+
+Each client and report carries a `search_tokens` array: the lowercased,
+accent-free words of its searchable fields (phones also as a digits-only
+token). Completed words of a query must all be present in search_tokens and
+are ranked through the collection's weighted text index; the word still
+being typed is matched as an anchored prefix on the multikey search_tokens
+index. Both are index scans, so lookups stay fast across the whole history.
+"""
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+CLIENT_FIELDS = {"name": 10, "address": 5, "phone": 3, "email": 3}
+REPORT_FIELDS = {"client_name": 5, "description": 5, "client_address": 2, "employee_notes": 2, "admin_notes": 2}
+PHONE_FIELDS = ("phone",)
+
+CLIENT_PROJECTION = {"_id": 0, "id": 1, "name": 1, "address": 1, "phone": 1, "email": 1, "employee_id": 1}
+REPORT_PROJECTION = {
+    "_id": 0, "id": 1, "client_id": 1, "client_name": 1, "client_address": 1, "description": 1,
+    "status": 1, "priority": 1, "employee_name": 1, "request_date": 1, "completion_date": 1,
+}
+
+MAX_PAGE_SIZE = 100
+SUGGEST_LIMIT = 10
+# Covering index for typeahead: the query never has to load client documents
+SUGGEST_INDEX = [("name_key", 1), ("id", 1), ("name", 1), ("address", 1)]
+# Client listing order; id breaks ties between equal names so skip/limit pages are stable
+CLIENT_SORT = SUGGEST_INDEX[:2]
+SUGGEST_PROJECTION = {"_id": 0, "id": 1, "name": 1, "address": 1}
+BACKFILL_BATCH = 1000
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so 'João' matches 'joao'"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _WORD.findall(normalize(text)) if text else []
+
+
+def search_tokens(doc: Dict[str, Any], fields: Iterable[str]) -> List[str]:
+    tokens = set()
+    for field in fields:
+        value = doc.get(field)
+        if not value:
+            continue
+        tokens.update(tokenize(str(value)))
+        if field in PHONE_FIELDS:
+            digits = re.sub(r"\D", "", str(value))
+            if digits:
+                tokens.add(digits)
+    return sorted(tokens)
+
+
+def name_key(name: Optional[str]) -> str:
+    """Sort/prefix key for client names: case- and accent-insensitive, like a
+    strength-1 collation, but usable with plain index range bounds"""
+    return " ".join(tokenize(name))
+
+
+def client_tokens(doc: Dict[str, Any]) -> List[str]:
+    return search_tokens(doc, CLIENT_FIELDS)
+
+
+def report_tokens(doc: Dict[str, Any]) -> List[str]:
+    return search_tokens(doc, REPORT_FIELDS)
+
+
+async def ensure_search_indexes(db):
+    await db.clients.create_index(SUGGEST_INDEX, name="clients_name_key_suggest")
+    await db.clients.create_index("search_tokens")
+    await db.service_reports.create_index("search_tokens")
+    await db.clients.create_index(
+        [(field, "text") for field in CLIENT_FIELDS],
+        weights=CLIENT_FIELDS, default_language="none", name="clients_text",
+    )
+    await db.service_reports.create_index(
+        [(field, "text") for field in REPORT_FIELDS],
+        weights=REPORT_FIELDS, default_language="none", name="reports_text",
+    )
+
+
+async def backfill_search_tokens(db) -> int:
+    """Tokenize documents written before search_tokens/name_key existed"""
+    updated = 0
+    for collection, fields in ((db.clients, CLIENT_FIELDS), (db.service_reports, REPORT_FIELDS)):
+        projection = {"_id": 1, **{field: 1 for field in fields}}
+        while True:
+            docs = await collection.find({"search_tokens": {"$exists": False}}, projection) \
+                .limit(BACKFILL_BATCH).to_list(BACKFILL_BATCH)
+            if not docs:
+                break
+            await collection.bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {"search_tokens": search_tokens(doc, fields)}})
+                for doc in docs
+            ], ordered=False)
+            updated += len(docs)
+
+    while True:
+        docs = await db.clients.find({"name_key": {"$exists": False}}, {"_id": 1, "name": 1}) \
+            .limit(BACKFILL_BATCH).to_list(BACKFILL_BATCH)
+        if not docs:
+            break
+        await db.clients.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"name_key": name_key(doc.get("name"))}})
+            for doc in docs
+        ], ordered=False)
+        updated += len(docs)
+    return updated
+
+
+def build_query(q: str) -> Optional[Dict[str, Any]]:
+    """Mongo filter for a query; the last word is a prefix unless q ends in a space"""
+    words = tokenize(q)
+    if not words:
+        return None
+    complete, prefix = (words, None) if q[-1:].isspace() else (words[:-1], words[-1])
+    query: Dict[str, Any] = {}
+    if complete:
+        # search_tokens does the matching (every word must appear); $text adds
+        # ranking. Digit-only words such as phone numbers exist only as tokens.
+        query["search_tokens"] = {"$all": complete}
+        if not any(w.isdigit() for w in complete):
+            query["$text"] = {"$search": " ".join(complete)}
+    if prefix:
+        query.setdefault("search_tokens", {})["$regex"] = f"^{re.escape(prefix)}"
+    return query
+
+
+async def search_collection(collection, query: Dict[str, Any], projection: Dict[str, Any],
+                            fallback_sort: str, page: int, page_size: int) -> Dict[str, Any]:
+    cursor = collection.find(query, projection if "$text" not in query else {
+        **projection, "score": {"$meta": "textScore"}
+    })
+    if "$text" in query:
+        cursor = cursor.sort([("score", {"$meta": "textScore"})])
+    else:
+        cursor = cursor.sort(fallback_sort, 1)
+    items = await cursor.skip((page - 1) * page_size).limit(page_size).to_list(page_size)
+    total = await collection.count_documents(query)
+    return {"total": total, "page": page, "page_size": page_size, "items": items}
+
+
+async def suggest_clients(db, prefix: str, limit: int = SUGGEST_LIMIT) -> List[Dict[str, Any]]:
+    """Clients whose name starts with prefix, as a covered index range scan"""
+    key = name_key(prefix)
+    if not key:
+        return []
+    # A trailing space in the prefix means the word is complete
+    if prefix[-1:].isspace():
+        key += " "
+    cursor = db.clients.find({"name_key": {"$regex": f"^{re.escape(key)}"}}, SUGGEST_PROJECTION) \
+        .sort("name_key", 1).hint(SUGGEST_INDEX).limit(limit)
+    return await cursor.to_list(limit)
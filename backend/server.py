@@ -1,8 +1,9 @@
-from fastapi import FastAPI, HTTPException, APIRouter, Depends, status, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, APIRouter, Depends, status, File, UploadFile, Form, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
@@ -10,14 +11,55 @@ from pathlib import Path
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 import jwt
 from passlib.context import CryptContext
 import base64
-import pandas as pd
-from io import BytesIO
 import pytz
 from dotenv import load_dotenv
+from diagnostics import DIAGNOSTICS_ENABLED, loop_monitor, route_profiler, ProfilerMiddleware
+from mongo_monitor import slow_query_listener, explain_loop, explain_top_offenders
+from access_log import (
+    ACCESS_LOG_ENABLED, AccessLogMiddleware, mongo_timing_listener,
+    set_request_user, start_access_logging, stop_access_logging
+)
+from cache import cache
+from rate_limit import RateLimitMiddleware
+from db_supervisor import mongo_supervisor
+from static_assets import IndexHtmlCache, serve_asset
+from sla import OPEN_STATUSES, PRIORITIES, compute_due_at, ensure_sla_indexes, overdue_query, sweep_overdue
+from search import (
+    CLIENT_PROJECTION, CLIENT_SORT, MAX_PAGE_SIZE, REPORT_PROJECTION, backfill_search_tokens,
+    build_query, client_tokens, ensure_search_indexes, name_key, report_tokens,
+    search_collection, suggest_clients
+)
+from archive import ARCHIVE, ARCHIVE_AFTER_MONTHS, archive_completed_reports, ensure_archive_indexes, find_reports_with_archive
+from exports import (
+    CLIENT_COLUMNS, CSV_MEDIA_TYPE, EXPORT_BATCH_SIZE, REPORT_COLUMNS, XLSX_MEDIA_TYPE,
+    projection_for, stream_csv, stream_xlsx, write_export
+)
+from jobs import (
+    JOBS, PermanentJobError, ensure_job_indexes, job_file, job_metrics, job_queue, list_jobs, public_job
+)
+from client_import import import_clients_job
+from snapshots import read_manifest, write_snapshot, year_parquet
+from turnaround import (
+    GROUP_FIELDS as TURNAROUND_GROUPS, ensure_turnaround_histograms, get_turnaround,
+    rebuild_turnaround, record_turnaround_change
+)
+from geocoding import ensure_geocode_indexes, geocode_all_pending, geocode_pending_clients
+from routing import SCHEDULES, ensure_schedule_indexes, generate_schedules
+from assignment import apply_assignments, propose_assignments, workload
+from service_plans import (
+    FREQUENCIES, PLAN_HORIZON_DAYS, PLANS, ensure_plan_indexes, materialize_plans, rematerialize_plan
+)
+from analytics import GROUPS, METRICS, analytics_table, ensure_analytics_indexes, refresh_loop
+from denormalization import enqueue_client_change, ensure_propagation_indexes, process_propagation_tasks
+from report_counters import (
+    ensure_counter_indexes, get_stats, reconcile_counters, recount_late,
+    record_report_changed, record_report_created
+)
+import asyncio
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
@@ -47,10 +89,26 @@ api_router = APIRouter(prefix="/api")
 # Security
 security = HTTPBearer()
 
-# Global variables for MongoDB
+# Global variables for MongoDB (per worker process, created lazily after fork)
 mongodb_available = False
 client = None
 db = None
+client_pid = None
+seed_task = None
+
+# Background job intervals
+COUNTER_RECONCILE_SECONDS = int(os.environ.get('COUNTER_RECONCILE_SECONDS', '300'))
+OVERDUE_SWEEP_SECONDS = int(os.environ.get('OVERDUE_SWEEP_SECONDS', '300'))
+PROPAGATION_SECONDS = int(os.environ.get('PROPAGATION_SECONDS', '30'))
+ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('ARCHIVE_INTERVAL_SECONDS', '86400'))
+SNAPSHOT_INTERVAL_SECONDS = int(os.environ.get('SNAPSHOT_INTERVAL_SECONDS', '86400'))
+TURNAROUND_REBUILD_SECONDS = int(os.environ.get('TURNAROUND_REBUILD_SECONDS', '86400'))
+GEOCODE_SECONDS = int(os.environ.get('GEOCODE_SECONDS', '60'))
+# Upper bound on one geocoding run; a crashed worker's run stops blocking others after this
+GEOCODE_LEASE_SECONDS = 1800
+PLAN_MATERIALIZE_SECONDS = int(os.environ.get('PLAN_MATERIALIZE_SECONDS', '3600'))
+# How long the import endpoint waits for its job before answering 202
+IMPORT_WAIT_SECONDS = float(os.environ.get('IMPORT_WAIT_SECONDS', '10'))
 
 # Pydantic Models
 class UserCreate(BaseModel):
@@ -80,8 +138,43 @@ class Client(BaseModel):
     phone: Optional[str] = None
     email: Optional[str] = None
     employee_id: Optional[str] = None
+    location: Optional[Dict[str, float]] = None  # {"lat", "lng"}, filled in by the geocoder
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class ClientUpdate(BaseModel):
+    name: Optional[str] = None
+    address: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    employee_id: Optional[str] = None
+
+class ServicePlan(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    client_id: str
+    frequency: str = "weekly"  # weekly, biweekly, monthly (first matching weekday of the month)
+    weekday: int  # 0 = Monday ... 6 = Sunday
+    employee_id: Optional[str] = None
+    priority: str = "SAME WEEK"
+    description: Optional[str] = None
+    price: Optional[float] = None  # total_cost of each visit
+    start_date: date = Field(default_factory=lambda: datetime.now(LA_TZ).date())
+    active: bool = True
     created_at: datetime = Field(default_factory=datetime.now)
 
+class ServicePlanUpdate(BaseModel):
+    frequency: Optional[str] = None
+    weekday: Optional[int] = None
+    employee_id: Optional[str] = None
+    priority: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    start_date: Optional[date] = None
+    active: Optional[bool] = None
+
+class AssignmentRequest(BaseModel):
+    report_ids: Optional[List[str]] = None  # default: every unassigned open report
+    apply: bool = False  # False only proposes
+
 class ServiceReport(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     client_id: str
@@ -102,6 +195,8 @@ class ServiceReport(BaseModel):
     completion_date: Optional[datetime] = None
     last_modified: Optional[datetime] = None
     modification_history: Optional[List[Dict]] = []
+    due_at: Optional[datetime] = None  # UTC deadline from the priority SLA, set by the server
+    overdue: Optional[bool] = False
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
 
@@ -132,54 +227,203 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if not mongodb_available:
             # Fallback for basic auth
             if username == "admin":
+                set_request_user("1")
                 return User(id="1", username="admin", role="administrator")
+            set_request_user("2")
             return User(id="2", username=username, role="employee")
         
         user = await db.users.find_one({"username": username})
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         
+        set_request_user(user["id"])
         return User(**user)
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
+def get_mongo_url():
+    # Try multiple environment variables for MongoDB URL
+    return (
+        os.environ.get('MONGODB_URL') or 
+        os.environ.get('DATABASE_URL') or 
+        os.environ.get('MONGO_URL') or
+        'mongodb://localhost:27017'
+    )
+
+def get_db():
+    """Return this process's database handle, creating the client on first use.
+    
+    Motor clients must not cross a fork, so a client inherited from a
+    pre-forking master (gunicorn --preload) is discarded and rebuilt.
+    """
+    global client, db, client_pid
+    if client is None or client_pid != os.getpid():
+        db_name = os.environ.get('DB_NAME', 'rog_pool_service')
+        client = AsyncIOMotorClient(
+            get_mongo_url(),
+            # Fail fast; the supervisor handles retrying, not each request
+            serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+            event_listeners=[slow_query_listener, mongo_timing_listener]
+        )
+        db = client[db_name]
+        client_pid = os.getpid()
+    return db
+
+async def on_mongo_state_change(available: bool):
+    global mongodb_available
+    mongodb_available = available
+    if available:
+        logger.info("✅ MongoDB connected successfully!")
+        start_seeding()
+        asyncio.create_task(prepare_database())
+    else:
+        logger.error("❌ MongoDB marked unavailable; requests will get 503 until it recovers")
+
+def require_db():
+    """Fail fast with 503 while the Mongo circuit breaker is open"""
+    if not mongodb_available:
+        status_info = mongo_supervisor.status()
+        retry_after = status_info["retry_in_seconds"] or 1
+        raise HTTPException(
+            status_code=503,
+            detail="Database not available",
+            headers={"Retry-After": str(max(1, int(retry_after)))}
+        )
+
+def raise_if_db_down(e: Exception):
+    """Turn Mongo connection errors into a 503 and open the circuit breaker"""
+    mongo_supervisor.record_failure(e)
+    if not mongo_supervisor.available:
+        raise HTTPException(status_code=503, detail="Database not available")
+
 @app.on_event("startup")
 async def startup_event():
-    global mongodb_available, client, db
+    if ACCESS_LOG_ENABLED:
+        start_access_logging()
+    
+    # Creating the client never blocks; the supervisor keeps probing with
+    # exponential backoff until MongoDB answers, then flips mongodb_available
+    logger.info(f"Attempting MongoDB connection (worker pid {os.getpid()})...")
+    get_db()
+    await mongo_supervisor.start(
+        ping=lambda: get_db().command("ping"),
+        on_change=on_mongo_state_change
+    )
     
+    asyncio.create_task(explain_loop(lambda: db if mongodb_available else None, slow_query_listener))
+    asyncio.create_task(run_periodic("reconcile_counters", COUNTER_RECONCILE_SECONDS, reconcile_counters))
+    asyncio.create_task(run_periodic("sweep_overdue", OVERDUE_SWEEP_SECONDS, sweep_and_count_overdue))
+    asyncio.create_task(run_periodic("client_propagation", PROPAGATION_SECONDS, process_propagation_tasks))
+    asyncio.create_task(run_periodic("archive_reports", ARCHIVE_INTERVAL_SECONDS, archive_completed_reports))
+    asyncio.create_task(run_periodic("analytics_snapshot", SNAPSHOT_INTERVAL_SECONDS, write_snapshot))
+    asyncio.create_task(run_periodic("rebuild_turnaround", TURNAROUND_REBUILD_SECONDS, rebuild_turnaround))
+    asyncio.create_task(run_periodic("geocode_clients", GEOCODE_SECONDS, run_geocoding))
+    asyncio.create_task(run_periodic("materialize_plans", PLAN_MATERIALIZE_SECONDS, materialize_plans))
+    # Every worker claims and runs background jobs
+    asyncio.create_task(job_queue.run(lambda: db if mongodb_available else None))
+    # Every worker keeps its own in-memory analytics table
+    asyncio.create_task(refresh_loop(lambda: db if mongodb_available else None, analytics_table))
+
+    if DIAGNOSTICS_ENABLED:
+        loop_monitor.start()
+
+async def acquire_lease(name: str, ttl_seconds: int = 120) -> bool:
+    """Let exactly one worker run a step; the lease expires if the worker dies"""
+    now = datetime.now()
     try:
-        # Try multiple environment variables for MongoDB URL
-        mongo_url = (
-            os.environ.get('MONGODB_URL') or 
-            os.environ.get('DATABASE_URL') or 
-            os.environ.get('MONGO_URL') or
-            'mongodb://localhost:27017'
+        result = await db.app_meta.update_one(
+            {"_id": f"lock:{name}", "$or": [{"expires_at": {"$lt": now}}, {"expires_at": {"$exists": False}}]},
+            {"$set": {"owner": os.getpid(), "expires_at": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True
         )
-        
-        db_name = os.environ.get('DB_NAME', 'rog_pool_service')
-        
-        logger.info(f"Attempting MongoDB connection...")
-        client = AsyncIOMotorClient(mongo_url)
-        db = client[db_name]
-        
-        # Test connection
-        await db.test_collection.find_one()
-        mongodb_available = True
-        logger.info("✅ MongoDB connected successfully!")
-        
-        # Create initial data if needed
-        await initialize_default_data()
-        
+        return result.upserted_id is not None or result.modified_count == 1
+    except Exception:
+        # Duplicate key: another worker holds an unexpired lease
+        return False
+
+async def release_lease(name: str):
+    """Give up a lease this worker holds before it expires"""
+    await db.app_meta.delete_one({"_id": f"lock:{name}", "owner": os.getpid()})
+
+async def prepare_database():
+    """Indexes and derived data refreshed whenever a connection is (re)established"""
+    try:
+        await ensure_counter_indexes(db)
+        await ensure_sla_indexes(db)
+        await ensure_search_indexes(db)
+        await ensure_propagation_indexes(db)
+        await ensure_archive_indexes(db)
+        await ensure_analytics_indexes(db)
+        await ensure_schedule_indexes(db)
+        await ensure_geocode_indexes(db)
+        await ensure_plan_indexes(db)
+        await ensure_job_indexes(db)
+        if await acquire_lease("backfill_search_tokens", ttl_seconds=600):
+            await backfill_search_tokens(db)
+        if await acquire_lease("reconcile_counters", ttl_seconds=60):
+            await reconcile_counters(db)
+        if await acquire_lease("rebuild_turnaround", ttl_seconds=600):
+            await ensure_turnaround_histograms(db)
+    except Exception as e:
+        mongo_supervisor.record_failure(e)
+        logger.error(f"Error preparing database: {e}")
+
+async def run_periodic(name: str, interval_seconds: int, job):
+    """Run job(db) every interval on one worker at a time while Mongo is up"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if not mongodb_available:
+            continue
+        try:
+            # The lease lasts one interval, so only one worker runs each round
+            if await acquire_lease(name, ttl_seconds=max(1, interval_seconds - 1)):
+                await job(db)
+        except Exception as e:
+            mongo_supervisor.record_failure(e)
+            logger.error(f"Error in periodic job {name}: {e}")
+
+async def sweep_and_count_overdue(db):
+    """Flag newly overdue reports, then recount the late counters behind the stats"""
+    await sweep_overdue(db)
+    await recount_late(db)
+
+def start_seeding():
+    """Seed default data in the background so startup never waits on bcrypt"""
+    global seed_task
+    if seed_task is None or seed_task.done():
+        seed_task = asyncio.create_task(seed_default_data_once())
+
+async def seed_default_data_once():
+    """Run initialize_default_data at most once per database.
+    
+    A flag in app_meta records completion so restarts and extra workers skip
+    straight past it; the lease lock keeps concurrent workers from racing.
+    """
+    try:
+        if await db.app_meta.find_one({"_id": "seed_done"}):
+            return
+        # Every worker runs startup; only one may seed
+        if not await acquire_lease("seed"):
+            logger.info("Default data is being initialized by another worker")
+            return
+        try:
+            if await initialize_default_data():
+                await db.app_meta.update_one(
+                    {"_id": "seed_done"},
+                    {"$set": {"completed_at": datetime.now(), "pid": os.getpid()}},
+                    upsert=True
+                )
+        finally:
+            # A restart right after a failed seed must be able to retry
+            await release_lease("seed")
     except Exception as e:
-        logger.error(f"❌ MongoDB connection failed: {e}")
-        mongodb_available = False
-        client = None
-        db = None
+        mongo_supervisor.record_failure(e)
+        logger.error(f"Error seeding default data: {e}")
 
 async def initialize_default_data():
-    """Create default data if database is empty"""
+    """Create default data if database is empty; returns True on success"""
     if not mongodb_available or db is None:
-        return
+        return False
     
     try:
         # Create admin user if doesn't exist
@@ -188,7 +432,7 @@ async def initialize_default_data():
             admin_data = {
                 "id": str(uuid.uuid4()),
                 "username": "admin",
-                "password_hash": get_password_hash("admin123"),
+                "password_hash": await run_in_threadpool(get_password_hash, "admin123"),
                 "role": "administrator",
                 "created_at": datetime.now()
             }
@@ -198,18 +442,19 @@ async def initialize_default_data():
         # Create sample employees
         employee_count = await db.users.count_documents({"role": "employee"})
         if employee_count == 0:
+            employee_hash = await run_in_threadpool(get_password_hash, "password123")
             sample_employees = [
                 {
                     "id": str(uuid.uuid4()),
                     "username": "employee1",
-                    "password_hash": get_password_hash("password123"),
+                    "password_hash": employee_hash,
                     "role": "employee",
                     "created_at": datetime.now()
                 },
                 {
                     "id": str(uuid.uuid4()),
                     "username": "employee2", 
-                    "password_hash": get_password_hash("password123"),
+                    "password_hash": employee_hash,
                     "role": "employee",
                     "created_at": datetime.now()
                 }
@@ -240,6 +485,9 @@ async def initialize_default_data():
                     "created_at": datetime.now()
                 }
             ]
+            for sample_client in sample_clients:
+                sample_client["search_tokens"] = client_tokens(sample_client)
+                sample_client["name_key"] = name_key(sample_client["name"])
             
             await db.clients.insert_many(sample_clients)
             logger.info(f"✅ Created {len(sample_clients)} sample clients")
@@ -266,12 +514,16 @@ async def initialize_default_data():
                 "created_at": datetime.now(),
                 "updated_at": datetime.now()
             }
+            sample_report["search_tokens"] = report_tokens(sample_report)
             
             await db.service_reports.insert_one(sample_report)
             logger.info("✅ Created sample service report")
-            
+        
+        return True
     except Exception as e:
+        mongo_supervisor.record_failure(e)
         logger.error(f"Error initializing default data: {e}")
+        return False
 
 # Auth endpoints
 @api_router.post("/auth/login", response_model=TokenResponse)
@@ -281,7 +533,7 @@ async def login(login_request: LoginRequest):
     password = login_request.password
     
     # Check if MongoDB is available
-    if mongodb_available and db:
+    if mongodb_available and db is not None:
         try:
             user = await db.users.find_one({"username": username})
             if user and verify_password(password, user["password_hash"]):
@@ -301,6 +553,7 @@ async def login(login_request: LoginRequest):
                     user=user_data
                 )
         except Exception as e:
+            mongo_supervisor.record_failure(e)
             logger.error(f"Database login error: {e}")
     
     # Fallback hardcoded authentication
@@ -337,7 +590,8 @@ def health():
         "status": "healthy", 
         "service": "rog-pool-service",
         "version": "7.0",
-        "mongodb": "connected" if mongodb_available else "disconnected"
+        "mongodb": "connected" if mongodb_available else "disconnected",
+        "mongodb_circuit": mongo_supervisor.status()
     }
 
 # User Management endpoints
@@ -346,13 +600,13 @@ async def get_users(current_user: User = Depends(get_current_user)):
     if current_user.role != "administrator":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    if not mongodb_available:
-        return []
+    require_db()
     
     try:
         users = await db.users.find().to_list(1000)
         return [User(**user) for user in users]
     except Exception as e:
+        raise_if_db_down(e)
         logger.error(f"Error fetching users: {e}")
         return []
 
@@ -361,8 +615,7 @@ async def create_user(user_data: UserCreate, current_user: User = Depends(get_cu
     if current_user.role != "administrator":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    if not mongodb_available:
-        raise HTTPException(status_code=503, detail="Database not available")
+    require_db()
     
     try:
         # Check if user exists
@@ -389,6 +642,7 @@ async def create_user(user_data: UserCreate, current_user: User = Depends(get_cu
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_db_down(e)
         logger.error(f"Error creating user: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating user: {e}")
 
@@ -397,8 +651,7 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_use
     if current_user.role != "administrator":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    if not mongodb_available:
-        raise HTTPException(status_code=503, detail="Database not available")
+    require_db()
     
     try:
         # Don't allow deleting admin user
@@ -414,38 +667,153 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_use
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_db_down(e)
         logger.error(f"Error deleting user: {e}")
         raise HTTPException(status_code=500, detail=f"Error deleting user: {e}")
 
 # Client endpoints
 @api_router.get("/clients", response_model=List[Client])
-async def get_clients(current_user: User = Depends(get_current_user)):
-    if not mongodb_available:
-        return []
+async def get_clients(
+    response: Response,
+    page: int = 1,
+    page_size: int = 1000,
+    current_user: User = Depends(get_current_user)
+):
+    """Clients sorted by name; X-Total-Count tells callers when more pages exist"""
+    require_db()
+    
+    page = max(1, page)
+    page_size = max(1, min(page_size, 1000))
     
     try:
-        clients = await db.clients.find().to_list(1000)
+        cursor = db.clients.find({}, {"search_tokens": 0}).sort(CLIENT_SORT)
+        clients = await cursor.skip((page - 1) * page_size).limit(page_size).to_list(page_size)
+        total = await db.clients.estimated_document_count()
+        response.headers["X-Total-Count"] = str(total)
+        response.headers["X-Page"] = str(page)
+        response.headers["X-Page-Size"] = str(page_size)
         return [Client(**client) for client in clients]
     except Exception as e:
+        raise_if_db_down(e)
         logger.error(f"Error fetching clients: {e}")
         return []
 
+@api_router.get("/clients/suggest")
+async def suggest_client_names(prefix: str, limit: int = 10, current_user: User = Depends(get_current_user)):
+    """Typeahead for the report form: id/name/address of clients whose name starts with prefix"""
+    require_db()
+    
+    try:
+        return await suggest_clients(db, prefix, max(1, min(limit, 50)))
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error suggesting clients: {e}")
+        raise HTTPException(status_code=500, detail=f"Error suggesting clients: {e}")
+
 @api_router.post("/clients", response_model=Client)
 async def create_client(client: Client, current_user: User = Depends(get_current_user)):
-    if not mongodb_available:
-        raise HTTPException(status_code=503, detail="Database not available")
+    require_db()
     
     try:
-        await db.clients.insert_one(client.dict())
+        client_data = client.dict()
+        client_data["search_tokens"] = client_tokens(client_data)
+        client_data["name_key"] = name_key(client_data["name"])
+        await db.clients.insert_one(client_data)
+        asyncio.create_task(geocode_clients_now())
         return client
     except Exception as e:
+        raise_if_db_down(e)
         logger.error(f"Error creating client: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating client: {e}")
 
+@api_router.put("/clients/{client_id}", response_model=Client)
+async def update_client(client_id: str, client_update: ClientUpdate, current_user: User = Depends(get_current_user)):
+    require_db()
+    
+    try:
+        existing = await db.clients.find_one({"id": client_id})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Client not found")
+        
+        changes = client_update.dict(exclude_unset=True)
+        for field in ("name", "address"):
+            # Sent as null or blank would leave a client that no longer validates
+            if field in changes and not (changes[field] or "").strip():
+                raise HTTPException(status_code=400, detail=f"{field} cannot be empty")
+        client_data = {**existing, **changes}
+        changes["search_tokens"] = client_tokens(client_data)
+        changes["name_key"] = name_key(client_data["name"])
+        update = {"$set": changes}
+        if client_data["address"] != existing["address"]:
+            # Geocoded again in the background from the new address
+            update["$unset"] = {"geo_key": "", "location": "", "geo_retry_at": "", "geo_table_version": ""}
+            client_data.pop("location", None)
+        await db.clients.update_one({"id": client_id}, update)
+        
+        # Reports carry copies of name/address; fix them up in the background
+        if client_data["name"] != existing["name"] or client_data["address"] != existing["address"]:
+            await enqueue_client_change(db, client_data)
+            asyncio.create_task(propagate_client_changes())
+        if client_data["address"] != existing["address"]:
+            asyncio.create_task(geocode_clients_now())
+        
+        return Client(**client_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error updating client: {e}")
+        raise HTTPException(status_code=500, detail=f"Error updating client: {e}")
+
+async def run_geocoding(db, drain: bool = False):
+    """Geocode pending clients unless a run is already going in any worker.
+    
+    Periodic and on-demand runs share one lease, so they never resolve the
+    same clients twice or interleave requests to a paced geocoder. A skipped
+    run loses nothing: the clients stay pending for the next one.
+    """
+    if not await acquire_lease("geocoding", ttl_seconds=GEOCODE_LEASE_SECONDS):
+        logger.info("Geocoding already running; pending clients wait for the next round")
+        return
+    try:
+        await (geocode_all_pending if drain else geocode_pending_clients)(db)
+    finally:
+        await release_lease("geocoding")
+
+async def geocode_clients_now():
+    """Geocode new or changed clients now instead of waiting for the next round"""
+    try:
+        await run_geocoding(db, drain=True)
+    except Exception as e:
+        mongo_supervisor.record_failure(e)
+        logger.error(f"Error geocoding clients: {e}")
+
+async def propagate_client_changes():
+    """Run the propagation worker now instead of waiting for its next round"""
+    try:
+        await process_propagation_tasks(db)
+    except Exception as e:
+        mongo_supervisor.record_failure(e)
+        logger.error(f"Error propagating client changes: {e}")
+
+@api_router.get("/clients/{client_id}/history", response_model=List[ServiceReport])
+async def get_client_history(client_id: str, limit: int = 200, current_user: User = Depends(get_current_user)):
+    """All reports for a client, newest first, including archived ones"""
+    require_db()
+    
+    try:
+        reports = await find_reports_with_archive(
+            db, {"client_id": client_id}, [("request_date", -1)], max(1, min(limit, 1000))
+        )
+        return [ServiceReport(**report) for report in reports]
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error fetching client history: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching client history: {e}")
+
 @api_router.delete("/clients/{client_id}")
 async def delete_client(client_id: str, current_user: User = Depends(get_current_user)):
-    if not mongodb_available:
-        raise HTTPException(status_code=503, detail="Database not available")
+    require_db()
     
     try:
         result = await db.clients.delete_one({"id": client_id})
@@ -454,6 +822,7 @@ async def delete_client(client_id: str, current_user: User = Depends(get_current
         
         return {"message": "Client deleted successfully"}
     except Exception as e:
+        raise_if_db_down(e)
         logger.error(f"Error deleting client: {e}")
         raise HTTPException(status_code=500, detail=f"Error deleting client: {e}")
 
@@ -463,66 +832,245 @@ async def import_clients_excel(
     employee_id: Optional[str] = Form(None),
     current_user: User = Depends(get_current_user)
 ):
-    if not mongodb_available:
-        raise HTTPException(status_code=503, detail="Database not available")
+    """Import clients through a background job, answering 202 if it takes long"""
+    require_db()
     
     try:
-        # Read Excel file
         contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        
-        # Validate required columns
-        required_columns = ['Name', 'Address']
-        if not all(col in df.columns for col in required_columns):
-            raise HTTPException(status_code=400, detail="Excel file must have 'Name' and 'Address' columns")
-        
-        # Import clients
-        imported_count = 0
-        for _, row in df.iterrows():
-            if pd.notna(row['Name']) and pd.notna(row['Address']):
-                client_data = {
-                    "id": str(uuid.uuid4()),
-                    "name": str(row['Name']).strip(),
-                    "address": str(row['Address']).strip(),
-                    "phone": str(row.get('Phone', '')).strip() if pd.notna(row.get('Phone')) else None,
-                    "email": str(row.get('Email', '')).strip() if pd.notna(row.get('Email')) else None,
-                    "employee_id": employee_id,
-                    "created_at": datetime.now()
-                }
-                
-                # Check for duplicates
-                existing = await db.clients.find_one({
-                    "name": client_data["name"],
-                    "address": client_data["address"]
-                })
-                
-                if not existing:
-                    await db.clients.insert_one(client_data)
-                    imported_count += 1
-        
-        return {"message": f"Successfully imported {imported_count} clients"}
-    
+        job = await job_queue.submit(
+            db, "import_clients", {"employee_id": employee_id, "filename": file.filename},
+            priority=5, submitted_by=current_user.id, blob=contents
+        )
+        finished = await job_queue.wait(db, job["id"], IMPORT_WAIT_SECONDS)
+    except PermanentJobError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
+        raise_if_db_down(e)
         logger.error(f"Error importing Excel: {e}")
         raise HTTPException(status_code=500, detail=f"Error importing Excel file: {e}")
+    
+    if finished is None:
+        return JSONResponse(status_code=202, content={
+            "message": "Import is running in the background", "job_id": job["id"]
+        })
+    if finished["status"] == "failed":
+        raise HTTPException(status_code=400, detail=finished["error"])
+    return {**(finished["result"] or {}), "job_id": job["id"]}
+
+async def run_client_import(db, job):
+    result = await import_clients_job(db, job)
+    if result["imported"]:
+        asyncio.create_task(geocode_clients_now())
+    return result
+
+# Search endpoint
+@api_router.get("/search")
+async def search(
+    q: str,
+    type: str = "all",
+    page: int = 1,
+    page_size: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """Search clients and reports; the last word matches as a prefix"""
+    if type not in ("all", "clients", "reports"):
+        raise HTTPException(status_code=400, detail="type must be all, clients or reports")
+    
+    require_db()
+    
+    page = max(1, page)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    query = build_query(q)
+    empty = {"total": 0, "page": page, "page_size": page_size, "items": []}
+    
+    try:
+        results = {}
+        if type in ("all", "clients"):
+            results["clients"] = await search_collection(
+                db.clients, query, CLIENT_PROJECTION, "name", page, page_size
+            ) if query else empty
+        if type in ("all", "reports"):
+            results["reports"] = await search_collection(
+                db.service_reports, query, REPORT_PROJECTION, "client_name", page, page_size
+            ) if query else empty
+        return results
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error searching: {e}")
+        raise HTTPException(status_code=500, detail=f"Error searching: {e}")
+
+# Export endpoints
+def export_body(cursor, fmt: str, columns, name: str):
+    if fmt == "csv":
+        return stream_csv(cursor, columns), CSV_MEDIA_TYPE
+    return stream_xlsx(cursor, columns, name.capitalize()), XLSX_MEDIA_TYPE
+
+def export_filename(name: str, fmt: str) -> str:
+    return f"{name}-{datetime.now().strftime('%Y%m%d')}.{fmt}"
+
+def export_response(cursor, fmt: str, columns, name: str) -> StreamingResponse:
+    """Stream a cursor as CSV or XLSX without materializing the result"""
+    body, media_type = export_body(cursor, fmt, columns, name)
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(name, fmt)}"'}
+    )
+
+def report_export_cursor(db, status: Optional[str] = None, employee_id: Optional[str] = None,
+                         date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                         include_archived: bool = False):
+    query: Dict[str, Any] = {}
+    if status:
+        query["status"] = status
+    if employee_id:
+        query["employee_id"] = employee_id
+    if date_from or date_to:
+        query["request_date"] = {}
+        if date_from:
+            query["request_date"]["$gte"] = date_from
+        if date_to:
+            query["request_date"]["$lte"] = date_to
+    projection = projection_for(REPORT_COLUMNS)
+    
+    if include_archived:
+        return db.service_reports.aggregate([
+            {"$match": query},
+            {"$project": projection},
+            {"$unionWith": {"coll": ARCHIVE, "pipeline": [{"$match": query}, {"$project": projection}]}},
+            {"$sort": {"request_date": -1}},
+        ], allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE)
+    # Projection keeps photos/videos off the wire
+    return db.service_reports.find(query, projection).sort("request_date", -1).batch_size(EXPORT_BATCH_SIZE)
+
+def client_export_cursor(db, employee_id: Optional[str] = None):
+    query = {"employee_id": employee_id} if employee_id else {}
+    return db.clients.find(query, projection_for(CLIENT_COLUMNS)).sort(CLIENT_SORT).batch_size(EXPORT_BATCH_SIZE)
+
+async def submit_export(name: str, fmt: str, filters: Dict[str, Any], current_user: User) -> JSONResponse:
+    job = await job_queue.submit(db, "export", {"name": name, "fmt": fmt, "filters": filters},
+                                 submitted_by=current_user.id)
+    return JSONResponse(status_code=202, content=jsonable_encoder(job))
+
+async def run_export(db, job):
+    """Write an export to JOB_FILES_DIR for download through /api/jobs/{id}/download"""
+    name, fmt, filters = job["payload"]["name"], job["payload"]["fmt"], job["payload"]["filters"]
+    if name == "reports":
+        cursor, columns = report_export_cursor(db, **filters), REPORT_COLUMNS
+    else:
+        cursor, columns = client_export_cursor(db, **filters), CLIENT_COLUMNS
+    body, media_type = export_body(cursor, fmt, columns, name)
+    path = job_file(f"{job['id']}.{fmt}")
+    size = await write_export(body, path)
+    return {"file": path.name, "filename": export_filename(name, fmt), "media_type": media_type, "bytes": size}
+
+@api_router.get("/exports/reports.{fmt}")
+async def export_reports(
+    fmt: str,
+    status: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    include_archived: bool = False,
+    background: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Reports as CSV or Excel, filtered by status, employee and request date.
+    
+    With background=true the file is built by a job and the job is returned.
+    """
+    if fmt not in ("csv", "xlsx"):
+        raise HTTPException(status_code=404, detail="Unknown export format")
+    
+    require_db()
+    
+    filters = {"status": status, "employee_id": employee_id, "date_from": date_from,
+               "date_to": date_to, "include_archived": include_archived}
+    try:
+        if background:
+            return await submit_export("reports", fmt, filters, current_user)
+        return export_response(report_export_cursor(db, **filters), fmt, REPORT_COLUMNS, "reports")
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error exporting reports: {e}")
+        raise HTTPException(status_code=500, detail=f"Error exporting reports: {e}")
+
+@api_router.get("/exports/clients.{fmt}")
+async def export_clients(
+    fmt: str,
+    employee_id: Optional[str] = None,
+    background: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Clients as CSV or Excel, sorted by name"""
+    if fmt not in ("csv", "xlsx"):
+        raise HTTPException(status_code=404, detail="Unknown export format")
+    
+    require_db()
+    
+    try:
+        if background:
+            return await submit_export("clients", fmt, {"employee_id": employee_id}, current_user)
+        return export_response(client_export_cursor(db, employee_id), fmt, CLIENT_COLUMNS, "clients")
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error exporting clients: {e}")
+        raise HTTPException(status_code=500, detail=f"Error exporting clients: {e}")
 
 # Service Report endpoints
 @api_router.get("/reports", response_model=List[ServiceReport])
-async def get_reports(current_user: User = Depends(get_current_user)):
-    if not mongodb_available:
-        return []
+async def get_reports(
+    overdue: Optional[bool] = None,
+    include_archived: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    require_db()
     
     try:
-        reports = await db.service_reports.find().sort("created_at", -1).to_list(1000)
+        if include_archived and not overdue:
+            reports = await find_reports_with_archive(db, {}, [("created_at", -1)], 1000)
+            return [ServiceReport(**report) for report in reports]
+        if overdue:
+            # Range scan on the (status, due_at) index, most overdue first
+            cursor = db.service_reports.find(overdue_query()).sort("due_at", 1)
+        else:
+            cursor = db.service_reports.find().sort("created_at", -1)
+        reports = await cursor.to_list(1000)
         return [ServiceReport(**report) for report in reports]
     except Exception as e:
+        raise_if_db_down(e)
         logger.error(f"Error fetching reports: {e}")
         return []
 
+@api_router.get("/reports/stats")
+async def get_report_stats(employee_id: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """Dashboard counts by status, priority, employee and age, from report_counters only"""
+    require_db()
+    
+    try:
+        return await get_stats(db, employee_id)
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error fetching report stats: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching report stats: {e}")
+
+@api_router.post("/admin/reports/stats/reconcile")
+async def reconcile_report_stats(current_user: User = Depends(get_current_user)):
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    require_db()
+    
+    try:
+        await reconcile_counters(db)
+        return {"message": "Report counters reconciled"}
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error reconciling report counters: {e}")
+        raise HTTPException(status_code=500, detail=f"Error reconciling report counters: {e}")
+
 @api_router.post("/reports", response_model=ServiceReport)
 async def create_report(report: ServiceReport, current_user: User = Depends(get_current_user)):
-    if not mongodb_available:
-        raise HTTPException(status_code=503, detail="Database not available")
+    require_db()
     
     try:
         # Get client info
@@ -536,16 +1084,26 @@ async def create_report(report: ServiceReport, current_user: User = Depends(get_
             report.employee_id = current_user.id
             report.employee_name = current_user.username
         
-        await db.service_reports.insert_one(report.dict())
+        report.due_at = compute_due_at(report.priority, report.request_date)
+        report.overdue = False
+        
+        report_data = report.dict()
+        report_data["search_tokens"] = report_tokens(report_data)
+        await db.service_reports.insert_one(report_data)
+        try:
+            await record_report_created(db, report_data)
+        except Exception as e:
+            # Reconciliation repairs the counters; the report itself is saved
+            logger.warning(f"Error updating report counters: {e}")
         return report
     except Exception as e:
+        raise_if_db_down(e)
         logger.error(f"Error creating report: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating report: {e}")
 
 @api_router.put("/reports/{report_id}", response_model=ServiceReport)
 async def update_report(report_id: str, updated_report: ServiceReport, current_user: User = Depends(get_current_user)):
-    if not mongodb_available:
-        raise HTTPException(status_code=503, detail="Database not available")
+    require_db()
     
     try:
         # Get existing report
@@ -566,6 +1124,17 @@ async def update_report(report_id: str, updated_report: ServiceReport, current_u
             if updated_report.status == "completed":
                 updated_report.completion_date = datetime.now()
         
+        # Deadline follows the priority; completed reports are never overdue
+        if (updated_report.priority != existing_report.get("priority")
+                or updated_report.request_date != existing_report.get("request_date")
+                or not existing_report.get("due_at")):
+            updated_report.due_at = compute_due_at(updated_report.priority, updated_report.request_date)
+        else:
+            updated_report.due_at = existing_report["due_at"]
+        updated_report.overdue = (
+            updated_report.status in OPEN_STATUSES and updated_report.due_at < datetime.utcnow()
+        )
+        
         if changes:
             modification_entry = {
                 "modified_at": datetime.now(),
@@ -578,49 +1147,579 @@ async def update_report(report_id: str, updated_report: ServiceReport, current_u
                 updated_report.modification_history = []
             updated_report.modification_history.append(modification_entry)
         
+        report_data = updated_report.dict()
+        report_data["search_tokens"] = report_tokens(report_data)
         result = await db.service_reports.update_one(
             {"id": report_id},
-            {"$set": updated_report.dict()}
+            {"$set": report_data}
         )
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Report not found")
         
+        try:
+            await record_report_changed(db, existing_report, report_data)
+        except Exception as e:
+            logger.warning(f"Error updating report counters: {e}")
+        try:
+            await record_turnaround_change(db, existing_report, report_data)
+        except Exception as e:
+            logger.warning(f"Error updating turnaround histograms: {e}")
+        
         return updated_report
     except HTTPException:
         raise
     except Exception as e:
+        raise_if_db_down(e)
         logger.error(f"Error updating report: {e}")
         raise HTTPException(status_code=500, detail=f"Error updating report: {e}")
 
+# Diagnostics endpoints (admin only, require DIAGNOSTICS_ENABLED=true)
+def require_diagnostics(current_user: User):
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not DIAGNOSTICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Diagnostics disabled")
+
+@api_router.get("/admin/diagnostics/loop")
+async def get_loop_diagnostics(limit: int = 20, current_user: User = Depends(get_current_user)):
+    """Recent event-loop blocking events with the stack that caused them"""
+    require_diagnostics(current_user)
+    return {
+        "threshold_ms": loop_monitor.threshold * 1000,
+        "events": loop_monitor.recent_events(limit)
+    }
+
+@api_router.post("/admin/diagnostics/profile")
+async def arm_route_profiler(
+    route: str,
+    requests: int = 1,
+    sort_by: str = "cumulative",
+    current_user: User = Depends(get_current_user)
+):
+    """Profile the next `requests` calls whose path starts with `route`"""
+    require_diagnostics(current_user)
+    if sort_by not in ("cumulative", "tottime", "calls"):
+        raise HTTPException(status_code=400, detail="sort_by must be cumulative, tottime or calls")
+    route_profiler.arm(route, requests, sort_by)
+    return {"message": f"Profiler armed for {route}", "requests": route_profiler.remaining}
+
+@api_router.get("/admin/diagnostics/profile")
+async def get_route_profile(current_user: User = Depends(get_current_user)):
+    """Return the pstats summary captured by the last armed profile"""
+    require_diagnostics(current_user)
+    if route_profiler.last_result is None:
+        return {
+            "status": "pending" if route_profiler.armed_prefix else "idle",
+            "route": route_profiler.armed_prefix,
+            "remaining": route_profiler.remaining
+        }
+    return {"status": "done", **route_profiler.last_result}
+
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(
+    limit: int = 20,
+    explain: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Slowest Mongo query shapes seen in production, with their explain plans"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if explain and mongodb_available:
+        await explain_top_offenders(db, slow_query_listener, limit)
+    
+    return {
+        "threshold_ms": slow_query_listener.threshold_ms,
+        "queries": slow_query_listener.top(limit)
+    }
+
+@api_router.delete("/admin/slow-queries")
+async def reset_slow_queries(current_user: User = Depends(get_current_user)):
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    slow_query_listener.reset()
+    return {"message": "Slow query log cleared"}
+
+@api_router.post("/admin/archive/run")
+async def run_archive(months: Optional[int] = None, current_user: User = Depends(get_current_user)):
+    """Queue an archive run now instead of waiting for the daily job"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    require_db()
+    
+    try:
+        job = await job_queue.submit(
+            db, "archive_reports", {"months": months if months is not None else ARCHIVE_AFTER_MONTHS},
+            submitted_by=current_user.id
+        )
+        return JSONResponse(status_code=202, content=jsonable_encoder(job))
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error archiving reports: {e}")
+        raise HTTPException(status_code=500, detail=f"Error archiving reports: {e}")
+
+@api_router.post("/admin/analytics/snapshot")
+async def run_analytics_snapshot(current_user: User = Depends(get_current_user)):
+    """Rebuild the Parquet snapshot of completed reports now"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    require_db()
+    
+    try:
+        return await write_snapshot(db)
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error writing analytics snapshot: {e}")
+        raise HTTPException(status_code=500, detail=f"Error writing analytics snapshot: {e}")
+
+@api_router.get("/admin/analytics/snapshot")
+async def get_analytics_snapshot(current_user: User = Depends(get_current_user)):
+    """Manifest of the current snapshot: when it was built and rows per partition"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    manifest = read_manifest()
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No analytics snapshot yet")
+    return manifest
+
+@api_router.get("/admin/analytics/snapshot/{year}.parquet")
+async def download_analytics_snapshot(year: int, current_user: User = Depends(get_current_user)):
+    """One year of completed reports as a single Parquet file"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        content = await run_in_threadpool(year_parquet, year)
+    except Exception as e:
+        logger.error(f"Error reading analytics snapshot: {e}")
+        raise HTTPException(status_code=500, detail=f"Error reading analytics snapshot: {e}")
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"No snapshot data for {year}")
+    return Response(
+        content=content,
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="reports-{year}.parquet"'}
+    )
+
+# Analytics endpoints
+@api_router.get("/analytics/query")
+async def query_analytics(
+    metrics: str = "count,revenue,profit",
+    group_by: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    employee_id: Optional[str] = None,
+    client_id: Optional[str] = None,
+    priority: Optional[str] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user)
+):
+    """Revenue, costs, profit and completion time of completed reports, grouped by
+    client, employee, priority, month or day; served from the in-memory table"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    requested = [m.strip() for m in metrics.split(",") if m.strip()]
+    unknown = [m for m in requested if m not in METRICS]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"metrics must be among: {', '.join(METRICS)}")
+    if group_by is not None and group_by not in GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(GROUPS)}")
+    if not analytics_table.ready:
+        raise HTTPException(status_code=503, detail="Analytics are loading", headers={"Retry-After": "5"})
+    
+    try:
+        rows = analytics_table.query(
+            requested, group_by, date_from, date_to, employee_id, client_id, priority,
+            max(1, min(limit, 1000))
+        )
+        return {"rows": rows, "table": analytics_table.status()}
+    except Exception as e:
+        logger.error(f"Error querying analytics: {e}")
+        raise HTTPException(status_code=500, detail=f"Error querying analytics: {e}")
+
+@api_router.get("/analytics/turnaround")
+async def get_turnaround_percentiles(
+    group_by: str = "priority",
+    priority: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """p50/p90/p99 hours from request to completion, by priority and/or employee"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if group_by not in TURNAROUND_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(TURNAROUND_GROUPS)}")
+    
+    require_db()
+    
+    try:
+        return await get_turnaround(db, group_by, priority, employee_id)
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error fetching turnaround: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching turnaround: {e}")
+
+# Schedule endpoints
+@api_router.post("/admin/schedules/generate")
+async def generate_daily_schedules(
+    day: Optional[date] = None,
+    employee_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Plan each technician's route over the day's reports, URGENT first"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    require_db()
+    
+    day = day or datetime.now(LA_TZ).date()
+    try:
+        schedules = await generate_schedules(db, day, employee_id)
+        return {
+            "date": day.isoformat(),
+            "routes": len(schedules),
+            "stops": sum(len(s["stops"]) for s in schedules),
+            "unrouted": sum(len(s["unrouted"]) for s in schedules),
+        }
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error generating schedules: {e}")
+        raise HTTPException(status_code=500, detail=f"Error generating schedules: {e}")
+
+@api_router.get("/schedules")
+async def get_schedules(
+    day: Optional[date] = None,
+    employee_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Planned routes for a day; employees only see their own"""
+    require_db()
+    
+    if current_user.role == "employee":
+        employee_id = current_user.id
+    query = {"date": (day or datetime.now(LA_TZ).date()).isoformat()}
+    if employee_id:
+        query["employee_id"] = employee_id
+    
+    try:
+        return await db[SCHEDULES].find(query, {"_id": 0}).sort("employee_name", 1).to_list(None)
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error fetching schedules: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching schedules: {e}")
+
+# Assignment endpoints
+@api_router.get("/admin/assignments/workload")
+async def get_workload(current_user: User = Depends(get_current_user)):
+    """Open load, urgent count and client centre of every employee"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    require_db()
+    
+    try:
+        return await workload(db)
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error fetching workload: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching workload: {e}")
+
+@api_router.post("/admin/assignments")
+async def assign_reports(request: AssignmentRequest, current_user: User = Depends(get_current_user)):
+    """Propose employees for unassigned open reports, and assign them if apply is set"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    require_db()
+    
+    try:
+        proposals = await propose_assignments(db, request.report_ids)
+        assigned = 0
+        if request.apply:
+            assigned = await apply_assignments(db, proposals, current_user.username, current_user.role)
+        return {"proposals": proposals, "assigned": assigned}
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error assigning reports: {e}")
+        raise HTTPException(status_code=500, detail=f"Error assigning reports: {e}")
+
+# Service plan endpoints
+# Plan fields an update may change but never clear
+PLAN_REQUIRED_FIELDS = ("frequency", "weekday", "priority", "start_date", "active")
+
+def validate_plan(plan: Dict[str, Any]):
+    missing = [field for field in PLAN_REQUIRED_FIELDS if plan.get(field) is None]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"{', '.join(missing)} cannot be null")
+    if plan["frequency"] not in FREQUENCIES:
+        raise HTTPException(status_code=400, detail=f"frequency must be one of: {', '.join(FREQUENCIES)}")
+    if not 0 <= plan["weekday"] <= 6:
+        raise HTTPException(status_code=400, detail="weekday must be 0 (Monday) to 6 (Sunday)")
+    if plan["priority"] not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of: {', '.join(PRIORITIES)}")
+
+def plan_document(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """BSON has no date type; store start_date as midnight"""
+    if isinstance(plan.get("start_date"), date) and not isinstance(plan["start_date"], datetime):
+        plan["start_date"] = datetime.combine(plan["start_date"], time())
+    return plan
+
+@api_router.get("/plans", response_model=List[ServicePlan])
+async def get_plans(client_id: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    require_db()
+    
+    query = {"client_id": client_id} if client_id else {}
+    if current_user.role == "employee":
+        query["employee_id"] = current_user.id
+    try:
+        plans = await db[PLANS].find(query, {"_id": 0}).sort("created_at", 1).to_list(None)
+        return [ServicePlan(**plan) for plan in plans]
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error fetching plans: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching plans: {e}")
+
+@api_router.post("/plans", response_model=ServicePlan)
+async def create_plan(plan: ServicePlan, current_user: User = Depends(get_current_user)):
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    validate_plan(plan.dict())
+    require_db()
+    
+    try:
+        if not await db.clients.find_one({"id": plan.client_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Client not found")
+        await db[PLANS].insert_one(plan_document(plan.dict()))
+        return plan
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error creating plan: {e}")
+        raise HTTPException(status_code=500, detail=f"Error creating plan: {e}")
+
+@api_router.put("/plans/{plan_id}", response_model=ServicePlan)
+async def update_plan(plan_id: str, plan_update: ServicePlanUpdate, current_user: User = Depends(get_current_user)):
+    """Change a plan; its upcoming visits that have not started are scheduled again"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    require_db()
+    
+    try:
+        existing = await db[PLANS].find_one({"id": plan_id}, {"_id": 0})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Plan not found")
+        changes = plan_update.dict(exclude_unset=True)
+        plan_data = {**existing, **changes}
+        validate_plan(plan_data)
+        if changes:
+            await db[PLANS].update_one({"id": plan_id}, {"$set": plan_document(changes)})
+            await rematerialize_plan(db, plan_id)
+        return ServicePlan(**plan_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error updating plan: {e}")
+        raise HTTPException(status_code=500, detail=f"Error updating plan: {e}")
+
+@api_router.delete("/plans/{plan_id}")
+async def delete_plan(plan_id: str, current_user: User = Depends(get_current_user)):
+    """Delete a plan; visits already materialized are kept"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    require_db()
+    
+    try:
+        result = await db[PLANS].delete_one({"id": plan_id})
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail="Plan not found")
+        return {"message": "Plan deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error deleting plan: {e}")
+        raise HTTPException(status_code=500, detail=f"Error deleting plan: {e}")
+
+@api_router.post("/admin/plans/materialize")
+async def run_materialize_plans(days: Optional[int] = None, current_user: User = Depends(get_current_user)):
+    """Create the scheduled visits of all active plans for the coming days now"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    require_db()
+    
+    try:
+        created = await materialize_plans(db, days=max(1, min(days, 90)) if days else PLAN_HORIZON_DAYS)
+        return {"message": f"Created {created} scheduled visits", "created": created}
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error materializing plans: {e}")
+        raise HTTPException(status_code=500, detail=f"Error materializing plans: {e}")
+
+# Background job endpoints
+async def run_archive_job(db, job):
+    moved = await archive_completed_reports(db, job["payload"]["months"])
+    return {"message": f"Archived {moved} reports", "archived": moved}
+
+job_queue.register("import_clients", run_client_import, concurrency=1, max_attempts=2)
+job_queue.register("export", run_export, concurrency=2)
+job_queue.register("archive_reports", run_archive_job, concurrency=1, timeout=6 * 3600)
+
+async def find_visible_job(job_id: str, current_user: User) -> Dict[str, Any]:
+    """A job the user may see: administrators see all, others their own"""
+    job = await db[JOBS].find_one({"_id": job_id}, {"blob": 0})
+    if job is None or (current_user.role != "administrator" and job.get("submitted_by") != current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.get("/jobs")
+async def get_jobs(
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user)
+):
+    """Recent jobs, newest first; employees only see jobs they submitted"""
+    require_db()
+    
+    query: Dict[str, Any] = {}
+    if status:
+        query["status"] = status
+    if type:
+        query["type"] = type
+    if current_user.role != "administrator":
+        query["submitted_by"] = current_user.id
+    try:
+        return await list_jobs(db, query, max(1, min(limit, 500)))
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error fetching jobs: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching jobs: {e}")
+
+@api_router.get("/jobs/metrics")
+async def get_job_metrics(current_user: User = Depends(get_current_user)):
+    """Queue depth, oldest waiting job and run times per job type"""
+    if current_user.role != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    require_db()
+    
+    try:
+        return await job_metrics(db)
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error fetching job metrics: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching job metrics: {e}")
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: User = Depends(get_current_user)):
+    require_db()
+    
+    try:
+        return public_job(await find_visible_job(job_id, current_user))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error fetching job: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching job: {e}")
+
+@api_router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Cancel a queued job, or stop a running one at its next heartbeat"""
+    require_db()
+    
+    try:
+        await find_visible_job(job_id, current_user)
+        return public_job(await job_queue.cancel(db, job_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error cancelling job: {e}")
+        raise HTTPException(status_code=500, detail=f"Error cancelling job: {e}")
+
+@api_router.get("/jobs/{job_id}/download")
+async def download_job_file(job_id: str, current_user: User = Depends(get_current_user)):
+    """The file produced by a finished export job"""
+    require_db()
+    
+    try:
+        job = await find_visible_job(job_id, current_user)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise_if_db_down(e)
+        logger.error(f"Error fetching job: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching job: {e}")
+    
+    result = job.get("result") or {}
+    if job["status"] != "succeeded" or "file" not in result:
+        raise HTTPException(status_code=409, detail="Job has no file to download")
+    path = job_file(result["file"])
+    if not path.is_file():
+        raise HTTPException(status_code=410, detail="Job file has expired")
+    return FileResponse(path, media_type=result.get("media_type"), filename=result.get("filename"))
+
 # Include the router in the main app
 app.include_router(api_router)
 
-# Mount static files for production
+# Serve the React build for production
 static_dir = Path(__file__).parent.parent / "frontend" / "build"
 if static_dir.exists():
-    app.mount("/static", StaticFiles(directory=static_dir / "static"), name="static")
+    index_cache = IndexHtmlCache(static_dir / "index.html")
+    
+    def serve_index(request: Request, fallback: dict):
+        response = index_cache.response(
+            request.headers.get("if-none-match"),
+            request.headers.get("accept-encoding")
+        )
+        return response if response is not None else fallback
+    
+    @app.get("/static/{asset_path:path}")
+    async def serve_static(asset_path: str, request: Request):
+        # Hashed assets: immutable, precompressed when available
+        return serve_asset(static_dir / "static", asset_path, request.headers.get("accept-encoding"))
     
     @app.get("/{catchall:path}")
-    async def serve_spa(catchall: str):
+    async def serve_spa(catchall: str, request: Request):
         # Serve API routes normally
         if catchall.startswith("api/"):
             raise HTTPException(status_code=404, detail="API endpoint not found")
         
+        # Unhashed top-level build files (favicon, manifest.json, ...)
+        if catchall and "/" not in catchall and catchall != "index.html":
+            build_file = static_dir / catchall
+            if build_file.is_file():
+                return FileResponse(build_file, headers={"Cache-Control": "no-cache"})
+        
         # For all other routes, serve the React app
-        index_file = static_dir / "index.html"
-        if index_file.exists():
-            return FileResponse(index_file)
-        else:
-            return {"error": "Frontend not available"}
+        return serve_index(request, {"error": "Frontend not available"})
     
     @app.get("/")
-    async def serve_root():
-        index_file = static_dir / "index.html"
-        if index_file.exists():
-            return FileResponse(index_file)
-        else:
-            return {"message": "ROG Pool Service API", "status": "Frontend not available"}
+    async def serve_root(request: Request):
+        return serve_index(request, {"message": "ROG Pool Service API", "status": "Frontend not available"})
+
+def rate_limit_identity(token: str) -> Optional[str]:
+    """User name in a bearer token, without a database lookup"""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except jwt.PyJWTError:
+        return None
+
+# Inside CORS, so 429 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware, identify=rate_limit_identity)
 
 app.add_middleware(
     CORSMiddleware,
@@ -630,12 +1729,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if DIAGNOSTICS_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
+# Added last so it is outermost and times the whole stack
+if ACCESS_LOG_ENABLED:
+    app.add_middleware(AccessLogMiddleware)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    mongo_supervisor.stop()
+    loop_monitor.stop()
+    job_queue.shutdown()
+    stop_access_logging()
+    await cache.close()
     if client:
         client.close()
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8001))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    if workers > 1:
+        # Multiple workers need an import string so each process builds its own app
+        uvicorn.run("server:app", host="0.0.0.0", port=port, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,200 @@
+"""Recurring service plans and bulk materialization of their visits.
+
+A plan says "visit this client every week (or every other week, or the
+first week of each month) on this weekday, assigned to this employee". The
+materializer walks the active plans in batches and inserts the scheduled
+reports falling in the next PLAN_HORIZON_DAYS with one insert_many per
+batch. Each generated report carries `plan_key` = "<plan id>|<date>" under
+a unique index, so re-running the job (or two workers racing) only inserts
+visits that do not exist yet; duplicate-key errors are the expected way
+existing visits are skipped.
+
+Changing a plan replaces its upcoming visits: the ones nobody has started
+(still "scheduled") from today on are deleted and the plan is materialized
+again, so a new weekday or frequency does not leave the old dates behind.
+
+Visit dates are on the Los Angeles calendar; the report's request_date is
+PLAN_VISIT_HOUR local time on that day, stored as naive UTC.
+"""
+import logging
+import os
+import uuid
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pytz
+from pymongo.errors import BulkWriteError
+
+from report_counters import record_reports_created, record_reports_deleted
+from search import report_tokens
+from sla import LA_TZ, compute_due_at
+
+logger = logging.getLogger(__name__)
+
+PLANS = "service_plans"
+FREQUENCIES = ("weekly", "biweekly", "monthly")
+PLAN_HORIZON_DAYS = int(os.environ.get('PLAN_HORIZON_DAYS', '14'))
+PLAN_VISIT_HOUR = 8
+PLAN_BATCH = 500
+DUPLICATE_KEY = 11000
+
+
+def occurrences(plan: Dict[str, Any], start: date, days: int) -> Iterator[date]:
+    """Visit dates of a plan within [start, start + days)"""
+    weekday = plan["weekday"]
+    first = plan["start_date"]
+    if isinstance(first, datetime):
+        first = first.date()
+    # The plan's first visit: its start date or the next matching weekday
+    first += timedelta(days=(weekday - first.weekday()) % 7)
+    day = max(start, first)
+    day += timedelta(days=(weekday - day.weekday()) % 7)
+    end = start + timedelta(days=days)
+    while day < end:
+        if plan["frequency"] == "weekly":
+            yield day
+        elif plan["frequency"] == "biweekly":
+            if (day - first).days % 14 == 0:
+                yield day
+        elif plan["frequency"] == "monthly":
+            if day.day <= 7:
+                yield day
+        day += timedelta(days=7)
+
+
+def visit_request_date(day: date) -> datetime:
+    local = LA_TZ.localize(datetime.combine(day, time(PLAN_VISIT_HOUR)))
+    return local.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def plan_key(plan_id: str, day: date) -> str:
+    return f"{plan_id}|{day.isoformat()}"
+
+
+async def ensure_plan_indexes(db):
+    await db[PLANS].create_index([("active", 1)])
+    await db[PLANS].create_index([("client_id", 1)])
+    await db.service_reports.create_index(
+        "plan_key", unique=True, partialFilterExpression={"plan_key": {"$exists": True}}
+    )
+
+
+def _visit_report(plan: Dict[str, Any], day: date, client: Dict[str, Any],
+                  employee_name: Optional[str], now: datetime) -> Dict[str, Any]:
+    requested = visit_request_date(day)
+    report = {
+        "id": str(uuid.uuid4()),
+        "plan_key": plan_key(plan["id"], day),
+        "plan_id": plan["id"],
+        "client_id": client["id"],
+        "client_name": client["name"],
+        "client_address": client["address"],
+        "employee_id": plan.get("employee_id"),
+        "employee_name": employee_name,
+        "description": plan.get("description") or "Scheduled pool service",
+        "priority": plan.get("priority") or "SAME WEEK",
+        "status": "scheduled",
+        "photos": [],
+        "videos": [],
+        "employee_notes": None,
+        "admin_notes": None,
+        "total_cost": plan.get("price") or 0.0,
+        "parts_cost": 0.0,
+        "request_date": requested,
+        "completion_date": None,
+        "last_modified": None,
+        "modification_history": [],
+        "overdue": False,
+        "created_at": now,
+        "updated_at": now,
+    }
+    report["due_at"] = compute_due_at(report["priority"], requested)
+    report["search_tokens"] = report_tokens(report)
+    return report
+
+
+async def _insert_visits(db, reports: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert reports, skipping visits that already exist; returns those inserted"""
+    if not reports:
+        return []
+    try:
+        await db.service_reports.insert_many(reports, ordered=False)
+        return reports
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != DUPLICATE_KEY for err in errors):
+            raise
+        skipped = {err["index"] for err in errors}
+        return [report for i, report in enumerate(reports) if i not in skipped]
+
+
+async def materialize_plans(db, start: Optional[date] = None, days: int = PLAN_HORIZON_DAYS,
+                            plan_id: Optional[str] = None) -> int:
+    """Create the scheduled reports of every active plan (or just plan_id) for the coming days"""
+    start = start or datetime.now(LA_TZ).date()
+    now = datetime.now()
+    created = 0
+    query: Dict[str, Any] = {"active": True}
+    if plan_id:
+        query["id"] = plan_id
+    cursor = db[PLANS].find(query, {"_id": 0}).sort("id", 1).batch_size(PLAN_BATCH)
+    batch: List[Dict[str, Any]] = []
+
+    async def flush(plans: List[Dict[str, Any]]) -> int:
+        client_ids = list({p["client_id"] for p in plans})
+        employee_ids = list({p["employee_id"] for p in plans if p.get("employee_id")})
+        clients = {c["id"]: c async for c in db.clients.find(
+            {"id": {"$in": client_ids}}, {"_id": 0, "id": 1, "name": 1, "address": 1}
+        )}
+        employees = {u["id"]: u["username"] async for u in db.users.find(
+            {"id": {"$in": employee_ids}}, {"_id": 0, "id": 1, "username": 1}
+        )}
+        reports = [
+            _visit_report(plan, day, clients[plan["client_id"]], employees.get(plan.get("employee_id")), now)
+            for plan in plans if plan["client_id"] in clients
+            for day in occurrences(plan, start, days)
+        ]
+        inserted = await _insert_visits(db, reports)
+        if inserted:
+            try:
+                await record_reports_created(db, inserted)
+            except Exception as e:
+                # Reconciliation repairs the counters; the visits themselves are saved
+                logger.warning(f"Error updating report counters: {e}")
+        return len(inserted)
+
+    async for plan in cursor:
+        batch.append(plan)
+        if len(batch) >= PLAN_BATCH:
+            created += await flush(batch)
+            batch = []
+    if batch:
+        created += await flush(batch)
+
+    if created:
+        logger.info(f"✅ Materialized {created} scheduled visits from {start.isoformat()} "
+                    f"for the next {days} days")
+    return created
+
+
+async def rematerialize_plan(db, plan_id: str, start: Optional[date] = None,
+                             days: int = PLAN_HORIZON_DAYS) -> Tuple[int, int]:
+    """Replace a changed plan's unstarted visits from start on; returns (removed, created)"""
+    start = start or datetime.now(LA_TZ).date()
+    visits = await db.service_reports.find(
+        {"plan_id": plan_id, "status": "scheduled", "request_date": {"$gte": visit_request_date(start)}},
+        {"_id": 0, "id": 1, "status": 1, "employee_id": 1, "priority": 1}
+    ).to_list(None)
+    if visits:
+        ids = [v["id"] for v in visits]
+        result = await db.service_reports.delete_many({"id": {"$in": ids}, "status": "scheduled"})
+        if result.deleted_count < len(visits):
+            # Visits started in the meantime are kept
+            kept = {r["id"] async for r in db.service_reports.find({"id": {"$in": ids}}, {"_id": 0, "id": 1})}
+            visits = [v for v in visits if v["id"] not in kept]
+        try:
+            await record_reports_deleted(db, visits)
+        except Exception as e:
+            logger.warning(f"Error updating report counters: {e}")
+    created = await materialize_plans(db, start, days, plan_id=plan_id)
+    return len(visits), created
@@ -0,0 +1,119 @@
+"""Priority SLAs: due dates computed at write time and the overdue sweep.
+
+Every report gets a `due_at` when it is created or its priority changes, so
+"which reports are late" is an index range scan on (status, due_at) instead
+of date arithmetic over every report. Deadlines are computed on the Los
+Angeles calendar:
+
+- URGENT: 24 hours after the request
+- SAME WEEK: end of the request's week (Saturday 23:59:59 LA)
+- NEXT WEEK: end of the following week
+
+Naive datetimes are treated as UTC, which is how MongoDB stores them.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import pytz
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+LA_TZ = pytz.timezone('America/Los_Angeles')
+OPEN_STATUSES = ["reported", "scheduled", "in_progress"]
+PRIORITIES = ("URGENT", "SAME WEEK", "NEXT WEEK")
+URGENT_HOURS = 24
+# Python weekday of the last day of a service week
+WEEK_END_WEEKDAY = 5  # Saturday
+SWEEP_BATCH = 1000
+MAX_ALERT_LINES = 20
+
+
+def _to_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return pytz.utc.localize(value)
+    return value.astimezone(pytz.utc)
+
+
+def _end_of_week_la(local: datetime, weeks_ahead: int) -> datetime:
+    days = (WEEK_END_WEEKDAY - local.weekday()) % 7 + 7 * weeks_ahead
+    end_day = (local + timedelta(days=days)).date()
+    # localize() picks the right UTC offset for that date across DST changes
+    return LA_TZ.localize(datetime(end_day.year, end_day.month, end_day.day, 23, 59, 59))
+
+
+def compute_due_at(priority: Optional[str], request_date: datetime) -> datetime:
+    """Deadline for a report, returned as a naive UTC datetime"""
+    requested = _to_utc(request_date)
+    if priority == "URGENT":
+        due = requested + timedelta(hours=URGENT_HOURS)
+    else:
+        local = requested.astimezone(LA_TZ)
+        due = _end_of_week_la(local, 1 if priority == "NEXT WEEK" else 0)
+    return due.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def overdue_query(now: Optional[datetime] = None) -> Dict[str, Any]:
+    return {"status": {"$in": OPEN_STATUSES}, "due_at": {"$lt": now or datetime.utcnow()}}
+
+
+async def ensure_sla_indexes(db):
+    await db.service_reports.create_index([("status", 1), ("due_at", 1)])
+    # Small index for the sweep: only reports not yet flagged
+    await db.service_reports.create_index(
+        [("due_at", 1)],
+        name="due_at_unflagged",
+        partialFilterExpression={"overdue": False},
+    )
+
+
+async def backfill_due_dates(db, batch_size: int = SWEEP_BATCH) -> int:
+    """Give reports written before due_at existed a deadline"""
+    updated = 0
+    while True:
+        docs = await db.service_reports.find(
+            {"due_at": {"$exists": False}},
+            {"_id": 1, "priority": 1, "request_date": 1, "created_at": 1, "status": 1},
+        ).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return updated
+        ops = []
+        for doc in docs:
+            requested = doc.get("request_date") or doc.get("created_at") or datetime.utcnow()
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+                "due_at": compute_due_at(doc.get("priority"), requested),
+                "overdue": False,
+            }}))
+        await db.service_reports.bulk_write(ops, ordered=False)
+        updated += len(ops)
+
+
+async def sweep_overdue(db, now: Optional[datetime] = None) -> int:
+    """Flag open reports that passed their deadline and log an alert for them"""
+    now = now or datetime.utcnow()
+    backfilled = await backfill_due_dates(db)
+    if backfilled:
+        logger.info(f"✅ Backfilled due_at on {backfilled} reports")
+
+    flagged = 0
+    while True:
+        newly_late = await db.service_reports.find(
+            {**overdue_query(now), "overdue": False},
+            {"_id": 0, "id": 1, "client_name": 1, "priority": 1, "employee_name": 1, "due_at": 1},
+        ).limit(SWEEP_BATCH).to_list(SWEEP_BATCH)
+        if not newly_late:
+            break
+        await db.service_reports.update_many(
+            {"id": {"$in": [r["id"] for r in newly_late]}},
+            {"$set": {"overdue": True, "overdue_since": now}},
+        )
+        for report in newly_late[:max(0, MAX_ALERT_LINES - flagged)]:
+            logger.warning(
+                f"⏰ Report overdue: {report.get('client_name')} ({report.get('priority')}), "
+                f"assigned to {report.get('employee_name') or 'nobody'}, due {report.get('due_at')}"
+            )
+        flagged += len(newly_late)
+    if flagged > MAX_ALERT_LINES:
+        logger.warning(f"⏰ {flagged} reports became overdue in this sweep")
+    return flagged
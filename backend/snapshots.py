@@ -0,0 +1,200 @@
+"""Columnar snapshot of completed reports for analytics.
+
+Completed reports (hot and archived) are written to Parquet under
+ANALYTICS_SNAPSHOT_DIR, hive-partitioned as year=YYYY/month=MM by completion
+date, with only the columns analysis needs: dates, employee, client, costs
+and profit. Offline tools (pandas, DuckDB, a spreadsheet import) and the
+analytics endpoints scan these compact files instead of Mongo documents.
+
+Each collection is read in completion order, so partitions arrive one after
+another and a single Parquet writer is open at a time. A run writes into a
+uniquely named temporary directory that replaces the previous snapshot only
+when complete; runs within one process are serialized.
+
+pyarrow is imported lazily so it stays off the server startup path.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from archive import ARCHIVE
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path(os.environ.get('ANALYTICS_SNAPSHOT_DIR', Path(__file__).parent / 'analytics_snapshot'))
+SNAPSHOT_BATCH_SIZE = 5000
+MANIFEST = "_manifest.json"
+
+# The admin endpoint and the periodic job can start a run in the same process
+_write_lock = asyncio.Lock()
+
+SNAPSHOT_PROJECTION = {
+    "_id": 0, "id": 1, "client_id": 1, "client_name": 1, "employee_id": 1, "employee_name": 1,
+    "priority": 1, "request_date": 1, "completion_date": 1, "total_cost": 1, "parts_cost": 1,
+}
+COMPLETED = {"status": "completed", "completion_date": {"$type": "date"}}
+
+
+def snapshot_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.string()),
+        ("client_id", pa.string()),
+        ("client_name", pa.string()),
+        ("employee_id", pa.string()),
+        ("employee_name", pa.string()),
+        ("priority", pa.string()),
+        ("request_date", pa.timestamp("ms")),
+        ("completion_date", pa.timestamp("ms")),
+        ("total_cost", pa.float64()),
+        ("parts_cost", pa.float64()),
+        ("profit", pa.float64()),
+    ])
+
+
+def partition_path(root: Path, year: int, month: int) -> Path:
+    return root / f"year={year}" / f"month={month:02d}"
+
+
+def _record_batch(docs: List[Dict[str, Any]], schema):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    columns = {
+        field: [doc.get(field) for doc in docs]
+        for field in schema.names if field != "profit"
+    }
+    for field in ("total_cost", "parts_cost"):
+        columns[field] = pa.array([value or 0.0 for value in columns[field]], pa.float64())
+    columns["profit"] = pc.subtract(columns["total_cost"], columns["parts_cost"])
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+class _PartitionWriter:
+    """Writes batches sorted by completion date, one partition file at a time"""
+
+    def __init__(self, root: Path, file_name: str, schema):
+        self.root = root
+        self.file_name = file_name
+        self.schema = schema
+        self.rows: Dict[Tuple[int, int], int] = {}
+        self._key: Optional[Tuple[int, int]] = None
+        self._writer = None
+
+    def _switch(self, key: Tuple[int, int]):
+        import pyarrow.parquet as pq
+        self.close()
+        directory = partition_path(self.root, *key)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._writer = pq.ParquetWriter(directory / self.file_name, self.schema, compression="zstd")
+        self._key = key
+
+    def write(self, docs: List[Dict[str, Any]]):
+        start = 0
+        while start < len(docs):
+            completed = docs[start]["completion_date"]
+            key = (completed.year, completed.month)
+            end = start
+            while end < len(docs) and (docs[end]["completion_date"].year,
+                                       docs[end]["completion_date"].month) == key:
+                end += 1
+            if key != self._key:
+                self._switch(key)
+            self._writer.write_batch(_record_batch(docs[start:end], self.schema))
+            self.rows[key] = self.rows.get(key, 0) + end - start
+            start = end
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+async def _write_collection(collection, writer: _PartitionWriter):
+    cursor = collection.find(COMPLETED, SNAPSHOT_PROJECTION) \
+        .sort("completion_date", 1).batch_size(SNAPSHOT_BATCH_SIZE)
+    batch: List[Dict[str, Any]] = []
+    try:
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= SNAPSHOT_BATCH_SIZE:
+                # Encoding and compression are CPU work; keep them off the event loop
+                await asyncio.to_thread(writer.write, batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(writer.write, batch)
+    finally:
+        writer.close()
+
+
+async def write_snapshot(db, root: Path = SNAPSHOT_DIR) -> Dict[str, Any]:
+    """Rebuild the Parquet snapshot of completed reports; returns its manifest"""
+    async with _write_lock:
+        return await _write_snapshot(db, root)
+
+
+async def _write_snapshot(db, root: Path) -> Dict[str, Any]:
+    # Every change from here on may be missing from the files; readers resume from it
+    scan_started_at = datetime.now()
+    schema = snapshot_schema()
+    root.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f"{root.name}.tmp-", dir=root.parent))
+
+    rows: Dict[Tuple[int, int], int] = {}
+    try:
+        for collection, file_name in ((db[ARCHIVE], "archive.parquet"), (db.service_reports, "current.parquet")):
+            writer = _PartitionWriter(staging, file_name, schema)
+            await _write_collection(collection, writer)
+            for key, count in writer.rows.items():
+                rows[key] = rows.get(key, 0) + count
+
+        manifest = {
+            "generated_at": datetime.now().isoformat(),
+            "scan_started_at": scan_started_at.isoformat(),
+            "rows": sum(rows.values()),
+            "partitions": [
+                {"year": year, "month": month, "rows": count}
+                for (year, month), count in sorted(rows.items())
+            ],
+        }
+        (staging / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Swap directories so readers never see a half-written snapshot
+    previous = root.with_name(f"{root.name}.old-{uuid.uuid4().hex}")
+    if root.exists():
+        root.rename(previous)
+    staging.rename(root)
+    shutil.rmtree(previous, ignore_errors=True)
+
+    logger.info(f"✅ Analytics snapshot written: {manifest['rows']} reports in "
+                f"{len(manifest['partitions'])} partitions")
+    return manifest
+
+
+def read_manifest(root: Path = SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((root / MANIFEST).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def year_parquet(year: int, root: Path = SNAPSHOT_DIR) -> Optional[bytes]:
+    """One year of the snapshot as a single Parquet file, or None if absent"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    directory = root / f"year={year}"
+    if not directory.is_dir():
+        return None
+    table = pq.read_table(directory, schema=snapshot_schema()).sort_by("completion_date")
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
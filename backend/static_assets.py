@@ -0,0 +1,89 @@
+"""Serving of the React build: hashed assets and the SPA shell.
+
+Files under build/static carry a content hash in their name, so they are
+served with a one-year immutable Cache-Control and, when present, a
+precompressed .br or .gz sibling picked from Accept-Encoding (see
+scripts/precompress_assets.py). index.html is kept in memory with an ETag
+and always revalidated, so a repeat visit costs one 304.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+from typing import Optional
+
+from fastapi.responses import FileResponse, Response
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# Checked in preference order
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> set:
+    """Encodings the client accepts (ignores q-values other than q=0)"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if token and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(token.lower())
+    return accepted
+
+
+def serve_asset(static_root: Path, asset_path: str, accept_encoding: Optional[str]) -> Response:
+    """Serve a hashed asset, preferring a precompressed variant"""
+    root = static_root.resolve()
+    path = (root / asset_path).resolve()
+    if root not in path.parents or not path.is_file():
+        return Response(status_code=404)
+
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    headers = {"Cache-Control": IMMUTABLE_CACHE, "Vary": "Accept-Encoding"}
+    accepted = accepted_encodings(accept_encoding)
+    for encoding, suffix in ENCODINGS:
+        variant = path.with_name(path.name + suffix)
+        if encoding in accepted and variant.is_file():
+            headers["Content-Encoding"] = encoding
+            return FileResponse(variant, media_type=media_type, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+class IndexHtmlCache:
+    """index.html held in memory (plain and gzipped) with a content ETag.
+
+    The file is re-read only when its mtime changes, e.g. after a rebuild.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._mtime = None
+        self._body = b""
+        self._gzipped = b""
+        self._etag = ""
+
+    def _refresh(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime != self._mtime:
+            body = self.path.read_bytes()
+            self._body = body
+            self._gzipped = gzip.compress(body, compresslevel=9)
+            self._etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+            self._mtime = mtime
+        return True
+
+    def response(self, if_none_match: Optional[str], accept_encoding: Optional[str]) -> Optional[Response]:
+        """Return the index response, or None if the build has no index.html"""
+        if not self._refresh():
+            return None
+        headers = {"ETag": self._etag, "Cache-Control": REVALIDATE_CACHE, "Vary": "Accept-Encoding"}
+        if if_none_match and self._etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        if "gzip" in accepted_encodings(accept_encoding):
+            headers["Content-Encoding"] = "gzip"
+            return Response(self._gzipped, media_type="text/html", headers=headers)
+        return Response(self._body, media_type="text/html", headers=headers)
@@ -0,0 +1,181 @@
+"""Turnaround (request to completion) distributions.
+
+Each (priority, employee_id) pair has one document in `turnaround_histograms`
+holding sparse counts over log-spaced hour buckets, from 15 minutes to 90
+days with about 16% relative width. Completing a report (or reopening or
+re-dating a completed one) moves one count with $inc, so p50/p90/p99 for any
+priority or employee are read from a handful of small documents. A periodic
+rebuild recomputes every histogram from hot and archived reports with NumPy
+to repair drift.
+
+Dates are stored as naive UTC, so the elapsed time between request and
+completion is the same on the Los Angeles calendar, DST changes included.
+"""
+import logging
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from archive import ARCHIVE
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAMS = "turnaround_histograms"
+BUCKET_COUNT = 64
+MIN_HOURS = 0.25
+MAX_HOURS = 24 * 90
+# Upper bounds of buckets 0..62; the last bucket holds everything slower
+UPPER_BOUNDS = [
+    MIN_HOURS * (MAX_HOURS / MIN_HOURS) ** (i / (BUCKET_COUNT - 2)) for i in range(BUCKET_COUNT - 1)
+]
+PERCENTILES = (("p50_hours", 0.50), ("p90_hours", 0.90), ("p99_hours", 0.99))
+GROUP_FIELDS = {
+    "all": (),
+    "priority": ("priority",),
+    "employee": ("employee_id",),
+    "priority_employee": ("priority", "employee_id"),
+}
+REBUILD_BATCH = 5000
+
+
+def histogram_key(priority: Optional[str], employee_id: Optional[str]) -> str:
+    return f"{priority}|{employee_id or ''}"
+
+
+def bucket_for(hours: float) -> int:
+    return bisect_right(UPPER_BOUNDS, max(0.0, hours))
+
+
+def _entry(report: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+    requested, completed = report.get("request_date"), report.get("completion_date")
+    if report.get("status") != "completed" or not isinstance(requested, datetime) \
+            or not isinstance(completed, datetime):
+        return None
+    hours = (completed - requested).total_seconds() / 3600
+    return histogram_key(report.get("priority"), report.get("employee_id")), bucket_for(hours)
+
+
+def _histogram_update(report: Dict[str, Any], bucket: int, amount: int) -> UpdateOne:
+    return UpdateOne(
+        {"_id": histogram_key(report.get("priority"), report.get("employee_id"))},
+        {
+            "$inc": {f"counts.{bucket}": amount, "total": amount},
+            "$setOnInsert": {"priority": report.get("priority"), "employee_id": report.get("employee_id")},
+        },
+        upsert=True,
+    )
+
+
+async def record_turnaround_change(db, before: Dict[str, Any], after: Dict[str, Any]):
+    """Move a report's count when it is completed, reopened or re-dated"""
+    old, new = _entry(before), _entry(after)
+    if old == new:
+        return
+    ops = []
+    if old:
+        ops.append(_histogram_update(before, old[1], -1))
+    if new:
+        ops.append(_histogram_update(after, new[1], 1))
+    await db[HISTOGRAMS].bulk_write(ops, ordered=False)
+
+
+async def rebuild_turnaround(db):
+    """Recompute every histogram from completed hot and archived reports"""
+    import numpy as np
+    projection = {"_id": 0, "priority": 1, "employee_id": 1, "request_date": 1, "completion_date": 1}
+    query = {"status": "completed", "request_date": {"$type": "date"}, "completion_date": {"$type": "date"}}
+    keys: List[str] = []
+    requested: List[datetime] = []
+    completed: List[datetime] = []
+    groups: Dict[str, Dict[str, Any]] = {}
+    for collection in (db.service_reports, db[ARCHIVE]):
+        async for doc in collection.find(query, projection).batch_size(REBUILD_BATCH):
+            key = histogram_key(doc.get("priority"), doc.get("employee_id"))
+            groups.setdefault(key, {"priority": doc.get("priority"), "employee_id": doc.get("employee_id")})
+            keys.append(key)
+            requested.append(doc["request_date"])
+            completed.append(doc["completion_date"])
+
+    ops: List[UpdateOne] = []
+    names: List[str] = []
+    if keys:
+        hours = (np.array(completed, dtype="datetime64[s]") - np.array(requested, dtype="datetime64[s]")) \
+            .astype(np.float64) / 3600
+        buckets = np.searchsorted(np.array(UPPER_BOUNDS), np.maximum(hours, 0.0), side="right")
+        unique, group_index = np.unique(np.array(keys), return_inverse=True)
+        names = unique.tolist()
+        counts = np.bincount(group_index * BUCKET_COUNT + buckets, minlength=len(names) * BUCKET_COUNT) \
+            .reshape(len(names), BUCKET_COUNT)
+        for name, row in zip(names, counts):
+            nonzero = np.flatnonzero(row)
+            ops.append(UpdateOne({"_id": name}, {"$set": {
+                **groups[name],
+                "counts": {str(b): int(row[b]) for b in nonzero},
+                "total": int(row.sum()),
+            }}, upsert=True))
+    if ops:
+        await db[HISTOGRAMS].bulk_write(ops, ordered=False)
+    await db[HISTOGRAMS].delete_many({"_id": {"$nin": names}})
+    logger.info(f"✅ Rebuilt {len(ops)} turnaround histograms from {len(keys)} completed reports")
+
+
+async def ensure_turnaround_histograms(db):
+    """Build the histograms once if they have never been computed"""
+    if await db[HISTOGRAMS].estimated_document_count() == 0:
+        await rebuild_turnaround(db)
+
+
+def percentile(counts: List[int], q: float) -> Optional[float]:
+    """Hours at quantile q, interpolated geometrically inside the bucket"""
+    total = sum(counts)
+    if total <= 0:
+        return None
+    target = q * total
+    seen = 0
+    for bucket, count in enumerate(counts):
+        if count <= 0:
+            continue
+        if seen + count >= target:
+            if bucket >= len(UPPER_BOUNDS):
+                return UPPER_BOUNDS[-1]
+            upper = UPPER_BOUNDS[bucket]
+            lower = UPPER_BOUNDS[bucket - 1] if bucket else 0.0
+            fraction = (target - seen) / count
+            if lower == 0.0:
+                return upper * fraction
+            return lower * (upper / lower) ** fraction
+        seen += count
+    return UPPER_BOUNDS[-1]
+
+
+async def get_turnaround(db, group_by: str = "priority", priority: Optional[str] = None,
+                         employee_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    query: Dict[str, Any] = {}
+    if priority:
+        query["priority"] = priority
+    if employee_id:
+        query["employee_id"] = employee_id
+    fields = GROUP_FIELDS[group_by]
+
+    merged: Dict[Tuple, List[int]] = {}
+    async for doc in db[HISTOGRAMS].find(query):
+        group = tuple(doc.get(field) for field in fields)
+        counts = merged.setdefault(group, [0] * BUCKET_COUNT)
+        for bucket, count in (doc.get("counts") or {}).items():
+            counts[int(bucket)] += count
+
+    rows = []
+    for group, counts in merged.items():
+        total = sum(counts)
+        if total <= 0:
+            continue
+        row: Dict[str, Any] = dict(zip(fields, group))
+        row["count"] = total
+        for name, q in PERCENTILES:
+            value = percentile(counts, q)
+            row[name] = None if value is None else round(value, 1)
+        rows.append(row)
+    rows.sort(key=lambda row: [str(row.get(field) or "") for field in fields])
+    return rows
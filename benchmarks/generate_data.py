@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+ROG Pool Service - Synthetic data generator
+
+Fills a MongoDB database with production-like volume using bulk inserts:
+employees, clients spread across employees, and service reports spread over
+several years with statuses, costs, modification histories and optional
+fake media.
+
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=rog_bench \\
+      python benchmarks/generate_data.py --clients 20000 --reports 300000 --drop
+
+Every employee gets the password "password123"; the admin keeps "admin123".
+"""
+
+import argparse
+import base64
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+STREETS = ["Ocean Ave", "Sunset Blvd", "Wilshire Blvd", "Main St", "Pico Blvd", "Venice Blvd",
+           "Olympic Blvd", "Lincoln Blvd", "Santa Monica Blvd", "Melrose Ave", "Fairfax Ave", "La Brea Ave"]
+CITIES = ["Los Angeles", "Santa Monica", "Pasadena", "Burbank", "Glendale", "Malibu", "Culver City", "Torrance"]
+FIRST_NAMES = ["James", "Maria", "Robert", "Linda", "Michael", "Patricia", "David", "Jennifer", "Carlos",
+               "Ana", "John", "Sofia", "Daniel", "Laura", "Paul", "Emma", "Lucas", "Olivia", "Mark", "Julia"]
+LAST_NAMES = ["Smith", "Garcia", "Johnson", "Martinez", "Brown", "Lopez", "Davis", "Silva", "Miller",
+              "Santos", "Wilson", "Anderson", "Taylor", "Thomas", "Moore", "Jackson", "White", "Harris"]
+JOBS = ["Weekly cleaning", "Filter replacement", "Pump repair", "Heater not starting", "Green water treatment",
+        "Chemical balancing", "Leak inspection", "Salt cell cleaning", "Motor noise", "Tile cleaning"]
+PRIORITIES = ["URGENT", "SAME WEEK", "NEXT WEEK"]
+PRIORITY_WEIGHTS = [0.15, 0.55, 0.30]
+STATUS_FLOW = ["reported", "scheduled", "in_progress", "completed"]
+
+
+def fake_media(kind, size_kb):
+    mime = "image/jpeg" if kind == "photo" else "video/mp4"
+    return f"data:{mime};base64," + base64.b64encode(os.urandom(size_kb * 1024)).decode()
+
+
+def make_employees(count, password_hash, now):
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "username": f"tech{i + 1:03d}",
+            "password_hash": password_hash,
+            "role": "employee",
+            "created_at": now - timedelta(days=random.randint(30, 2000)),
+        }
+        for i in range(count)
+    ]
+
+
+def make_client(i, employees, now, years):
+    first, last = random.choice(FIRST_NAMES), random.choice(LAST_NAMES)
+    employee = random.choice(employees)
+    return {
+        "id": str(uuid.uuid4()),
+        "name": f"{first} {last} #{i}",
+        "address": f"{random.randint(1, 9999)} {random.choice(STREETS)}, {random.choice(CITIES)}, CA",
+        "phone": f"({random.randint(200, 999)}) {random.randint(200, 999)}-{random.randint(1000, 9999)}",
+        "email": f"{first.lower()}.{last.lower()}{i}@example.com",
+        "employee_id": employee["id"],
+        "created_at": now - timedelta(days=random.randint(0, 365 * years)),
+    }
+
+
+def make_report(client, employees, employee_by_id, now, years, opts, photo_pool, video_pool):
+    employee = employee_by_id.get(client["employee_id"]) or random.choice(employees)
+    requested = now - timedelta(minutes=random.randint(0, 365 * years * 24 * 60))
+    age_days = (now - requested).days
+    # Old reports are almost always completed; recent ones are spread across the board
+    if age_days > 30 or random.random() < 0.6:
+        final_status = "completed"
+    else:
+        final_status = random.choice(STATUS_FLOW[:3])
+
+    history = []
+    modified = requested
+    for status in STATUS_FLOW[1:STATUS_FLOW.index(final_status) + 1][:opts.history]:
+        modified = modified + timedelta(hours=random.randint(1, 72))
+        by_admin = random.random() < 0.5
+        history.append({
+            "modified_at": min(modified, now),
+            "modified_by": "admin" if by_admin else employee["username"],
+            "modified_by_role": "administrator" if by_admin else "employee",
+            "changes": [f"Status: {STATUS_FLOW[STATUS_FLOW.index(status) - 1]} → {status}"],
+        })
+
+    completed = final_status == "completed"
+    total_cost = round(random.uniform(80, 2500), 2) if completed else 0.0
+    return {
+        "id": str(uuid.uuid4()),
+        "client_id": client["id"],
+        "client_name": client["name"],
+        "client_address": client["address"],
+        "employee_id": employee["id"],
+        "employee_name": employee["username"],
+        "description": random.choice(JOBS),
+        "priority": random.choices(PRIORITIES, PRIORITY_WEIGHTS)[0],
+        "status": final_status,
+        "photos": random.sample(photo_pool, k=min(opts.photos, len(photo_pool))),
+        "videos": random.sample(video_pool, k=min(opts.videos, len(video_pool))),
+        "employee_notes": "Generated report",
+        "admin_notes": None,
+        "total_cost": total_cost,
+        "parts_cost": round(total_cost * random.uniform(0.1, 0.6), 2) if completed else 0.0,
+        "request_date": requested,
+        "completion_date": min(modified, now) if completed else None,
+        "last_modified": min(modified, now),
+        "modification_history": history,
+        "created_at": requested,
+        "updated_at": min(modified, now),
+    }
+
+
+def insert_batched(collection, docs_iter, total, batch_size, label):
+    batch, inserted, start = [], 0, time.time()
+    for doc in docs_iter:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+            rate = inserted / max(time.time() - start, 1e-6)
+            print(f"\r  {label}: {inserted}/{total} ({rate:,.0f}/s)", end="", flush=True)
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    print(f"\r  ✅ {label}: {inserted} in {time.time() - start:.1f}s" + " " * 20)
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic ROG Pool Service data")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default=os.environ.get("DB_NAME", "rog_bench"))
+    parser.add_argument("--employees", type=int, default=25)
+    parser.add_argument("--clients", type=int, default=20000)
+    parser.add_argument("--reports", type=int, default=300000)
+    parser.add_argument("--years", type=int, default=3, help="Spread report dates over this many years")
+    parser.add_argument("--history", type=int, default=3, help="Max modification_history entries per report")
+    parser.add_argument("--photos", type=int, default=0, help="Photos per report")
+    parser.add_argument("--videos", type=int, default=0, help="Videos per report")
+    parser.add_argument("--media-kb", type=int, default=50, help="Size of each fake media item")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="Drop users/clients/service_reports first")
+    opts = parser.parse_args()
+
+    random.seed(opts.seed)
+    db = MongoClient(opts.mongo_url)[opts.db]
+    now = datetime.now()
+    print(f"🏊 Generating data in {opts.db}")
+
+    if opts.drop:
+        for name in ("users", "clients", "service_reports"):
+            db[name].drop()
+        print("  🗑️  Dropped existing collections")
+
+    # bcrypt once; hashing per employee would dominate small runs
+    from passlib.context import CryptContext
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    if not db.users.find_one({"username": "admin"}):
+        db.users.insert_one({"id": str(uuid.uuid4()), "username": "admin",
+                             "password_hash": pwd_context.hash("admin123"),
+                             "role": "administrator", "created_at": now})
+    employees = make_employees(opts.employees, pwd_context.hash("password123"), now)
+    if employees:
+        db.users.insert_many(employees)
+    else:
+        employees = [{"id": None, "username": "admin"}]
+    employee_by_id = {e["id"]: e for e in employees}
+    print(f"  ✅ users: {opts.employees} employees")
+
+    if opts.clients < 1:
+        parser.error("--clients must be at least 1")
+    clients = [make_client(i, employees, now, opts.years) for i in range(opts.clients)]
+    insert_batched(db.clients, iter(clients), len(clients), opts.batch_size, "clients")
+
+    # A small pool of media blobs reused across reports keeps generation fast
+    # while still giving every document its configured size
+    photo_pool = [fake_media("photo", opts.media_kb) for _ in range(min(opts.photos * 4, 50))]
+    video_pool = [fake_media("video", opts.media_kb) for _ in range(min(opts.videos * 4, 20))]
+    reports = (
+        make_report(random.choice(clients), employees, employee_by_id, now, opts.years, opts, photo_pool, video_pool)
+        for _ in range(opts.reports)
+    )
+    insert_batched(db.service_reports, reports, opts.reports, opts.batch_size, "service_reports")
+
+    print("🎉 Done")
+
+
+if __name__ == "__main__":
+    main()
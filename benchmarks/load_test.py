@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+ROG Pool Service - API load test
+
+Runs repeatable scenarios against a local server and writes a JSON report
+with p50/p95/p99 latency and throughput per scenario, so two commits can be
+compared with --compare.
+
+    # against a server you started yourself (local MongoDB)
+    python benchmarks/load_test.py --url http://localhost:8001
+
+    # start backend/server.py on mongomock-motor and benchmark it
+    python benchmarks/load_test.py --spawn mock --out bench_results.json
+
+    # diff against a previous run
+    python benchmarks/load_test.py --spawn mock --compare bench_baseline.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from io import BytesIO
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+ADMIN = {"username": "admin", "password": "admin123"}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class ScenarioResult:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.status_counts = {}
+        self.bytes_received = 0
+        self.started = None
+        self.finished = None
+
+    def record(self, response, elapsed):
+        self.latencies.append(elapsed * 1000)
+        self.status_counts[response.status_code] = self.status_counts.get(response.status_code, 0) + 1
+        self.bytes_received += len(response.content)
+        if response.status_code >= 400:
+            self.errors += 1
+
+    def summary(self):
+        values = sorted(self.latencies)
+        duration = (self.finished or time.perf_counter()) - (self.started or 0)
+        return {
+            "requests": len(values),
+            "errors": self.errors,
+            "status": {str(k): v for k, v in sorted(self.status_counts.items())},
+            "duration_s": round(duration, 3),
+            "throughput_rps": round(len(values) / duration, 2) if duration > 0 else None,
+            "mean_ms": round(statistics.fmean(values), 2) if values else None,
+            "p50_ms": round(percentile(values, 50), 2) if values else None,
+            "p95_ms": round(percentile(values, 95), 2) if values else None,
+            "p99_ms": round(percentile(values, 99), 2) if values else None,
+            "max_ms": round(values[-1], 2) if values else None,
+            "bytes_received": self.bytes_received,
+        }
+
+
+async def timed(http, result, method, url, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await http.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        result.latencies.append((time.perf_counter() - start) * 1000)
+        result.errors += 1
+        return None
+    result.record(response, time.perf_counter() - start)
+    return response
+
+
+async def run_concurrent(result, concurrency, total, make_call):
+    """Run `total` calls of `make_call(i)` with at most `concurrency` in flight"""
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            await make_call(i)
+
+    result.started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.finished = time.perf_counter()
+    return result
+
+
+async def login(http, api):
+    response = await http.post(f"{api}/auth/login", json=ADMIN)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def login_when_seeded(http, api, timeout=60):
+    """Log in once default data is seeded.
+
+    The server answers /api/health before its background seed finishes, and
+    until the admin user exists every authenticated call returns 401.
+    """
+    deadline = time.time() + timeout
+    while True:
+        headers = await login(http, api)
+        response = await http.get(f"{api}/auth/me", headers=headers)
+        if response.status_code == 200:
+            return headers
+        if time.time() >= deadline:
+            raise RuntimeError(f"Admin user still not usable after {timeout}s: "
+                               f"{response.status_code} {response.text[:200]}")
+        await asyncio.sleep(0.25)
+
+
+def expect_list(response, what):
+    body = response.json()
+    if not isinstance(body, list):
+        raise RuntimeError(f"Expected a list of {what}, got {response.status_code}: {str(body)[:200]}")
+    return body
+
+
+def fake_photo(size_kb):
+    return "data:image/jpeg;base64," + base64.b64encode(os.urandom(size_kb * 1024)).decode()
+
+
+def build_excel(rows):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["Name", "Address", "Phone", "Email"])
+    run = uuid.uuid4().hex[:8]
+    for i in range(rows):
+        ws.append([f"Bench Client {run}-{i}", f"{i} Bench St, Los Angeles, CA", "(555) 000-0000", f"c{i}@bench.test"])
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+# Scenarios
+
+async def scenario_login_burst(http, api, headers, opts):
+    result = ScenarioResult("login_burst")
+    return await run_concurrent(
+        result, opts.concurrency, opts.requests,
+        lambda i: timed(http, result, "POST", f"{api}/auth/login", json=ADMIN),
+    )
+
+
+async def scenario_board_refresh(http, api, headers, opts):
+    """What the Active board does on load: reports, clients and users"""
+    result = ScenarioResult("board_refresh")
+
+    async def call(i):
+        await asyncio.gather(
+            timed(http, result, "GET", f"{api}/reports", headers=headers),
+            timed(http, result, "GET", f"{api}/clients", headers=headers),
+            timed(http, result, "GET", f"{api}/users", headers=headers),
+        )
+
+    return await run_concurrent(result, opts.concurrency, opts.requests, call)
+
+
+async def scenario_report_create(http, api, headers, opts):
+    result = ScenarioResult("report_create_with_photos")
+    clients = expect_list(await http.get(f"{api}/clients", headers=headers), "clients")
+    if not clients:
+        response = await http.post(f"{api}/clients", headers=headers,
+                                   json={"name": "Bench Client", "address": "1 Bench St"})
+        response.raise_for_status()
+        clients = [response.json()]
+    photos = [fake_photo(opts.photo_kb) for _ in range(opts.photos)]
+
+    def call(i):
+        client = clients[i % len(clients)]
+        body = {
+            "client_id": client["id"],
+            "client_name": client["name"],
+            "client_address": client["address"],
+            "description": f"Benchmark report {i}",
+            "priority": ["URGENT", "SAME WEEK", "NEXT WEEK"][i % 3],
+            "photos": photos,
+        }
+        return timed(http, result, "POST", f"{api}/reports", headers=headers, json=body)
+
+    return await run_concurrent(result, opts.concurrency, opts.requests, call)
+
+
+async def scenario_bulk_import(http, api, headers, opts):
+    result = ScenarioResult("bulk_import")
+    # Each import gets a fresh file so duplicate detection does not short-circuit
+    files = [build_excel(opts.import_rows) for _ in range(opts.import_runs)]
+
+    def call(i):
+        return timed(
+            http, result, "POST", f"{api}/clients/import-excel", headers=headers,
+            files={"file": ("clients.xlsx", files[i], "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+        )
+
+    return await run_concurrent(result, 1, opts.import_runs, call)
+
+
+async def scenario_pdf_export(http, api, headers, opts):
+    """PDF export is rendered in the browser; the server cost is the full report fetch it starts with"""
+    result = ScenarioResult("pdf_export")
+    return await run_concurrent(
+        result, max(1, opts.concurrency // 4), max(1, opts.requests // 4),
+        lambda i: timed(http, result, "GET", f"{api}/reports", headers=headers),
+    )
+
+
+SCENARIOS = {
+    "login_burst": scenario_login_burst,
+    "board_refresh": scenario_board_refresh,
+    "report_create_with_photos": scenario_report_create,
+    "bulk_import": scenario_bulk_import,
+    "pdf_export": scenario_pdf_export,
+}
+
+
+def spawn_server(mode, port, workers=1, rate_limit=False):
+    if mode == "mock":
+        cmd = [sys.executable, str(ROOT_DIR / "benchmarks" / "mock_server.py"), "--port", str(port)]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--workers", str(workers)]
+    # The per-client limiter would turn most of a single-user burst into 429s
+    env = {**os.environ, "ACCESS_LOG_ENABLED": "false", "RATE_LIMIT_ENABLED": "true" if rate_limit else "false"}
+    return subprocess.Popen(cmd, cwd=ROOT_DIR / "backend", env=env)
+
+
+async def wait_until_up(url, timeout=60):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.time() < deadline:
+            try:
+                if (await http.get(f"{url}/api/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server at {url} did not become healthy in {timeout}s")
+
+
+def compare(current, baseline):
+    print(f"\n{'scenario':<28}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, stats in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            a, b = old.get(metric), stats.get(metric)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"{name:<28}{metric:<16}{a:>12}{b:>12}{change:>10}")
+
+
+async def main_async(opts):
+    process = None
+    url = opts.url.rstrip("/")
+    if opts.spawn:
+        url = f"http://127.0.0.1:{opts.port}"
+        process = spawn_server(opts.spawn, opts.port, opts.workers, opts.rate_limit)
+    try:
+        await wait_until_up(url)
+        api = f"{url}/api"
+        limits = httpx.Limits(max_connections=opts.concurrency * 3)
+        async with httpx.AsyncClient(timeout=opts.timeout, limits=limits) as http:
+            headers = await login_when_seeded(http, api)
+            report = {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "url": url,
+                "options": {k: v for k, v in vars(opts).items() if k not in ("out", "compare")},
+                "scenarios": {},
+            }
+            for name in opts.scenarios:
+                print(f"▶️  {name} ...", flush=True)
+                result = await SCENARIOS[name](http, api, headers, opts)
+                report["scenarios"][name] = result.summary()
+                s = report["scenarios"][name]
+                print(f"   {s['requests']} req, {s['errors']} errors, p50 {s['p50_ms']} ms, "
+                      f"p95 {s['p95_ms']} ms, p99 {s['p99_ms']} ms, {s['throughput_rps']} req/s")
+        return report
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="ROG Pool Service API load test")
+    parser.add_argument("--url", default="http://localhost:8001", help="Server to test when not spawning one")
+    parser.add_argument("--spawn", choices=["mock", "local"], help="Start a server: mongomock or local MongoDB (MONGO_URL)")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn local")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the API rate limiter on in the spawned server")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--photos", type=int, default=3, help="Photos per created report")
+    parser.add_argument("--photo-kb", type=int, default=200)
+    parser.add_argument("--import-rows", type=int, default=500)
+    parser.add_argument("--import-runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="Previous JSON report to diff against")
+    return parser
+
+
+def main():
+    opts = build_parser().parse_args()
+
+    report = asyncio.run(main_async(opts))
+    with open(opts.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Report written to {opts.out}")
+
+    if opts.compare:
+        with open(opts.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
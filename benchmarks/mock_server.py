@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Start backend/server.py with an in-memory mongomock-motor database.
+
+Used by load_test.py when no local MongoDB is available. Numbers measured
+against mongomock are only comparable with other mongomock runs: they show
+API/serialization overhead, not real query plans.
+
+    python benchmarks/mock_server.py --port 8011
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API against mongomock-motor")
+    parser.add_argument("--port", type=int, default=8011)
+    args = parser.parse_args()
+
+    # Keep JSON access lines out of the benchmark's stdout, and 429s out of its results
+    os.environ.setdefault("ACCESS_LOG_ENABLED", "false")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    from mongomock_motor import AsyncMongoMockClient
+    import server
+
+    def mock_client(url, **kwargs):
+        # mongomock does not support command listeners
+        return AsyncMongoMockClient()
+
+    server.AsyncIOMotorClient = mock_client
+
+    import uvicorn
+    uvicorn.run(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
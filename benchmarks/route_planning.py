@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+ROG Pool Service - Route planning benchmark
+
+Times backend/routing.py on random stops around Los Angeles:
+
+- nearest neighbour alone, then polished with 2-opt (km saved, time taken)
+- plan_route with URGENT stops first, inline and through the process pool
+
+    python benchmarks/route_planning.py --stops 500 --runs 5
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from routing import distance_matrix, nearest_neighbour, plan_route, two_opt  # noqa: E402
+
+# Roughly the LA basin
+LAT_RANGE = (33.7, 34.3)
+LNG_RANGE = (-118.7, -117.9)
+
+
+def path_km(dist, path):
+    return float(sum(dist[a, b] for a, b in zip(path, path[1:])))
+
+
+def timed(fn, runs):
+    times, result = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, round(statistics.median(times), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark technician route planning")
+    parser.add_argument("--stops", type=int, default=500)
+    parser.add_argument("--urgent", type=float, default=0.1, help="fraction of URGENT stops")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="route_results.json")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)) for _ in range(args.stops)]
+    urgent = [rng.random() < args.urgent for _ in range(args.stops)]
+    depot = (34.05, -118.25)
+
+    dist, matrix_ms = timed(lambda: distance_matrix(points), args.runs)
+    nn, nn_ms = timed(lambda: [0] + nearest_neighbour(dist, 0, range(1, args.stops)), args.runs)
+    improved, two_opt_ms = timed(lambda: two_opt(dist, nn), args.runs)
+    (order, legs), plan_ms = timed(lambda: plan_route(points, urgent, depot), args.runs)
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        pool.submit(plan_route, points[:2], urgent[:2], depot).result()  # warm the worker
+        _, pool_ms = timed(lambda: pool.submit(plan_route, points, urgent, depot).result(), args.runs)
+
+    results = {
+        "stops": args.stops,
+        "urgent": sum(urgent),
+        "distance_matrix_ms": matrix_ms,
+        "nearest_neighbour_ms": nn_ms,
+        "nearest_neighbour_km": round(path_km(dist, nn), 1),
+        "two_opt_ms": two_opt_ms,
+        "two_opt_km": round(path_km(dist, improved), 1),
+        "plan_route_ms": plan_ms,
+        "plan_route_pool_ms": pool_ms,
+        "plan_route_km": round(sum(legs), 1),
+    }
+    saved = 1 - results["two_opt_km"] / results["nearest_neighbour_km"]
+    print(f"{args.stops} stops ({results['urgent']} urgent)")
+    print(f"  distance matrix      {matrix_ms:>8} ms")
+    print(f"  nearest neighbour    {nn_ms:>8} ms  {results['nearest_neighbour_km']:>8} km")
+    print(f"  + 2-opt              {two_opt_ms:>8} ms  {results['two_opt_km']:>8} km  ({saved:.1%} shorter)")
+    print(f"  plan_route (urgent)  {plan_ms:>8} ms  {results['plan_route_km']:>8} km")
+    print(f"  plan_route via pool  {pool_ms:>8} ms")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
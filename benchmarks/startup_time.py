@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+ROG Pool Service - Cold start benchmark
+
+Measures what Render/Railway health checks wait on after a deploy:
+
+- import time of backend/server.py (fresh interpreter each run)
+- time from process spawn until /api/health answers 200
+
+    python benchmarks/startup_time.py --runs 5
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/startup_time.py --runs 5
+
+Add --importtime to print the slowest modules from `python -X importtime`.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+SERVER_ENV = {**os.environ, "ACCESS_LOG_ENABLED": "false", "RATE_LIMIT_ENABLED": "false"}
+
+
+def measure_import():
+    code = "import time; t = time.perf_counter(); import server; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+                         env=SERVER_ENV)
+    return float(out.stdout.strip().splitlines()[-1]) * 1000
+
+
+def measure_time_to_healthy(port, timeout=60):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=SERVER_ENV,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as http:
+            while time.perf_counter() - start < timeout:
+                try:
+                    if http.get(f"http://127.0.0.1:{port}/api/health").status_code == 200:
+                        return (time.perf_counter() - start) * 1000
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError(f"Server did not become healthy within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def print_importtime(limit=15):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"], cwd=BACKEND_DIR,
+                         capture_output=True, text=True)
+    rows = []
+    # Lines look like "import time:   self_us | cumulative_us | module"
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, name in sorted(rows, reverse=True)[:limit]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+
+def summarize(label, values):
+    print(f"{label:<22} median {statistics.median(values):8.1f} ms   "
+          f"min {min(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API cold start time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8012)
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    healthy = [measure_time_to_healthy(args.port) for _ in range(args.runs)]
+
+    print(f"\n🚀 Cold start over {args.runs} runs")
+    summarize("import server", imports)
+    summarize("spawn -> /api/health", healthy)
+
+    if args.importtime:
+        print_importtime()
+
+
+if __name__ == "__main__":
+    main()
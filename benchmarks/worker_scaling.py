@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+ROG Pool Service - Multi-worker throughput scaling
+
+Runs the same load_test scenarios against `uvicorn --workers N` for several
+N on a local MongoDB and prints throughput and speedup per worker count.
+
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=rog_bench \\
+      python benchmarks/worker_scaling.py --workers 1 2 4 8 --out scaling.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+
+from load_test import build_parser, main_async
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput across worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+    parser.add_argument("--scenarios", nargs="+", default=["login_burst", "board_refresh"])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--out", default="scaling_results.json")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the API rate limiter on")
+    args = parser.parse_args()
+
+    results = {}
+    for workers in sorted(set(args.workers)):
+        print(f"\n=== {workers} worker(s) ===")
+        opts = build_parser().parse_args([
+            "--spawn", "local", "--workers", str(workers),
+            "--concurrency", str(args.concurrency), "--requests", str(args.requests),
+            "--scenarios", *args.scenarios, *(["--rate-limit"] if args.rate_limit else []),
+        ])
+        results[workers] = asyncio.run(main_async(opts))["scenarios"]
+
+    baseline_workers = min(results)
+    print(f"\n{'scenario':<20}{'workers':>8}{'req/s':>10}{'p95 ms':>10}{'speedup':>10}")
+    for scenario in args.scenarios:
+        base = results[baseline_workers][scenario]["throughput_rps"] or 1
+        for workers, scenarios in results.items():
+            s = scenarios[scenario]
+            print(f"{scenario:<20}{workers:>8}{s['throughput_rps']:>10}{s['p95_ms']:>10}"
+                  f"{(s['throughput_rps'] or 0) / base:>9.2f}x")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,11 @@ echo "🏗️ Building frontend..."
 npm run build
 echo "✅ Frontend built successfully"
 
+# Precompress hashed assets (.gz/.br) for the backend to serve
+cd ..
+python scripts/precompress_assets.py
+cd frontend
+
 # Go back to root
 cd ..
 
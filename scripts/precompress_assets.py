@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+ROG Pool Service - Precompress the React build
+
+Writes .gz (and .br when the `brotli` package is installed) next to every
+compressible file in frontend/build/static, so the backend can serve them
+without compressing per request. Run after `npm run build`; build.sh does.
+
+    python scripts/precompress_assets.py
+"""
+
+import gzip
+import sys
+from pathlib import Path
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "frontend" / "build" / "static"
+COMPRESSIBLE = {".js", ".css", ".map", ".json", ".svg", ".txt", ".html"}
+MIN_SIZE = 1024
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def main():
+    static_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else STATIC_DIR
+    if not static_dir.exists():
+        print(f"❌ {static_dir} not found - run npm run build first")
+        sys.exit(1)
+    if brotli is None:
+        print("⚠️  brotli not installed - writing .gz only (pip install brotli)")
+
+    count, original, compressed = 0, 0, 0
+    for path in static_dir.rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE or path.stat().st_size < MIN_SIZE:
+            continue
+        data = path.read_bytes()
+        gz = gzip.compress(data, compresslevel=9, mtime=0)
+        path.with_name(path.name + ".gz").write_bytes(gz)
+        best = len(gz)
+        if brotli is not None:
+            br = brotli.compress(data, quality=11)
+            path.with_name(path.name + ".br").write_bytes(br)
+            best = min(best, len(br))
+        count += 1
+        original += len(data)
+        compressed += best
+
+    if count:
+        print(f"✅ Precompressed {count} files: {original / 1024:.0f} KB -> {compressed / 1024:.0f} KB")
+    else:
+        print("No files to compress")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Backend modules import each other as top-level modules (`from cache import cache`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def db():
+    """An in-memory Motor-compatible database (mongomock-motor)"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient()["rog_pool_service_test"]
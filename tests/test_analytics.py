@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from analytics import AnalyticsTable  # noqa: E402
+from archive import ARCHIVE  # noqa: E402
+from denormalization import enqueue_client_change, process_propagation_tasks  # noqa: E402
+
+
+def report(i, client_id="c1", client_name="Ana", **extra):
+    now = datetime.now()
+    return {"id": f"r{i}", "status": "completed", "client_id": client_id, "client_name": client_name,
+            "client_address": "1 Main", "employee_id": "e1", "employee_name": "bob", "priority": "URGENT",
+            "request_date": now - timedelta(days=2), "completion_date": now - timedelta(days=1),
+            "total_cost": 100.0, "parts_cost": 30.0, "updated_at": now - timedelta(days=1), **extra}
+
+
+def test_refresh_applies_changes_and_client_renames(db):
+    table = AnalyticsTable()
+
+    async def main():
+        await db.service_reports.insert_many([report(1), report(2, "c2", "Bia")])
+        await db[ARCHIVE].insert_one(report(3))
+        await table.load(db, from_snapshot=False)
+        assert len(table.frame) == 3
+
+        # A new completion, a reopened report and a rename reaching an archived report
+        await db.service_reports.insert_one(report(4, "c2", "Bia", updated_at=datetime.now()))
+        await db.service_reports.update_one({"id": "r2"}, {"$set": {"status": "in_progress",
+                                                                     "updated_at": datetime.now()}})
+        await enqueue_client_change(db, {"id": "c1", "name": "Ana Maria", "address": "1 Main"})
+        await process_propagation_tasks(db)
+        await table.refresh(db)
+
+    asyncio.run(main())
+    assert sorted(table.frame.index) == ["r1", "r3", "r4"]
+    assert set(table.frame.loc[["r1", "r3"], "client_name"]) == {"Ana Maria"}
+    rows = table.query(["count", "revenue", "profit"], group_by="client")
+    assert {row["label"]: row["count"] for row in rows} == {"Ana Maria": 2, "Bia": 1}
+    assert rows[0]["revenue"] == 200.0 and rows[0]["profit"] == 140.0
+
+
+def test_watermark_is_the_scan_start(db):
+    table = AnalyticsTable()
+
+    async def main():
+        await db.service_reports.insert_one(report(1))
+        before = datetime.now()
+        await table.load(db, from_snapshot=False)
+        after = datetime.now()
+        return before, after
+
+    before, after = asyncio.run(main())
+    assert before <= table.watermark <= after
@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+from cache import MemoryCache
+
+
+def test_memory_cache_get_set_delete():
+    async def main():
+        cache = MemoryCache()
+        await cache.set("a", {"x": 1})
+        assert await cache.get("a") == {"x": 1}
+        await cache.delete("a")
+        assert await cache.get("a") is None
+
+    asyncio.run(main())
+
+
+def test_incr_keeps_the_first_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+
+    async def main():
+        cache = MemoryCache()
+        assert await cache.incr("hits", ttl=10) == 1
+        now[0] += 6
+        # A later increment does not push the expiry out
+        assert await cache.incr("hits", ttl=10) == 2
+        now[0] += 5
+        assert await cache.get("hits") is None
+        assert await cache.incr("hits", ttl=10) == 1
+
+    asyncio.run(main())
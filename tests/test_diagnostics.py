@@ -0,0 +1,47 @@
+import asyncio
+
+from diagnostics import RouteProfiler
+
+
+def test_profiles_armed_number_of_requests():
+    profiler = RouteProfiler()
+    profiler.arm("/api/reports", requests=2)
+
+    async def handler():
+        return sum(range(1000))
+
+    async def main():
+        assert profiler.matches("/api/reports/stats")
+        assert not profiler.matches("/api/clients")
+        await profiler.profile(handler)
+        assert profiler.remaining == 1 and profiler.last_result is None
+        await profiler.profile(handler)
+
+    asyncio.run(main())
+    assert profiler.last_result["route"] == "/api/reports"
+    assert profiler.armed_prefix is None
+    assert not profiler.matches("/api/reports")
+
+
+def test_rearming_during_a_run_keeps_runs_apart():
+    profiler = RouteProfiler()
+    profiler.arm("/api/old", requests=1)
+
+    async def main():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow():
+            started.set()
+            await release.wait()
+
+        task = asyncio.create_task(profiler.profile(slow))
+        await started.wait()
+        profiler.arm("/api/new", requests=3)
+        release.set()
+        await task
+
+    asyncio.run(main())
+    # The old run finished against itself and was discarded; the new one is untouched
+    assert profiler.last_result is None
+    assert profiler.armed_prefix == "/api/new"
+    assert profiler.remaining == 3
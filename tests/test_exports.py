@@ -0,0 +1,63 @@
+import asyncio
+import io
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from exports import _excel_serial, stream_csv, stream_xlsx
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self.docs:
+            yield doc
+
+
+COLUMNS = [("Name", "name"), ("When", "when"), ("Cost", "cost")]
+DOCS = [
+    {"name": "João & Sons", "when": datetime(2026, 1, 2, 12, 0), "cost": 12.5},
+    {"name": "Pool <B>", "when": None, "cost": float("nan")},
+]
+
+
+async def collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+def test_excel_serial():
+    assert _excel_serial(datetime(1900, 3, 1)) == 61
+    assert _excel_serial(datetime(2026, 1, 2, 12, 0)) == 46024.5
+
+
+def test_xlsx_has_styles_date_serials_and_no_nan():
+    data = asyncio.run(collect(stream_xlsx(FakeCursor(DOCS), COLUMNS, "reports")))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert "xl/styles.xml" in zf.namelist()
+        assert "styles.xml" in zf.read("xl/_rels/workbook.xml.rels").decode()
+        sheet = zf.read("xl/worksheets/sheet1.xml").decode()
+    assert '<c r="B2" s="1"><v>46024.5</v></c>' in sheet
+    assert "nan" not in sheet
+    assert 'r="B3"' not in sheet and 'r="C3"' not in sheet
+    assert "João &amp; Sons" in sheet and "Pool &lt;B&gt;" in sheet
+
+
+def test_xlsx_opens_with_openpyxl():
+    openpyxl = pytest.importorskip("openpyxl")
+    data = asyncio.run(collect(stream_xlsx(FakeCursor(DOCS), COLUMNS, "reports")))
+    sheet = openpyxl.load_workbook(io.BytesIO(data)).active
+    assert sheet["B2"].value == datetime(2026, 1, 2, 12, 0)
+    assert sheet["C2"].value == 12.5
+    assert sheet["C3"].value is None
+
+
+def test_csv_has_bom_and_blank_nan():
+    text = asyncio.run(collect(stream_csv(FakeCursor(DOCS), COLUMNS))).decode("utf-8")
+    assert text.startswith("\ufeffName,When,Cost")
+    assert text.splitlines()[2] == "Pool <B>,,"
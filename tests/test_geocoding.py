@@ -0,0 +1,120 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+import geocoding  # noqa: E402
+from geocoding import (GEOCODE_CACHE, NOT_FOUND_RETRY_DAYS, GeocodeTable, TableResolver,  # noqa: E402
+                       address_key, geocode_all_pending)
+
+
+class CountingResolver(TableResolver):
+    def __init__(self, table):
+        super().__init__(table)
+        self.calls = []
+
+    async def resolve(self, addresses):
+        self.calls.append(sorted(addresses))
+        return await super().resolve(addresses)
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    path = tmp_path / "geocodes.csv"
+    path.write_text("address,lat,lng\n100 Main St,34.05,-118.25\n", encoding="utf-8")
+    table = GeocodeTable(path)
+    monkeypatch.setattr(geocoding, "geocode_table", table)
+    return table
+
+
+def test_address_key_ignores_case_accents_and_punctuation():
+    assert address_key("100  Main St.") == address_key("100 main st") == "100 main st"
+    assert address_key("12 Peña Ave") == address_key("12 PENA ave")
+    assert address_key(None) == ""
+
+
+def test_unique_addresses_are_resolved_once(db, table):
+    resolver = CountingResolver(table)
+    clients = [{"id": "a", "address": "100 Main St"}, {"id": "b", "address": "100 MAIN ST."},
+               {"id": "c", "address": "100 main st"}]
+
+    async def main():
+        await db.clients.insert_many(clients)
+        await geocode_all_pending(db, resolver)
+        await db.clients.insert_one({"id": "d", "address": "100 Main St"})
+        await geocode_all_pending(db, resolver)
+        return await db.clients.find({}, {"_id": 0}).sort("id", 1).to_list(None)
+
+    located = asyncio.run(main())
+    assert resolver.calls == [["100 main st"]]
+    assert all(c["location"] == {"lat": 34.05, "lng": -118.25} for c in located)
+    assert all(c["geo_key"] == "100 main st" for c in located)
+
+
+def test_missing_address_is_retried_after_the_retry_period(db, table):
+    resolver = CountingResolver(table)
+    now = datetime.now()
+
+    async def main():
+        await db.clients.insert_one({"id": "a", "address": "9 Nowhere Rd"})
+        assert await geocode_all_pending(db, resolver) == 1
+        missed = await db.clients.find_one({"id": "a"})
+        # Nothing new to try until the retry time
+        assert await geocode_all_pending(db, resolver) == 0
+        later = missed["geo_retry_at"] + timedelta(seconds=1)
+        await geocoding.geocode_pending_clients(db, resolver, now=later)
+        return missed, await db.clients.find_one({"id": "a"})
+
+    missed, retried = asyncio.run(main())
+    assert "geo_key" not in missed and missed["location"] is None
+    assert missed["geo_retry_at"] > now + timedelta(days=NOT_FOUND_RETRY_DAYS - 1)
+    assert resolver.calls == [["9 nowhere rd"], ["9 nowhere rd"]]
+    assert "geo_key" not in retried
+
+
+def test_missing_address_is_retried_when_the_table_changes(db, table):
+    resolver = CountingResolver(table)
+
+    async def main():
+        await db.clients.insert_one({"id": "a", "address": "9 Nowhere Rd"})
+        await geocode_all_pending(db, resolver)
+        table.path.write_text("address,lat,lng\n9 Nowhere Rd,33.9,-118.1\n", encoding="utf-8")
+        # The table is reloaded on mtime, so make sure it moves
+        stat = table.path.stat()
+        os.utime(table.path, (stat.st_atime, stat.st_mtime + 10))
+        await geocode_all_pending(db, resolver)
+        cached = await db[GEOCODE_CACHE].find_one({"_id": "9 nowhere rd"})
+        return await db.clients.find_one({"id": "a"}), cached
+
+    client, cached = asyncio.run(main())
+    assert client["geo_key"] == "9 nowhere rd"
+    assert client["location"] == {"lat": 33.9, "lng": -118.1}
+    assert "geo_retry_at" not in client
+    assert (cached["lat"], cached["lng"]) == (33.9, -118.1)
+
+
+def test_address_changed_while_resolving_is_geocoded_again(db, table):
+    class EditingResolver(CountingResolver):
+        async def resolve(self, addresses):
+            if not self.calls:
+                # The client is edited (and its geo fields unset) while the batch resolves
+                await db.clients.update_one({"id": "a"}, {"$set": {"address": "9 Nowhere Rd"},
+                                                          "$unset": {"geo_key": "", "location": ""}})
+            return await super().resolve(addresses)
+
+    resolver = EditingResolver(table)
+
+    async def main():
+        await db.clients.insert_one({"id": "a", "address": "100 Main St"})
+        await geocoding.geocode_pending_clients(db, resolver)
+        stale = await db.clients.find_one({"id": "a"})
+        await geocoding.geocode_pending_clients(db, resolver)
+        return stale, await db.clients.find_one({"id": "a"})
+
+    stale, client = asyncio.run(main())
+    assert "geo_key" not in stale and "location" not in stale
+    assert resolver.calls == [["100 main st"], ["9 nowhere rd"]]
+    assert client["location"] is None and "geo_retry_at" in client
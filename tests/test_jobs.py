@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from jobs import JOBS, JobQueue  # noqa: E402
+
+
+async def _claim_and_execute(queue, db, worker_id):
+    job = await queue._claim(db, worker_id)
+    assert job is not None
+    queue.running[job["type"]] += 1
+    await queue._execute(db, job, worker_id)
+    return job
+
+
+def test_failed_job_is_retried_then_succeeds(db):
+    calls = []
+
+    async def flaky(db, job):
+        calls.append(job["attempts"])
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return {"ok": True}
+
+    queue = JobQueue()
+    queue.register("flaky", flaky)
+
+    async def main():
+        submitted = await queue.submit(db, "flaky")
+        await _claim_and_execute(queue, db, "host:1:a")
+        retried = await db[JOBS].find_one({"_id": submitted["id"]})
+        assert retried["status"] == "queued" and retried["error"] == "boom"
+        assert await queue._claim(db, "host:1:a") is None  # backing off
+        await db[JOBS].update_one({"_id": submitted["id"]}, {"$set": {"run_after": datetime.now()}})
+        await _claim_and_execute(queue, db, "host:1:a")
+        return await db[JOBS].find_one({"_id": submitted["id"]})
+
+    job = asyncio.run(main())
+    assert calls == [1, 2]
+    assert job["status"] == "succeeded" and job["result"] == {"ok": True}
+    assert queue.stats["flaky"]["retried"] == 1 and queue.stats["flaky"]["succeeded"] == 1
+    assert queue.running["flaky"] == 0
+
+
+def test_stalled_worker_cannot_finish_a_reclaimed_job(db):
+    first, second = JobQueue(), JobQueue()
+
+    async def stalls(db, job):
+        # The lease lapses while this worker is stuck; another worker reclaims the job
+        await db[JOBS].update_one({"_id": job["_id"]},
+                                  {"$set": {"lease_expires_at": datetime.now() - timedelta(seconds=1)}})
+        await second._sweep(db)
+        reclaimed = await second._claim(db, "host:2:b")
+        assert reclaimed["attempts"] == 2
+        return {"by": "first"}
+
+    first.register("work", stalls)
+    second.register("work", stalls)
+
+    async def main():
+        submitted = await first.submit(db, "work")
+        await _claim_and_execute(first, db, "host:1:a")
+        return await db[JOBS].find_one({"_id": submitted["id"]})
+
+    job = asyncio.run(main())
+    assert job["status"] == "running"
+    assert job["worker"] == "host:2:b"
+    assert job["result"] is None
+
+
+def test_same_worker_id_cannot_finish_an_earlier_claim(db):
+    queue = JobQueue()
+
+    async def stalls(db, job):
+        await db[JOBS].update_one({"_id": job["_id"]},
+                                  {"$set": {"lease_expires_at": datetime.now() - timedelta(seconds=1)}})
+        await queue._sweep(db)
+        await queue._claim(db, "host:1:a")
+        return {"by": "first claim"}
+
+    queue.register("work", stalls, concurrency=2)
+
+    async def main():
+        submitted = await queue.submit(db, "work")
+        await _claim_and_execute(queue, db, "host:1:a")
+        return await db[JOBS].find_one({"_id": submitted["id"]})
+
+    job = asyncio.run(main())
+    assert job["status"] == "running" and job["attempts"] == 2
+    assert job["result"] is None
+
+
+def test_worker_id_is_set_when_the_worker_starts(db):
+    queue = JobQueue()
+    assert queue.local_status()["worker"] is None
+
+    async def main():
+        runner = asyncio.create_task(queue.run(lambda: None))
+        await asyncio.sleep(0)
+        runner.cancel()
+
+    asyncio.run(main())
+    assert queue.worker_id is not None
+    assert queue.local_status()["worker"] == queue.worker_id
+
+
+def test_run_cpu_uses_a_forkserver_pool():
+    queue = JobQueue()
+
+    async def main():
+        return await queue.run_cpu(pow, 2, 10)
+
+    try:
+        assert asyncio.run(main()) == 1024
+        assert queue._pool._mp_context.get_start_method() == "forkserver"
+    finally:
+        queue.shutdown()
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+import rate_limit
+from cache import MemoryCache
+from rate_limit import RateLimiter, RateLimitMiddleware, TokenBuckets, client_ip, route_class
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SharedCounter:
+    """Stand-in for a shared cache backend: incr only, TTLs ignored"""
+
+    shared = True
+
+    def __init__(self):
+        self.counts = {}
+
+    async def incr(self, key, amount, ttl=None):
+        self.counts[key] = self.counts.get(key, 0) + amount
+        return self.counts[key]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_refills(clock):
+    buckets = TokenBuckets()
+    assert [buckets.take("k", 3, 1.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("k", 3, 1.0) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert buckets.take("k", 3, 1.0) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert buckets.take("k", 3, 1.0) == 0.0
+    # Other keys have their own bucket
+    assert buckets.take("other", 3, 1.0) == 0.0
+
+
+def test_bucket_never_holds_more_than_its_capacity(clock):
+    buckets = TokenBuckets()
+    buckets.take("k", 2, 1.0)
+    clock.now += 3600
+    assert [buckets.take("k", 2, 1.0) for _ in range(3)][2] > 0
+
+
+def test_full_buckets_are_pruned(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "PRUNE_EVERY", 2)
+    buckets = TokenBuckets()
+    buckets.take("old", 5, 1.0)
+    clock.now += rate_limit.MAX_REFILL_SECONDS + 1
+    buckets.take("new", 5, 1.0)
+    assert set(buckets._buckets) == {"new"}
+
+
+def test_route_classes():
+    assert route_class("POST", "/api/auth/login") == "login"
+    assert route_class("GET", "/api/exports/reports.csv") == "heavy"
+    assert route_class("GET", "/api/jobs/abc/download") == "heavy"
+    assert route_class("POST", "/api/clients/import-excel") == "heavy"
+    assert route_class("GET", "/api/reports") == "read"
+    assert route_class("PUT", "/api/reports/1") == "write"
+    assert route_class("GET", "/api/health") is None
+    assert route_class("OPTIONS", "/api/reports") is None
+    assert route_class("GET", "/static/app.js") is None
+
+
+def test_client_ip_uses_the_proxy_supplied_entry(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PROXY_HOPS", 1)
+    scope = {"headers": [(b"x-forwarded-for", b"6.6.6.6, 1.2.3.4")], "client": ("10.0.0.1", 1234)}
+    assert client_ip(scope) == "1.2.3.4"
+    assert client_ip({"headers": [], "client": ("10.0.0.1", 1234)}) == "10.0.0.1"
+
+
+def test_shared_backend_counts_a_window_per_client():
+    limiter = RateLimiter(SharedCounter())
+    capacity, rate = rate_limit.LIMITS["login"]
+
+    async def main():
+        return [await limiter.take("login", "ip:1.2.3.4") for _ in range(int(capacity) + 1)]
+
+    waits = asyncio.run(main())
+    assert waits[:-1] == [0.0] * int(capacity)
+    assert waits[-1] == capacity / rate
+
+
+def test_heavy_concurrency_slots_are_released(monkeypatch):
+    monkeypatch.setattr(rate_limit, "HEAVY_CONCURRENCY", 1)
+    limiter = RateLimiter(SharedCounter())
+
+    async def main():
+        first = await limiter.acquire("user:a")
+        second = await limiter.acquire("user:a")
+        await limiter.release("user:a")
+        return first, second, await limiter.acquire("user:a")
+
+    assert asyncio.run(main()) == (True, False, True)
+
+
+def _call(middleware, path, method="GET"):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "client": ("10.0.0.1", 1)}
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"], dict(sent[0]["headers"])
+
+
+async def _ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def test_middleware_answers_429_with_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setitem(rate_limit.LIMITS, "read", (2, 0.5))
+    middleware = RateLimitMiddleware(_ok, identify=lambda token: None, limiter=RateLimiter(MemoryCache()))
+
+    statuses = [_call(middleware, "/api/reports")[0] for _ in range(2)]
+    status, headers = _call(middleware, "/api/reports")
+    assert statuses == [200, 200]
+    assert status == 429 and headers[b"retry-after"] == b"2"
+    assert _call(middleware, "/api/health")[0] == 200
+
+
+def test_middleware_is_a_pass_through_when_disabled(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setitem(rate_limit.LIMITS, "read", (1, 0.001))
+    middleware = RateLimitMiddleware(_ok, identify=lambda token: None, limiter=RateLimiter(SharedCounter()))
+    assert [_call(middleware, "/api/reports")[0] for _ in range(5)] == [200] * 5
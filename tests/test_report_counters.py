@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from report_counters import get_stats, reconcile_counters, record_report_changed, recount_late  # noqa: E402
+from sla import sweep_overdue  # noqa: E402
+
+
+def test_late_matches_the_sla_overdue_condition(db):
+    now = datetime(2026, 10, 19, 12, 0)
+    reports = [
+        # Requested long ago but not due yet (NEXT WEEK): not late
+        {"id": "a", "status": "reported", "employee_id": "e1", "priority": "NEXT WEEK",
+         "request_date": now - timedelta(days=3), "due_at": now + timedelta(days=4)},
+        # Requested an hour ago but already past due: late
+        {"id": "b", "status": "in_progress", "employee_id": "e1", "priority": "URGENT",
+         "request_date": now - timedelta(hours=1), "due_at": now - timedelta(minutes=5)},
+        {"id": "c", "status": "scheduled", "employee_id": "e2", "priority": "SAME WEEK",
+         "request_date": now - timedelta(days=9), "due_at": now - timedelta(days=2)},
+        # Completed reports are never late
+        {"id": "d", "status": "completed", "employee_id": "e1", "priority": "URGENT",
+         "request_date": now - timedelta(days=9), "due_at": now - timedelta(days=8)},
+    ]
+
+    async def main():
+        await db.service_reports.insert_many(reports)
+        await reconcile_counters(db, now)
+        return await get_stats(db), await get_stats(db, "e1")
+
+    stats, e1 = asyncio.run(main())
+    assert stats["late"] == 2
+    assert e1["late"] == 1
+    assert stats["by_status"] == {"reported": 1, "in_progress": 1, "scheduled": 1, "completed": 1}
+    assert stats["open_age_buckets"]["7d+"] == 1
+
+
+def test_late_count_is_read_from_the_counters(db):
+    now = datetime.utcnow()
+    late = {"id": "a", "status": "reported", "employee_id": "e1", "priority": "URGENT",
+            "request_date": now - timedelta(days=2), "due_at": now - timedelta(days=1), "overdue": False}
+
+    async def main():
+        await db.service_reports.insert_one(dict(late))
+        await sweep_overdue(db, now)
+        await recount_late(db, now)
+        flagged = await db.service_reports.find_one({"id": "a"}, {"_id": 0})
+        swept = await get_stats(db)
+        # Reassigning and then closing the report moves and drops its late count without a recount
+        moved = {**flagged, "employee_id": "e2"}
+        await record_report_changed(db, flagged, moved)
+        reassigned = await get_stats(db, "e2"), await get_stats(db, "e1")
+        await record_report_changed(db, moved, {**moved, "status": "completed", "overdue": False})
+        await db.service_reports.drop()
+        return swept, reassigned, await get_stats(db)
+
+    swept, (e2, e1), closed = asyncio.run(main())
+    assert swept["late"] == 1
+    assert (e2["late"], e1["late"]) == (1, 0)
+    assert closed["late"] == 0
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pymongo")
+pytest.importorskip("pytz")
+
+from jobs import job_queue  # noqa: E402
+from routing import distance_matrix, generate_schedules, plan_route, two_opt  # noqa: E402
+
+# Four corners of a small square around downtown Los Angeles
+SQUARE = [(34.00, -118.30), (34.00, -118.20), (34.10, -118.20), (34.10, -118.30)]
+
+
+def _path_km(dist, path):
+    return sum(dist[a, b] for a, b in zip(path, path[1:]))
+
+
+def test_two_opt_removes_a_crossing():
+    dist = distance_matrix(SQUARE)
+    crossed = [0, 2, 1, 3]
+    improved = two_opt(dist, crossed)
+    assert improved[0] == 0
+    assert sorted(improved) == [0, 1, 2, 3]
+    assert _path_km(dist, improved) < _path_km(dist, crossed)
+
+
+def test_plan_route_visits_urgent_stops_first():
+    order, legs = plan_route(SQUARE, [False, False, True, False], start=(34.05, -118.25))
+    assert order[0] == 2
+    assert sorted(order) == [0, 1, 2, 3]
+    assert len(legs) == 4 and all(leg > 0 for leg in legs)
+
+
+def test_plan_route_without_depot_starts_at_first_urgent_stop():
+    order, legs = plan_route(SQUARE, [False, True, False, True])
+    assert order[0] == 1 and order[1] == 3
+    assert legs[0] == 0.0
+
+
+def test_schedule_only_includes_the_days_stops(db):
+    day = date(2026, 10, 20)
+    # 2026-10-20 in Los Angeles is 07:00 UTC on the 20th to 07:00 UTC on the 21st
+    reports = [
+        {"id": "today", "priority": "SAME WEEK",
+         "request_date": datetime(2026, 10, 20, 16), "due_at": datetime(2026, 10, 25, 6)},
+        {"id": "due-today", "priority": "SAME WEEK",
+         "request_date": datetime(2026, 10, 14, 16), "due_at": datetime(2026, 10, 21, 6)},
+        {"id": "overdue", "priority": "SAME WEEK",
+         "request_date": datetime(2026, 10, 5, 16), "due_at": datetime(2026, 10, 11, 6)},
+        {"id": "urgent-carry-over", "priority": "URGENT",
+         "request_date": datetime(2026, 10, 19, 22), "due_at": datetime(2026, 10, 20, 22)},
+        # Requested after the LA day ended (evening of the 20th LA is the 21st UTC): not yet
+        {"id": "tomorrow", "priority": "URGENT",
+         "request_date": datetime(2026, 10, 21, 8), "due_at": datetime(2026, 10, 22, 8)},
+        {"id": "next-week", "priority": "NEXT WEEK",
+         "request_date": datetime(2026, 10, 14, 16), "due_at": datetime(2026, 10, 25, 6)},
+        {"id": "closed", "priority": "URGENT", "status": "completed",
+         "request_date": datetime(2026, 10, 20, 16), "due_at": datetime(2026, 10, 21, 16)},
+    ]
+    for i, report in enumerate(reports):
+        report.setdefault("status", "reported")
+        report.update(client_id=f"c{i}", employee_id="e1", employee_name="Tech")
+    clients = [{"id": f"c{i}", "location": {"lat": 34.0 + i / 100, "lng": -118.25}} for i in range(len(reports))]
+
+    async def main():
+        await db.service_reports.insert_many(reports)
+        await db.clients.insert_many(clients)
+        try:
+            return await generate_schedules(db, day)
+        finally:
+            job_queue.shutdown()
+
+    [schedule] = asyncio.run(main())
+    assert schedule["_id"] == "2026-10-20|e1"
+    assert {stop["report_id"] for stop in schedule["stops"]} == {
+        "today", "due-today", "overdue", "urgent-carry-over"
+    }
+    assert schedule["stops"][0]["report_id"] == "urgent-carry-over"
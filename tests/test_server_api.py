@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("pymongo")
+
+
+@pytest.fixture
+def api(db, monkeypatch):
+    """TestClient on server.app with an admin user and the in-memory database"""
+    import server
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "mongodb_available", True)
+    server.app.dependency_overrides[server.get_current_user] = \
+        lambda: server.User(id="admin-1", username="admin", role="administrator")
+    try:
+        yield TestClient(server.app)
+    finally:
+        server.app.dependency_overrides.clear()
+
+
+def test_client_pages_are_stable_with_duplicate_names(api, db):
+    for i in range(7):
+        response = api.post("/api/clients", json={"name": "Same Name", "address": f"{i} Pool Ln"})
+        assert response.status_code == 200
+
+    seen = []
+    for page in range(1, 5):
+        response = api.get("/api/clients", params={"page": page, "page_size": 2})
+        assert response.status_code == 200
+        seen += [client["id"] for client in response.json()]
+    assert len(seen) == len(set(seen)) == 7
+    assert seen == sorted(seen)
+
+
+@pytest.mark.parametrize("body", [{"name": None}, {"address": None}, {"name": "  "}, {"address": ""}])
+def test_client_update_rejects_empty_name_or_address(api, body):
+    created = api.post("/api/clients", json={"name": "Smith", "address": "1 Pool Ln"}).json()
+
+    response = api.put(f"/api/clients/{created['id']}", json=body)
+    assert response.status_code == 400
+    assert [(c["name"], c["address"]) for c in api.get("/api/clients").json()] == [("Smith", "1 Pool Ln")]
+
+
+def test_client_update_can_clear_optional_fields(api):
+    created = api.post("/api/clients", json={"name": "Smith", "address": "1 Pool Ln", "phone": "555"}).json()
+
+    response = api.put(f"/api/clients/{created['id']}", json={"phone": None})
+    assert response.status_code == 200
+    assert response.json()["phone"] is None
+
+
+def test_geocoding_runs_one_at_a_time(api, db, monkeypatch):
+    import geocoding
+    import server
+
+    resolved = []
+
+    class Resolver:
+        name = "test"
+
+        async def resolve(self, addresses):
+            resolved.append(sorted(addresses))
+            return {key: (34.0, -118.0) for key in addresses}
+
+    monkeypatch.setattr(geocoding, "default_resolver", Resolver())
+
+    async def main():
+        await db.clients.insert_one({"id": "a", "address": "1 Pool Ln"})
+        # Another run holds the geocoding lease
+        await db.app_meta.insert_one({"_id": "lock:geocoding", "owner": -1,
+                                      "expires_at": datetime.now() + timedelta(minutes=5)})
+        await server.run_geocoding(db, drain=True)
+        skipped = await db.clients.find_one({"id": "a"})
+        await db.app_meta.delete_one({"_id": "lock:geocoding"})
+        await server.run_geocoding(db, drain=True)
+        return skipped, await db.clients.find_one({"id": "a"}), await db.app_meta.find_one({"_id": "lock:geocoding"})
+
+    skipped, client, lease = asyncio.run(main())
+    assert "geo_key" not in skipped
+    assert resolved == [["1 pool ln"]]
+    assert client["location"] == {"lat": 34.0, "lng": -118.0}
+    assert lease is None
+
+
+@pytest.mark.parametrize("body", [
+    {"weekday": None}, {"frequency": None}, {"start_date": None}, {"priority": None}, {"active": None},
+    {"priority": "SOMETIME"}, {"weekday": 7}, {"frequency": "daily"},
+])
+def test_plan_update_rejects_invalid_values(api, body):
+    client = api.post("/api/clients", json={"name": "Smith", "address": "1 Pool Ln"}).json()
+    plan = api.post("/api/plans", json={"client_id": client["id"], "weekday": 2}).json()
+
+    response = api.put(f"/api/plans/{plan['id']}", json=body)
+    assert response.status_code == 400
+    [stored] = api.get("/api/plans").json()
+    assert (stored["weekday"], stored["frequency"], stored["priority"]) == (2, "weekly", "SAME WEEK")
+
+
+def test_plan_update_can_clear_optional_fields(api):
+    client = api.post("/api/clients", json={"name": "Smith", "address": "1 Pool Ln"}).json()
+    plan = api.post("/api/plans", json={"client_id": client["id"], "weekday": 2, "price": 80}).json()
+
+    response = api.put(f"/api/plans/{plan['id']}", json={"price": None, "priority": "NEXT WEEK"})
+    assert response.status_code == 200
+    assert (response.json()["price"], response.json()["priority"]) == (None, "NEXT WEEK")
+
+
+def test_plan_create_rejects_unknown_priority(api):
+    client = api.post("/api/clients", json={"name": "Smith", "address": "1 Pool Ln"}).json()
+
+    response = api.post("/api/plans", json={"client_id": client["id"], "weekday": 2, "priority": "ASAP"})
+    assert response.status_code == 400
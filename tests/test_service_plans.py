@@ -0,0 +1,91 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("pytz")
+
+from report_counters import COUNTERS, counter_key  # noqa: E402
+from service_plans import (PLANS, ensure_plan_indexes, materialize_plans, occurrences,  # noqa: E402
+                           rematerialize_plan)
+
+MONDAY = date(2026, 10, 19)
+
+
+def _plan(**overrides):
+    plan = {"id": "p1", "client_id": "c1", "frequency": "weekly", "weekday": 2, "employee_id": "e1",
+            "priority": "SAME WEEK", "start_date": datetime(2026, 10, 1), "active": True}
+    plan.update(overrides)
+    return plan
+
+
+async def _setup(db, plan):
+    await ensure_plan_indexes(db)
+    await db.clients.insert_one({"id": "c1", "name": "Smith", "address": "1 Pool Ln"})
+    await db.users.insert_one({"id": "e1", "username": "tech"})
+    await db[PLANS].insert_one(plan)
+
+
+async def _visit_dates(db):
+    reports = await db.service_reports.find({"plan_id": "p1"}, {"_id": 0, "plan_key": 1}).to_list(None)
+    return sorted(r["plan_key"].split("|")[1] for r in reports)
+
+
+async def _scheduled_count(db):
+    counter = await db[COUNTERS].find_one({"_id": counter_key("scheduled", "e1", "SAME WEEK")})
+    return counter["count"] if counter else 0
+
+
+def test_occurrences_by_frequency():
+    weekly = list(occurrences(_plan(), MONDAY, 21))
+    assert weekly == [date(2026, 10, 21), date(2026, 10, 28), date(2026, 11, 4)]
+    biweekly = list(occurrences(_plan(frequency="biweekly"), MONDAY, 28))
+    # The first Wednesday on or after the start date is 2026-10-07
+    assert biweekly == [date(2026, 10, 21), date(2026, 11, 4)]
+    monthly = list(occurrences(_plan(frequency="monthly"), MONDAY, 28))
+    assert monthly == [date(2026, 11, 4)]
+
+
+def test_materializing_twice_creates_each_visit_once(db):
+    async def main():
+        await _setup(db, _plan())
+        first = await materialize_plans(db, MONDAY, 14)
+        second = await materialize_plans(db, MONDAY, 14)
+        return first, second, await _visit_dates(db), await _scheduled_count(db)
+
+    first, second, dates, counted = asyncio.run(main())
+    assert (first, second) == (2, 0)
+    assert dates == ["2026-10-21", "2026-10-28"]
+    assert counted == 2
+
+
+def test_changing_the_weekday_replaces_unstarted_visits(db):
+    async def main():
+        await _setup(db, _plan())
+        await materialize_plans(db, MONDAY, 14)
+        # The first visit has been started and keeps its date
+        await db.service_reports.update_one({"plan_key": "p1|2026-10-21"}, {"$set": {"status": "in_progress"}})
+        await db[COUNTERS].update_one({"_id": counter_key("scheduled", "e1", "SAME WEEK")}, {"$inc": {"count": -1}})
+        await db[PLANS].update_one({"id": "p1"}, {"$set": {"weekday": 4}})
+        result = await rematerialize_plan(db, "p1", MONDAY, 14)
+        return result, await _visit_dates(db), await _scheduled_count(db)
+
+    (removed, created), dates, counted = asyncio.run(main())
+    assert (removed, created) == (1, 2)
+    assert dates == ["2026-10-21", "2026-10-23", "2026-10-30"]
+    assert counted == 2
+
+
+def test_deactivating_a_plan_removes_its_upcoming_visits(db):
+    async def main():
+        await _setup(db, _plan())
+        await materialize_plans(db, MONDAY, 14)
+        await db[PLANS].update_one({"id": "p1"}, {"$set": {"active": False}})
+        result = await rematerialize_plan(db, "p1", MONDAY, 14)
+        return result, await _visit_dates(db), await _scheduled_count(db)
+
+    (removed, created), dates, counted = asyncio.run(main())
+    assert (removed, created) == (2, 0)
+    assert dates == []
+    assert counted == 0
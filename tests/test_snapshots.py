@@ -0,0 +1,34 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from snapshots import read_manifest, write_snapshot, year_parquet  # noqa: E402
+
+
+def completed(i, month):
+    return {"id": f"r{i}", "status": "completed", "client_id": "c1", "client_name": "Ana",
+            "employee_id": "e1", "employee_name": "bob", "priority": "URGENT",
+            "request_date": datetime(2025, month, 1), "completion_date": datetime(2025, month, 2),
+            "total_cost": 100.0, "parts_cost": 40.0}
+
+
+def test_concurrent_runs_do_not_clobber_each_other(db, tmp_path):
+    root = tmp_path / "analytics_snapshot"
+
+    async def main():
+        await db.service_reports.insert_many([completed(i, 1 + i % 3) for i in range(30)])
+        await db.service_reports.insert_one({"id": "open", "status": "reported"})
+        return await asyncio.gather(write_snapshot(db, root), write_snapshot(db, root))
+
+    first, second = asyncio.run(main())
+    assert first["rows"] == second["rows"] == 30
+    assert first["scan_started_at"] <= first["generated_at"]
+    assert read_manifest(root)["partitions"] == [
+        {"year": 2025, "month": m, "rows": 10} for m in (1, 2, 3)
+    ]
+    # Only the finished snapshot is left behind
+    assert [p.name for p in tmp_path.iterdir()] == ["analytics_snapshot"]
+    assert year_parquet(2025, root)[:4] == b"PAR1"